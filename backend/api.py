@@ -0,0 +1,1402 @@
+import csv
+import json
+import mimetypes
+import queue
+import sys
+import click
+from flask import Blueprint, Response, abort, current_app, request, jsonify, send_file
+import jwt
+from datetime import datetime, timedelta
+from functools import wraps
+from models import User, Skill, Interest, Event, EventParticipant, Message, Post, PostLike, PostComment, Subject, AttendanceRecord, PartnerRecommendation, Conversation, Job, ProjectRequirement
+from database import db
+from conversations import record_message, mark_read, recent_conversations, rebuild_conversations, get_conversation, message_page
+from broker import broker, format_sse
+from counters import increment, record_message_counts, repair_counters, user_trust_score
+from auth_cache import auth_cache
+from model_registry import model_registry
+from jobs import job_runner, job_type
+from timelines import fan_out_post, timeline_post_ids, backfill_timelines
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+from passwords import password_hasher, HasherBusy
+from static_assets import static_assets, build_assets, IMMUTABLE_CACHE, REVALIDATE_CACHE
+from uploads import store_image, sized_url, upload_etag, UploadRejected
+from metrics import request_metrics
+from profiling import profiler, MODES as PROFILE_MODES
+from werkzeug.security import safe_join
+
+# numpy, scipy and scikit-learn are only imported by the modules behind the
+# ML endpoints (skill_index, recommendations, fake_detection,
+# attendance_model), and those are imported inside the views that need them
+# so booting a worker doesn't pay for them.
+
+# cli_group=None keeps the commands at the top level (`flask init-db`, ...)
+bp = Blueprint('api', __name__, cli_group=None)
+
+def loaded_skill_index():
+    # The skill index only exists once a recommendation has imported it; until
+    # then there is nothing to keep in step with skill edits
+    module = sys.modules.get('skill_index')
+    return module.skill_index if module else None
+
+def store_upload(file):
+    # Streams to disk under the content hash and writes the thumbnail sizes
+    return store_image(file, current_app.config['UPLOAD_FOLDER'], current_app.config['MAX_UPLOAD_BYTES'])
+
+def send_asset(asset):
+    # Pick the precompressed variant from the in-memory table; no filesystem probing
+    path, encoding = asset.negotiate(request.accept_encodings)
+    response = send_file(path, mimetype=asset.mimetype, conditional=True, max_age=None)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = asset.cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+@bp.route('/')
+def serve_index():
+    return send_asset(static_assets.get('index.html'))
+
+@bp.route('/<path:path>')
+def serve_static(path):
+    asset = static_assets.get(path)
+    # Unknown paths fall back to the single-page app
+    return send_asset(asset or static_assets.get('index.html'))
+
+@bp.cli.command('build-assets')
+def build_assets_command():
+    """Write hashed, gzip/brotli-precompressed frontend assets to frontend/dist."""
+    from static_assets import brotli
+    manifest = build_assets(static_assets.frontend_dir, static_assets.dist_dir)
+    for name, entry in sorted(manifest["files"].items()):
+        click.echo(f"{name} -> {entry['file']} ({', '.join(entry['encodings']) or 'uncompressed'})")
+    if brotli is None:
+        click.echo("brotli is not installed; only gzip variants were written.")
+    static_assets.reload()
+
+@bp.app_errorhandler(UploadRejected)
+def upload_rejected(e):
+    return jsonify({"message": e.message}), e.status
+
+@bp.app_errorhandler(413)
+def request_too_large(e):
+    # Body over MAX_CONTENT_LENGTH; werkzeug stops reading it
+    return jsonify({"message": "Request is too large"}), 413
+
+@bp.app_errorhandler(HasherBusy)
+def password_hasher_busy(e):
+    # Hashing pool is saturated (e.g. a login burst): shed load instead of queueing
+    return jsonify({"message": "Server is busy, please retry shortly."}), 503, {'Retry-After': '1'}
+
+# --- AUTHENTICATION DECORATOR ---
+def authenticate(token):
+    """Resolve a JWT to the cached AuthenticatedUser, or return an error response."""
+    if not token:
+        return None, (jsonify({'message': 'Token is missing!'}), 401)
+    try:
+        data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+        current_user = auth_cache.get(int(data['user_id']))
+    except:
+        return None, (jsonify({'message': 'Token is invalid!'}), 401)
+    if current_user is None:
+        return None, (jsonify({'message': 'Token is invalid!'}), 401)
+    if current_user.is_suspended:
+        return None, (jsonify({'message': 'Your account has been suspended by an administrator.'}), 403)
+    return current_user, None
+
+def bearer_token():
+    auth_header = request.headers.get('Authorization', '')
+    return auth_header.split(" ")[1] if " " in auth_header else auth_header
+
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        current_user, error = authenticate(bearer_token())
+        if error:
+            return error
+        
+        return f(current_user, *args, **kwargs)
+    return decorated
+
+def admin_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        current_user, error = authenticate(bearer_token())
+        if error:
+            return error
+        
+        if not current_user.is_admin:
+            return jsonify({'message': 'Admin privileges required!'}), 403
+            
+        return f(current_user, *args, **kwargs)
+    return decorated
+
+def log_admin_action(admin_id, action, target_id=None):
+    from models import AdminAuditLog
+    log = AdminAuditLog(admin_id=admin_id, action=action, target_id=target_id)
+    db.session.add(log)
+    db.session.commit()
+
+
+# --- 1. USER AUTHENTICATION & PROFILE ---
+
+@bp.route('/api/signup', methods=['POST'])
+def signup():
+    data = request.get_json()
+    name = data.get('name')
+    email = data.get('email')
+    password = data.get('password')
+    branch = data.get('branch', '')
+    year = data.get('year', '')
+
+    if not name or not email or not password:
+        return jsonify({"message": "Missing fields"}), 400
+
+    if User.query.filter_by(email=email).first():
+        return jsonify({"message": "User already exists"}), 400
+
+    hashed_password = password_hasher.hash(password)
+    new_user = User(
+        name=name, 
+        email=email, 
+        password_hash=hashed_password,
+        branch=branch,
+        year=year
+    )
+    db.session.add(new_user)
+    db.session.commit()
+
+    return jsonify({"message": "User registered successfully"}), 201
+
+@bp.route('/api/login', methods=['POST'])
+def login():
+    data = request.get_json()
+    email = data.get('email')
+    password = data.get('password')
+
+    if not email or not password:
+        return jsonify({"message": "Missing fields"}), 400
+
+    user = User.query.filter_by(email=email).first()
+
+    if not user or not password_hasher.verify(user.password_hash, password):
+        return jsonify({"message": "Invalid email or password"}), 401
+        
+    if getattr(user, 'is_suspended', False):
+        return jsonify({"message": "Your account has been suspended by an administrator."}), 403
+
+    # Upgrade hashes made with an older method or cost while we have the plaintext
+    if password_hasher.needs_rehash(user.password_hash):
+        try:
+            user.password_hash = password_hasher.hash(password)
+            db.session.commit()
+        except HasherBusy:
+            pass  # the password checked out; upgrade on a later login instead of failing this one
+
+    token = jwt.encode({
+        'user_id': user.id,
+        'exp': datetime.utcnow() + timedelta(hours=24)
+    }, current_app.config['SECRET_KEY'], algorithm="HS256")
+
+    return jsonify({"token": token, "user": user.to_dict()}), 200
+
+@bp.route('/api/profile', methods=['GET'])
+@token_required
+def get_profile(current_user):
+    return jsonify({"user": current_user.to_dict()}), 200
+
+@bp.route('/api/add_skills', methods=['POST'])
+@token_required
+def add_skills(current_user):
+    data = request.get_json()
+    skills_list = data.get('skills', [])
+    interests_list = data.get('interests', [])
+
+    # Clear old skills and interests for simplicity of update
+    Skill.query.filter_by(user_id=current_user.id).delete()
+    Interest.query.filter_by(user_id=current_user.id).delete()
+
+    skills_count = 0
+    for skill_name in skills_list:
+        if skill_name.strip():
+            db.session.add(Skill(user_id=current_user.id, skill_name=skill_name.strip().lower()))
+            skills_count += 1
+            
+    interests_count = 0
+    for interest_name in interests_list:
+        if interest_name.strip():
+            db.session.add(Interest(user_id=current_user.id, interest_name=interest_name.strip().lower()))
+            interests_count += 1
+            
+    # The lists are replaced wholesale, so the counters are too
+    current_user.skills_count = skills_count
+    current_user.interests_count = interests_count
+    current_user.skills_updated_at = datetime.utcnow()
+    db.session.commit()
+    auth_cache.invalidate(current_user.id)
+    index = loaded_skill_index()
+    if index:
+        index.update_user(current_user.id, [s.strip().lower() for s in skills_list])
+    return jsonify({"message": "Skills and interests updated successfully", "user": current_user.to_dict()}), 200
+
+# --- 2. SMART STUDENT MATCHING (Recommend Project Partners) ---
+@bp.route('/api/recommend_students', methods=['GET'])
+@token_required
+def recommend_students(current_user):
+    # Precomputed partners from the offline job, one indexed lookup joined to User
+    stored = PartnerRecommendation.query.options(
+        joinedload(PartnerRecommendation.partner).selectinload(User.skills),
+        joinedload(PartnerRecommendation.partner).selectinload(User.interests)
+    ).filter_by(user_id=current_user.id).order_by(PartnerRecommendation.rank).limit(5).all()
+
+    skills_changed = stored and current_user.skills_updated_at and current_user.skills_updated_at > stored[0].computed_at
+    if stored and not skills_changed:
+        recommendations = []
+        for rec in stored:
+            match_dict = rec.partner.to_dict()
+            match_dict['similarity_score'] = round(rec.score * 100, 2)
+            recommendations.append(match_dict)
+        return jsonify({"recommendations": recommendations}), 200
+
+    # Machine Learning Details: cosine similarity between binary skill vectors,
+    # computed for this user's row only against the sparse skill index
+    from skill_index import skill_index
+    index = skill_index.ensure_built()
+    # add_skills only updates the index of the worker that served it, so take
+    # this user's vector from their Skill rows rather than a stale row here
+    index.update_user(current_user.id, [s.skill_name for s in current_user.skills])
+    matches = index.similar(current_user.id, k=5)
+    if not matches:
+        return jsonify({"recommendations": []}), 200
+
+    match_users = User.query.options(
+        selectinload(User.skills), selectinload(User.interests)
+    ).filter(User.id.in_([uid for uid, _ in matches])).all()
+    users_by_id = {u.id: u for u in match_users}
+
+    recommendations = []
+    for uid, sim_score in matches:
+        match_user = users_by_id.get(uid)
+        if match_user:
+            match_dict = match_user.to_dict()
+            match_dict['similarity_score'] = round(sim_score * 100, 2)
+            recommendations.append(match_dict)
+
+    return jsonify({"recommendations": recommendations}), 200
+
+def _recompute_recommendations_job(full, progress):
+    from recommendations import recompute_recommendations
+    run = recompute_recommendations(full=full, progress=progress)
+    return {"run": run.to_dict()}
+
+@job_type('recompute_recommendations')
+def recompute_recommendations_job(progress):
+    return _recompute_recommendations_job(False, progress)
+
+@job_type('recompute_recommendations_full')
+def recompute_recommendations_full_job(progress):
+    return _recompute_recommendations_job(True, progress)
+
+@bp.route('/api/admin/recompute_recommendations', methods=['POST'])
+@admin_required
+def recompute_recommendations_admin(current_user):
+    data = request.get_json(silent=True) or {}
+    full = bool(data.get('full', False))
+    job, created = job_runner.submit('recompute_recommendations_full' if full else 'recompute_recommendations',
+                                     requested_by=current_user.id)
+    if created:
+        log_admin_action(current_user.id, f"Started recomputing partner recommendations ({'full' if full else 'partial'})")
+    message = "Recommendation recompute started." if created else "A recommendation recompute is already running."
+    return jsonify({"message": message, "job_id": job.id, "state": job.state}), 202
+
+@bp.cli.command('recompute-recommendations')
+@click.option('--full', is_flag=True, help='Recompute every user instead of only those whose skills changed.')
+@click.option('--k', type=int, help='Partners stored per user (default 10).')
+@click.option('--block-size', type=int, help='Rows multiplied per block (default 256).')
+@click.option('--trace-memory', is_flag=True, help='Report peak memory via tracemalloc (slower).')
+def recompute_recommendations_command(full, k, block_size, trace_memory):
+    """Materialise top-k partner recommendations for every student."""
+    from recommendations import recompute_recommendations, DEFAULT_TOP_K, DEFAULT_BLOCK_SIZE
+    run = recompute_recommendations(full=full, k=k or DEFAULT_TOP_K, block_size=block_size or DEFAULT_BLOCK_SIZE,
+                                    trace_memory=trace_memory)
+    summary = f"{run.mode} run: {run.users_processed} users, {run.users_per_sec or 0:.1f} users/sec"
+    if run.peak_memory_mb is not None:
+        summary += f", peak memory {run.peak_memory_mb:.1f} MB"
+    click.echo(summary)
+
+@bp.route('/api/admin/rebuild_skill_index', methods=['POST'])
+@admin_required
+def rebuild_skill_index_admin(current_user):
+    from skill_index import skill_index
+    skill_index.request_rebuild()
+    log_admin_action(current_user.id, "Requested a skill index rebuild")
+    return jsonify({"message": "Every worker rebuilds its skill index on next use"}), 202
+
+@bp.cli.command('rebuild-skill-index')
+def rebuild_skill_index_command():
+    """Make every worker rebuild its skill index on next use.
+
+    The rebuilt index is private to each worker; `kill -HUP` on the gunicorn
+    master instead rebuilds it once and re-forks workers that share it.
+    """
+    from skill_index import skill_index
+    skill_index.request_rebuild()
+    click.echo("Skill index rebuild requested.")
+
+# --- 3. EVENT SYSTEM ---
+@bp.route('/api/create_event', methods=['POST'])
+@token_required
+def create_event(current_user):
+    data = request.get_json()
+    new_event = Event(
+        creator_id=current_user.id,
+        title=data.get('title'),
+        description=data.get('description'),
+        date=data.get('date'),
+        tags=data.get('tags', '')
+    )
+    db.session.add(new_event)
+    increment(current_user.id, events_created_count=1)
+    db.session.commit()
+    return jsonify({"message": "Event created successfully", "event": new_event.to_dict()}), 201
+
+@bp.route('/api/events', methods=['GET'])
+def get_events():
+    events = Event.query.all()
+    return jsonify({"events": [e.to_dict() for e in events]}), 200
+
+@bp.route('/api/admin/event/<int:event_id>', methods=['DELETE'])
+@admin_required
+def delete_event_admin(current_user, event_id):
+    event = Event.query.get(event_id)
+    if not event:
+        return jsonify({"message": "Event not found"}), 404
+        
+    title = event.title
+    increment(event.creator_id, events_created_count=-1)
+    db.session.delete(event)
+    db.session.commit()
+    
+    log_admin_action(current_user.id, f"Deleted event: {title}", target_id=None)
+    
+    return jsonify({"message": "Event removed successfully"}), 200
+
+@bp.route('/api/join_event', methods=['POST'])
+@token_required
+def join_event(current_user):
+    data = request.get_json()
+    event_id = data.get('event_id')
+    
+    event = Event.query.get(event_id)
+    if not event:
+        return jsonify({"message": "Event not found"}), 404
+        
+    if EventParticipant.query.filter_by(event_id=event_id, user_id=current_user.id).first():
+        return jsonify({"message": "Already joined"}), 400
+        
+    participant = EventParticipant(event_id=event_id, user_id=current_user.id)
+    db.session.add(participant)
+    db.session.commit()
+    
+    return jsonify({"message": "Joined event successfully"}), 200
+
+# --- 4. Fake Profile Detection & Trust Score ---
+
+@bp.route('/api/trust_score/<int:user_id>', methods=['GET'])
+@token_required
+def get_trust_score(current_user, user_id):
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+        
+    # Derived from the activity counters, so reading it costs nothing and writes nothing
+    return jsonify({"trust_score": user_trust_score(user)}), 200
+
+@job_type('fake_detection')
+def fake_detection_job(progress):
+    # Features come from the activity counters in one query, scores are
+    # written back with one bulk UPDATE
+    from fake_detection import run_fake_detection_scan
+    suspicious_count = run_fake_detection_scan(progress)
+    if suspicious_count is None:
+        return {"flagged": 0, "message": "Not enough users for ML detection."}
+    return {"flagged": suspicious_count, "message": f"Detection complete. {suspicious_count} accounts flagged."}
+
+@bp.route('/api/admin/run_fake_detection', methods=['POST'])
+@admin_required
+def run_fake_detection(current_user):
+    job, created = job_runner.submit('fake_detection', requested_by=current_user.id)
+    message = "Detection scan started." if created else "A detection scan is already running."
+    return jsonify({"message": message, "job_id": job.id, "state": job.state}), 202
+
+@bp.route('/api/admin/jobs/<int:job_id>', methods=['GET'])
+@admin_required
+def get_job(current_user, job_id):
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({"message": "Job not found"}), 404
+    return jsonify({"job": job.to_dict()}), 200
+
+@bp.route('/api/admin/users', methods=['GET'])
+@admin_required
+def get_all_users(current_user):
+    users = User.query.all()
+    return jsonify({"users": [u.to_dict() for u in users]}), 200
+
+@bp.route('/api/admin/suspend/<int:user_id>', methods=['POST'])
+@admin_required
+def toggle_suspend_user(current_user, user_id):
+    user = User.query.get(user_id)
+    if not user:
+         return jsonify({"message": "User not found"}), 404
+    
+    # Toggle suspension
+    new_status = not getattr(user, 'is_suspended', False)
+    user.is_suspended = new_status
+    db.session.commit()
+    auth_cache.invalidate(user.id)
+    
+    action = f"Suspended account" if new_status else f"Unsuspended account"
+    log_admin_action(current_user.id, action, target_id=user.id)
+    
+    return jsonify({"message": f"User {user.name} suspension status set to {new_status}"}), 200
+
+@bp.route('/api/admin/user/<int:user_id>', methods=['DELETE'])
+@admin_required
+def delete_user(current_user, user_id):
+    user = User.query.get(user_id)
+    if not user:
+         return jsonify({"message": "User not found"}), 404
+         
+    if user.is_admin and user.id == current_user.id:
+         return jsonify({"message": "Cannot delete yourself"}), 400
+         
+    name = user.name
+    # Messages reference the user and their conversations, so they go first,
+    # taken off the other side's counters (one UPDATE per direction)
+    for counter, own, other in (('messages_received_count', Message.sender_id, Message.receiver_id),
+                                ('messages_sent_count', Message.receiver_id, Message.sender_id)):
+        exchanged = db.session.query(func.count(Message.id)).filter(own == user_id, other == User.id).scalar_subquery()
+        User.query.filter(User.id.in_(db.session.query(other).filter(own == user_id))).update(
+            {counter: getattr(User, counter) - exchanged}, synchronize_session=False)
+    conversations = Conversation.query.filter(
+        (Conversation.user_low_id == user_id) | (Conversation.user_high_id == user_id)
+    )
+    conversations.update({"last_message_id": None}, synchronize_session=False)
+    Message.query.filter(
+        (Message.sender_id == user_id) | (Message.receiver_id == user_id)
+    ).delete(synchronize_session=False)
+    conversations.delete(synchronize_session=False)
+    PartnerRecommendation.query.filter(
+        (PartnerRecommendation.user_id == user_id) | (PartnerRecommendation.partner_id == user_id)
+    ).delete(synchronize_session=False)
+    db.session.delete(user)
+    db.session.commit()
+    auth_cache.invalidate(user_id)
+    index = loaded_skill_index()
+    if index:
+        index.remove_user(user_id)
+    
+    log_admin_action(current_user.id, f"Deleted user account: {name}", target_id=user_id)
+    
+    return jsonify({"message": "User deleted successfully"}), 200
+
+@bp.route('/api/admin/stats', methods=['GET'])
+@admin_required
+def get_admin_stats(current_user):
+    total_users = User.query.count()
+    active_users_today = User.query.count() # Mocked for MVP
+    total_events = Event.query.count()
+    total_messages = Message.query.count()
+    fake_accounts = User.query.filter_by(is_suspicious=True).count()
+    
+    return jsonify({
+        "stats": {
+            "total_users": total_users,
+            "active_users_today": active_users_today,
+            "total_events": total_events,
+            "total_messages": total_messages,
+            "fake_accounts": fake_accounts
+        }
+    }), 200
+
+@bp.route('/api/admin/auth_cache', methods=['GET'])
+@admin_required
+def get_auth_cache_stats(current_user):
+    # Counters are per worker process
+    return jsonify({"auth_cache": auth_cache.stats()}), 200
+
+def metric_gauges():
+    # Per-process values reported alongside the request metrics (see metrics.py)
+    cache = auth_cache.stats()
+    return [
+        ('auth_cache_hits', 'Auth cache hits since start.', cache['hits']),
+        ('auth_cache_misses', 'Auth cache misses since start.', cache['misses']),
+        ('auth_cache_entries', 'Users currently in the auth cache.', cache['size']),
+        ('password_hash_in_flight', 'Password hashes running or queued.', password_hasher.in_flight),
+        ('password_hash_rejected', 'Password hashes refused because the pool was full.', password_hasher.rejected),
+        ('stream_connections', 'Open /api/stream connections.', broker.connections),
+    ]
+
+@bp.route('/api/admin/metrics', methods=['GET'])
+@admin_required
+def get_metrics(current_user):
+    # Prometheus text format, every worker's series labelled with its pid
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/api/admin/profile', methods=['GET'])
+@admin_required
+def get_profile_session(current_user):
+    return jsonify(profiler.status()), 200
+
+@bp.route('/api/admin/profile', methods=['POST'])
+@admin_required
+def start_profile_session(current_user):
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode', 'sample')
+    endpoint = data.get('endpoint') or None
+    try:
+        fraction = float(data.get('fraction', 1.0))
+        seconds = int(data.get('seconds', 60))
+    except (TypeError, ValueError):
+        return jsonify({"message": "fraction and seconds must be numbers"}), 400
+    if mode not in PROFILE_MODES:
+        return jsonify({"message": f"mode must be one of {', '.join(PROFILE_MODES)}"}), 400
+    if not 0 < fraction <= 1:
+        return jsonify({"message": "fraction must be in (0, 1]"}), 400
+    if not 0 < seconds <= current_app.config['PROFILE_MAX_SECONDS']:
+        return jsonify({"message": f"seconds must be between 1 and {current_app.config['PROFILE_MAX_SECONDS']}"}), 400
+    if endpoint and endpoint not in current_app.view_functions:
+        return jsonify({"message": f"Unknown endpoint {endpoint}"}), 400
+
+    session = profiler.start(mode, fraction, endpoint, seconds)
+    log_admin_action(current_user.id, f"Started {mode} profiling for {seconds}s")
+    return jsonify({"message": "Profiling started", "session": session}), 201
+
+@bp.route('/api/admin/profile', methods=['DELETE'])
+@admin_required
+def stop_profile_session(current_user):
+    session = profiler.stop()
+    if session is None:
+        return jsonify({"message": "No profiling session is running"}), 404
+    log_admin_action(current_user.id, f"Stopped {session['mode']} profiling")
+    return jsonify({"message": "Profiling stopped", "session": session}), 200
+
+@bp.route('/api/admin/profile/download', methods=['GET'])
+@admin_required
+def download_profile(current_user):
+    # Workers write their results once a second, so the last second may be missing
+    mode, results = profiler.results(request.args.get('session'))
+    if mode is None:
+        return jsonify({"message": "No profile data yet"}), 404
+    if mode == 'sample':
+        # Collapsed stacks: feed to flamegraph.pl or load into speedscope
+        return Response(results, mimetype='text/plain',
+                        headers={'Content-Disposition': 'attachment; filename=profile.collapsed'})
+    if request.args.get('format') == 'text':
+        import io
+        out = io.StringIO()
+        results.stream = out
+        results.sort_stats('cumulative').print_stats(50)
+        return Response(out.getvalue(), mimetype='text/plain')
+    import marshal
+    # The same format as pstats.Stats.dump_stats, for snakeviz or pstats
+    return Response(marshal.dumps(results.stats), mimetype='application/octet-stream',
+                    headers={'Content-Disposition': 'attachment; filename=profile.pstats'})
+
+@bp.route('/api/admin/send_warning', methods=['POST'])
+@admin_required
+def send_admin_warning(current_user):
+    data = request.get_json()
+    user_id = data.get('user_id')
+    message = data.get('message', 'Warning from Administrator')
+    
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+        
+    warning_msg = Message(sender_id=current_user.id, receiver_id=user.id, content=f"[ADMIN WARNING]: {message}")
+    db.session.add(warning_msg)
+    record_message(warning_msg)
+    record_message_counts(warning_msg)
+    db.session.commit()
+    broker.publish(user.id, 'message', warning_msg.to_dict())
+    
+    log_admin_action(current_user.id, "Sent warning message", target_id=user_id)
+    
+    return jsonify({"message": "Warning sent"}), 200
+
+@bp.route('/api/admin/reset_password/<int:user_id>', methods=['POST'])
+@admin_required
+def reset_user_password(current_user, user_id):
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+        
+    # Reset to default
+    default_pw = "password123"
+    user.password_hash = password_hasher.hash(default_pw)
+    db.session.commit()
+    
+    log_admin_action(current_user.id, "Reset password", target_id=user_id)
+    
+    return jsonify({"message": f"Password for {user.name} reset to: {default_pw}"}), 200
+
+# --- 5. Messaging System ---
+@bp.route('/api/chat', methods=['POST'])
+@token_required
+def send_message(current_user):
+    data = request.get_json()
+    receiver_id = data.get('receiver_id')
+    content = data.get('content')
+
+    if not receiver_id or not content:
+        return jsonify({"message": "Missing fields"}), 400
+
+    new_msg = Message(
+        sender_id=current_user.id,
+        receiver_id=receiver_id,
+        content=content
+    )
+    db.session.add(new_msg)
+    record_message(new_msg)
+    record_message_counts(new_msg)
+    db.session.commit()
+
+    broker.publish(new_msg.receiver_id, 'message', new_msg.to_dict())
+    if new_msg.receiver_id != current_user.id:
+        broker.publish(current_user.id, 'message', new_msg.to_dict())
+    return jsonify({"message": "Message sent"}), 201
+
+CHAT_PAGE_SIZE = 50
+CHAT_MAX_PAGE_SIZE = 200
+
+@bp.route('/api/chat/<int:user_id>', methods=['GET'])
+@token_required
+def get_chat(current_user, user_id):
+    limit = min(request.args.get('limit', CHAT_PAGE_SIZE, type=int), CHAT_MAX_PAGE_SIZE)
+    if limit < 1:
+        return jsonify({"message": "limit must be positive"}), 400
+
+    conversation = get_conversation(current_user.id, user_id)
+    if conversation is None:
+        return jsonify({"messages": [], "has_more": False}), 200
+
+    # ?before_id= pages back through history, ?after_id= fetches newer messages
+    anchors = {}
+    for param in ('before_id', 'after_id'):
+        anchor_id = request.args.get(param, type=int)
+        if anchor_id is not None:
+            anchor = db.session.get(Message, anchor_id)
+            if not anchor or anchor.conversation_id != conversation.id:
+                return jsonify({"message": "Message not found"}), 404
+            anchors[param] = anchor
+
+    messages, has_more = message_page(
+        conversation.id, before=anchors.get('before_id'), after=anchors.get('after_id'), limit=limit
+    )
+
+    # Opening the conversation reads it
+    mark_read(current_user.id, user_id)
+    
+    return jsonify({"messages": [m.to_dict() for m in messages], "has_more": has_more}), 200
+
+@bp.route('/api/stream', methods=['GET'])
+def event_stream():
+    """Server-Sent Events channel pushing new messages, likes and comments.
+
+    EventSource cannot set headers, so the JWT may also be passed as ?token=.
+    Clients resume with Last-Event-ID (or ?last_event_id=) after reconnecting;
+    a 'resync' event means the gap could not be replayed and the client should
+    re-fetch. At most STREAM_MAX_CONNECTIONS streams are served per worker
+    process. Beyond that the client gets a 'busy' event and a retry: hint of
+    STREAM_BUSY_RETRY_SECONDS, and the stream closes; EventSource reconnects
+    by itself then (a 503 would stop it for good) and polls meanwhile.
+    """
+    current_user, error = authenticate(request.args.get('token') or bearer_token())
+    if error:
+        return error
+    user_id = current_user.id
+    sse_headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+    sub = broker.subscribe(user_id)
+    if sub is None:
+        retry = current_app.config['STREAM_BUSY_RETRY_SECONDS']
+        body = f"retry: {retry * 1000}\nevent: busy\ndata: {json.dumps({'retry_after': retry})}\n\n"
+        return Response(body, mimetype='text/event-stream', headers=sse_headers)
+
+    try:
+        # The cached auth check may be up to AUTH_CACHE_TTL old: a user suspended
+        # in the meantime must not keep an open channel
+        auth_cache.invalidate(user_id)
+        current_user = auth_cache.get(user_id)
+        if current_user is None or current_user.is_suspended:
+            broker.unsubscribe(sub)
+            return jsonify({'message': 'Your account has been suspended by an administrator.'}), 403
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        missed, resync = broker.replay(user_id, last_event_id) if last_event_id else ([], False)
+    except Exception:
+        broker.unsubscribe(sub)
+        raise
+    heartbeat = current_app.config['STREAM_HEARTBEAT_SECONDS']
+    app = current_app._get_current_object()
+
+    def still_allowed():
+        with app.app_context():
+            user = auth_cache.get(user_id)
+            return user is not None and not user.is_suspended
+
+    def generate():
+        try:
+            yield f"retry: {heartbeat * 1000}\n\n"
+            if resync:
+                yield "event: resync\ndata: {}\n\n"
+            replayed = set()
+            for event in missed:
+                replayed.add(event['id'])
+                yield format_sse(event)
+            while not sub.closed:
+                try:
+                    event = sub.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    if not still_allowed():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                # Published while the replay query ran: already sent
+                if event['id'] in replayed:
+                    continue
+                yield format_sse(event)
+        finally:
+            broker.unsubscribe(sub)
+
+    return Response(generate(), mimetype='text/event-stream', headers=sse_headers)
+
+# --- 6. Skill Gap Analyzer ---
+
+# Dummy recommendations dataset for course mapping, built once at import
+COURSE_CATALOG = {
+    "python": "Python for Data Science Bootcamp",
+    "machine learning": "Intro to Machine Learning with Scikit-Learn",
+    "sql": "SQL Database Masterclass",
+    "docker": "Docker & Kubernetes Basics",
+    "react": "React.js Frontend Development",
+    "aws": "AWS Certified Cloud Practitioner",
+    "java": "Java Programming Fundamentals"
+}
+
+@bp.route('/api/projects', methods=['GET'])
+@token_required
+def get_projects(current_user):
+    projects = ProjectRequirement.query.all()
+    return jsonify({"projects": [p.to_dict() for p in projects]}), 200
+
+@bp.route('/api/skill_gap', methods=['POST'])
+@token_required
+def analyze_skill_gap(current_user):
+    data = request.get_json()
+    project_id = data.get('project_id')
+
+    if not project_id:
+        return jsonify({"message": "Project ID required"}), 400
+
+    project = ProjectRequirement.query.get(project_id)
+    if not project:
+        return jsonify({"message": "Project not found"}), 404
+
+    req_skills = [s.strip().lower() for s in project.required_skills.split(',') if s.strip()]
+    user_skills = [s.skill_name.lower() for s in current_user.skills]
+
+    # Use MultiLabelBinarizer to convert skills to binary vectors
+    from sklearn.preprocessing import MultiLabelBinarizer
+    mlb = MultiLabelBinarizer()
+    
+    # Fit on all possible skills in this space (union of both)
+    all_skills = list(set(req_skills + user_skills))
+    
+    if not all_skills:
+        return jsonify({"match_score": 0, "missing_skills": req_skills, "recommended_courses": []}), 200
+
+    # We binarize the lists of skills
+    mlb.fit([all_skills])
+    
+    req_vec = mlb.transform([req_skills])[0]
+    user_vec = mlb.transform([user_skills])[0]
+    
+    # Calculate missing skills: where req_vec is 1 and user_vec is 0
+    missing_mask = (req_vec == 1) & (user_vec == 0)
+    
+    # Retrieve the names of the missing skills
+    missing_skill_names = mlb.classes_[missing_mask].tolist()
+    
+    # Calculate match score
+    total_required = sum(req_vec)
+    if total_required == 0:
+         match_score = 100
+    else:
+         match_score = int(((total_required - len(missing_skill_names)) / total_required) * 100)
+
+    recommended_courses = []
+    for skill in missing_skill_names:
+        course = COURSE_CATALOG.get(skill, f"Foundations of {skill.capitalize()}")
+        recommended_courses.append(course)
+
+    return jsonify({
+        "match_score": match_score,
+        "missing_skills": [s.title() for s in missing_skill_names],
+        "recommended_courses": recommended_courses
+    }), 200
+
+# --- 7. Attendance Tracker & ML Risk Prediction ---
+
+@bp.route('/api/attendance_summary/<int:user_id>', methods=['GET'])
+@token_required
+def get_attendance_summary(current_user, user_id):
+    if current_user.id != user_id and not current_user.is_admin:
+        return jsonify({"message": "Unauthorized"}), 403
+        
+    records = AttendanceRecord.query.filter_by(user_id=user_id).all()
+    summary = []
+    
+    for r in records:
+        subj = r.subject
+        perc = (r.classes_attended / subj.total_classes) * 100 if subj.total_classes > 0 else 0
+        
+        # Bunkable classes: (total * 0.25) allowed misses - (total - attended) actual misses
+        allowed_misses = int(subj.total_classes * 0.25)
+        actual_misses = subj.total_classes - r.classes_attended
+        can_bunk_more = allowed_misses - actual_misses
+        
+        status = "Safe"
+        if can_bunk_more < 0:
+            status = "Low Attendance"
+        elif can_bunk_more <= 2:
+            status = "Risk"
+            
+        summary.append({
+            "subject_id": subj.id,
+            "subject": subj.subject_name,
+            "attendance_percentage": round(perc, 2),
+            "classes_attended": r.classes_attended,
+            "total_classes": subj.total_classes,
+            "can_bunk_more": can_bunk_more,
+            "status": status,
+            "recent_absences_last_5": r.recent_absences_last_5,
+            "days_since_last_present": r.days_since_last_present
+        })
+        
+    return jsonify({"attendance": summary}), 200
+
+LOW_ATTENDANCE_THRESHOLD = 75
+LOW_ATTENDANCE_MAX_PAGE_SIZE = 500
+
+@bp.route('/api/admin/low_attendance', methods=['GET'])
+@admin_required
+def get_low_attendance(current_user):
+    threshold = request.args.get('threshold', LOW_ATTENDANCE_THRESHOLD, type=float)
+    if not 0 <= threshold <= 100:
+        return jsonify({"message": "threshold must be between 0 and 100"}), 400
+    branch = request.args.get('branch')
+    year = request.args.get('year')
+    # Without per_page every matching student is returned, as before
+    per_page = request.args.get('per_page', type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    # Totals per student in one GROUP BY over the record/subject join
+    total_classes = func.sum(Subject.total_classes)
+    total_attended = func.sum(AttendanceRecord.classes_attended)
+    query = db.session.query(User.id, User.name, total_attended, total_classes) \
+        .join(AttendanceRecord, AttendanceRecord.user_id == User.id) \
+        .join(Subject, AttendanceRecord.subject_id == Subject.id) \
+        .filter(User.is_admin.isnot(True))
+    if branch:
+        query = query.filter(User.branch == branch)
+    if year:
+        query = query.filter(User.year == year)
+    query = query.group_by(User.id, User.name) \
+        .having(total_classes > 0, total_attended * 100.0 < total_classes * threshold) \
+        .order_by(User.id)
+
+    if per_page is not None:
+        per_page = min(max(per_page, 1), LOW_ATTENDANCE_MAX_PAGE_SIZE)
+        # One extra row tells us whether another page exists
+        query = query.offset((page - 1) * per_page).limit(per_page + 1)
+    rows = query.all()
+
+    has_more = per_page is not None and len(rows) > per_page
+    low_attendance_data = []
+    for user_id, name, attended, total in rows[:per_page]:
+        # MySQL returns SUM() as Decimal
+        overall_perc = (float(attended) / float(total)) * 100
+        low_attendance_data.append({
+            "user_id": user_id,
+            "name": name,
+            "overall_attendance": round(overall_perc, 2),
+            "status": "Low Attendance" if overall_perc < 65 else "Risk"
+        })
+
+    response = {"low_attendance": low_attendance_data}
+    if per_page is not None:
+        response.update({"page": page, "per_page": per_page, "has_more": has_more})
+    return jsonify(response), 200
+
+@bp.route('/api/mark_attendance', methods=['POST'])
+@token_required
+def mark_attendance(current_user):
+    data = request.get_json()
+    subject_id = data.get('subject_id')
+    attended = data.get('attended', True) # boolean for this single class
+    
+    record = AttendanceRecord.query.filter_by(user_id=current_user.id, subject_id=subject_id).first()
+    if not record:
+        return jsonify({"message": "Record not found"}), 404
+        
+    # Logic simulating a new class occurring. Every student of the subject
+    # shares its row, so increment in SQL rather than read-modify-write
+    Subject.query.filter_by(id=record.subject_id).update(
+        {"total_classes": Subject.total_classes + 1}, synchronize_session=False
+    )
+    
+    if attended:
+        record.classes_attended += 1
+        record.days_since_last_present = 0
+        record.recent_absences_last_5 = max(0, record.recent_absences_last_5 - 1)
+    else:
+        record.days_since_last_present += 1
+        record.recent_absences_last_5 = min(5, record.recent_absences_last_5 + 1)
+        
+    db.session.commit()
+    return jsonify({"message": "Attendance marked successfully"}), 200
+
+@job_type('train_attendance_model')
+def train_attendance_model_job(progress):
+    # The job publishes the model to the registry; web workers pick it up from there
+    from attendance_model import train_attendance_classifier
+    meta, message = train_attendance_classifier(model_registry, progress)
+    return {"trained": meta is not None, "version": meta and meta['version'], "message": message}
+
+@bp.route('/api/train_attendance_model', methods=['POST'])
+@token_required
+def train_attendance_model(current_user):
+    if not current_user.is_admin:
+         return jsonify({"message": "Unauthorized"}), 403
+
+    job, created = job_runner.submit('train_attendance_model', requested_by=current_user.id)
+    message = "Model training started." if created else "Model training is already in progress."
+    return jsonify({"message": message, "job_id": job.id, "state": job.state}), 202
+
+@bp.cli.command('train-attendance-model')
+def train_attendance_model_command():
+    """Train the attendance risk model and publish it to the model registry."""
+    from attendance_model import train_attendance_classifier
+    meta, message = train_attendance_classifier(model_registry)
+    click.echo(message)
+    if meta:
+        click.echo(f"version={meta['version']} metrics={meta['metrics']}")
+
+@bp.route('/api/predict_attendance_risk/<int:user_id>', methods=['GET'])
+@token_required
+def predict_attendance_risk(current_user, user_id):
+    if current_user.id != user_id and not current_user.is_admin:
+        return jsonify({"message": "Unauthorized"}), 403
+
+    # Prediction never trains; it uses whatever version is current in the registry
+    from attendance_model import MODEL_NAME, score_records, prediction_rows
+    model, meta = model_registry.load(MODEL_NAME)
+    if model is None:
+        return jsonify({"message": "Attendance risk model has not been trained yet."}), 503
+
+    # One joined query for the student's records and one predict_proba call
+    records, X, risk = score_records(model, user_id)
+    predictions = prediction_rows(records, X, risk, range(len(risk)))
+    for p in predictions:
+        del p["user_id"], p["name"]
+        
+    return jsonify({"predictions": predictions, "model_version": meta['version']}), 200
+
+ATTENDANCE_RISK_PAGE_SIZE = 50
+ATTENDANCE_RISK_MAX_PAGE_SIZE = 500
+
+@bp.route('/api/admin/attendance_risk', methods=['GET'])
+@admin_required
+def get_attendance_risk(current_user):
+    from attendance_model import MODEL_NAME, score_records, prediction_rows, ranked_record_ids
+    model, meta = model_registry.load(MODEL_NAME)
+    if model is None:
+        return jsonify({"message": "Attendance risk model has not been trained yet."}), 503
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', ATTENDANCE_RISK_PAGE_SIZE, type=int), 1), ATTENDANCE_RISK_MAX_PAGE_SIZE)
+    order = request.args.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        return jsonify({"message": "order must be 'asc' or 'desc'"}), 400
+
+    # The campus-wide order is cached per model version and data watermark;
+    # only the requested page is scored again and turned into JSON
+    ranked = ranked_record_ids(model, meta['version'], descending=(order == 'desc'))
+    start = (page - 1) * per_page
+    page_ids = ranked[start:start + per_page].tolist()
+    records, X, risk = score_records(model, record_ids=page_ids)
+    row_of = {record_id: row for row, record_id in enumerate(records["id"].tolist())}
+    predictions = prediction_rows(records, X, risk, [row_of[i] for i in page_ids if i in row_of])
+
+    return jsonify({
+        "predictions": predictions,
+        "total": int(len(ranked)),
+        "page": page,
+        "per_page": per_page,
+        "model_version": meta['version']
+    }), 200
+
+@bp.cli.command('score-attendance-risk')
+@click.option('--output', type=click.File('w'), default='-', help='CSV file to write (default stdout).')
+@click.option('--order', type=click.Choice(['desc', 'asc']), default='desc', help='Sort by risk probability.')
+def score_attendance_risk_command(output, order):
+    """Score every attendance record with the current model and write CSV."""
+    from attendance_model import MODEL_NAME, score_records, prediction_rows, risk_order
+    model, meta = model_registry.load(MODEL_NAME)
+    if model is None:
+        raise click.ClickException("Attendance risk model has not been trained yet.")
+
+    records, X, risk = score_records(model)
+    positions = risk_order(risk, descending=(order == 'desc'))
+    fields = ["user_id", "name", "subject_id", "subject", "attendance_percentage", "risk_probability", "status", "recommendation"]
+    writer = csv.DictWriter(output, fieldnames=fields)
+    writer.writeheader()
+    # Rows are built and written in chunks so memory stays flat on large campuses
+    for start in range(0, len(positions), 5000):
+        writer.writerows(prediction_rows(records, X, risk, positions[start:start + 5000]))
+    click.echo(f"Scored {len(risk)} records with model {meta['version']}.", err=True)
+
+# --- 7. NEW SAAS FEATURES ---
+
+@bp.route('/uploads/<filename>')
+def uploaded_file(filename):
+    folder = current_app.config['UPLOAD_FOLDER']
+    path = safe_join(folder, filename)
+    if path is None:
+        abort(404)
+    try:
+        etag, immutable = upload_etag(filename, path)
+    except FileNotFoundError:
+        abort(404)
+    headers = {'Cache-Control': IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE}
+
+    # Answer revalidations before anything touches the file
+    if request.if_none_match.contains(etag):
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    sendfile_header = current_app.config['UPLOAD_SENDFILE_HEADER']
+    if sendfile_header:
+        # The front proxy sends the body itself, ranges included
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream', headers=headers)
+        prefix = current_app.config['UPLOAD_SENDFILE_PREFIX']
+        response.headers[sendfile_header] = prefix.rstrip('/') + '/' + filename if prefix else path
+    else:
+        # werkzeug handles Range/If-Range and streams the file
+        try:
+            response = send_file(path, etag=etag, conditional=True, max_age=None)
+        except FileNotFoundError:
+            abort(404)
+        response.headers.update(headers)
+        response.accept_ranges = 'bytes'
+    response.set_etag(etag)
+    return response
+
+@bp.route('/api/user/<int:user_id>', methods=['GET'])
+@token_required
+def get_public_profile(current_user, user_id):
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+        
+    return jsonify({
+        "id": user.id,
+        "name": user.name,
+        "branch": user.branch,
+        "year": user.year,
+        "bio": user.bio,
+        "trust_score": user_trust_score(user),
+        "profile_photo": sized_url(user.profile_photo, 'avatar'),
+        "profile_photo_original": user.profile_photo,
+        "skills": [s.skill_name for s in user.skills],
+        "interests": [i.interest_name for i in user.interests],
+        "events_created": user.events_created_count,
+        "posts_count": len(user.posts)
+    }), 200
+
+@bp.route('/api/upload_profile_photo', methods=['POST'])
+@token_required
+def upload_profile_photo(current_user):
+    if 'profile_photo' not in request.files:
+        return jsonify({"message": "No file part"}), 400
+    file = request.files['profile_photo']
+    if file.filename == '':
+        return jsonify({"message": "No selected file"}), 400
+        
+    if file:
+        url = store_upload(file)
+        
+        # update user
+        current_user.profile_photo = url
+        db.session.commit()
+        auth_cache.invalidate(current_user.id)
+        return jsonify({
+            "message": "Photo uploaded successfully",
+            "profile_photo_url": sized_url(url, 'avatar'),
+            "profile_photo_original": url
+        }), 200
+
+RECENT_CHATS_PAGE_SIZE = 50
+
+@bp.route('/api/recent_chats', methods=['GET'])
+@token_required
+def get_recent_chats(current_user):
+    limit = min(request.args.get('limit', RECENT_CHATS_PAGE_SIZE, type=int), RECENT_CHATS_PAGE_SIZE)
+    if limit < 1:
+        return jsonify({"message": "limit must be positive"}), 400
+
+    before = request.args.get('before')
+    if before:
+        try:
+            before = parse_cursor(before)
+        except ValueError:
+            return jsonify({"message": "Invalid cursor"}), 400
+
+    rows, has_more = recent_conversations(current_user.id, before, limit)
+
+    recent_chats = []
+    for conversation, other_user, latest_message, unread_count in rows:
+        recent_chats.append({
+            "other_user_id": other_user.id,
+            "other_user_name": other_user.name,
+            "other_user_photo": sized_url(other_user.profile_photo, 'avatar'),
+            "latest_message": latest_message,
+            "timestamp": conversation.last_timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            "is_unread": unread_count > 0,
+            "unread_count": unread_count
+        })
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1][0]
+        next_cursor = format_cursor(last.last_timestamp, last.id)
+                
+    return jsonify({"recent_chats": recent_chats, "next_cursor": next_cursor}), 200
+
+@bp.cli.command('repair-counters')
+def repair_counters_command():
+    """Rebuild the User activity counters from the skill, interest, event and message tables."""
+    drifted = repair_counters()
+    click.echo(f"Repaired counters for {drifted} users.")
+
+@bp.cli.command('rebuild-conversations')
+def rebuild_conversations_command():
+    """Rebuild the conversation summary table from all messages."""
+    count = rebuild_conversations()
+    click.echo(f"Rebuilt {count} conversations.")
+
+@bp.cli.command('generate-data')
+@click.option('--users', type=int, default=10000, show_default=True)
+@click.option('--messages', type=int, default=200000, show_default=True)
+@click.option('--posts', type=int, help='Default: 2 per user.')
+@click.option('--likes', type=int, help='Default: 5 per post.')
+@click.option('--comments', type=int, help='Default: 1 per post.')
+@click.option('--events', type=int, help='Default: 1 per 20 users.')
+@click.option('--connections-per-user', type=int, default=8, show_default=True)
+@click.option('--skills-per-user', type=float, default=4, show_default=True, help='Mean skills per student.')
+@click.option('--days', type=int, default=180, show_default=True, help='Span of post and message timestamps.')
+@click.option('--seed', type=int, default=42, show_default=True)
+@click.option('--end-date', type=click.DateTime(), help='Newest timestamp (default 2026-01-01, fixed so runs repeat).')
+@click.option('--batch-size', type=int, default=20000, show_default=True, help='Rows per executemany.')
+@click.confirmation_option(prompt='This drops every table in the configured database. Continue?')
+def generate_data_command(users, messages, posts, likes, comments, events, connections_per_user,
+                          skills_per_user, days, seed, end_date, batch_size):
+    """Replace the database with a deterministic synthetic dataset."""
+    from datagen import generate_dataset, DEFAULT_END, ADMIN_EMAIL, PASSWORD
+
+    def progress(step, rows, seconds):
+        click.echo(f"{step:>20} {rows:>10} rows {seconds:>8.1f}s")
+
+    generate_dataset(
+        users=users, messages=messages, posts=posts, likes=likes, comments=comments, events=events,
+        connections_per_user=connections_per_user, skills_per_user=skills_per_user, days=days,
+        seed=seed, end=end_date or DEFAULT_END, batch_size=batch_size,
+        timeline_length=current_app.config['TIMELINE_MAX_LENGTH'], progress=progress
+    )
+    click.echo(f"Done. Admin: {ADMIN_EMAIL}, students: user<N>@campus.edu; password {PASSWORD!r} for everyone.")
+
+@bp.route('/api/create_post', methods=['POST'])
+@token_required
+def create_post(current_user):
+    # Handle text or multipart form
+    content = request.form.get('content') or ""
+    if not content and request.is_json:
+        data = request.get_json()
+        content = data.get('content', '')
+        
+    image_url = None
+    if 'image' in request.files:
+        file = request.files['image']
+        if file and file.filename != '':
+            image_url = store_upload(file)
+            
+    if not content and not image_url:
+         return jsonify({"message": "Post cannot be empty"}), 400
+
+    new_post = Post(user_id=current_user.id, content=content, image_url=image_url)
+    db.session.add(new_post)
+    db.session.flush()
+    if current_app.config['FEED_MODE'] == 'timeline':
+        fan_out_post(new_post, current_app.config['TIMELINE_MAX_LENGTH'])
+    db.session.commit()
+    
+
+    return jsonify({"message": "Post created", "post": new_post.to_dict()}), 201
+
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+
+def parse_cursor(cursor):
+    # Keyset cursor format: "<timestamp ISO>,<row id>"
+    timestamp, row_id = cursor.rsplit(',', 1)
+    return datetime.fromisoformat(timestamp), int(row_id)
+
+def format_cursor(timestamp, row_id):
+    return f"{timestamp.isoformat()},{row_id}"
+
+@bp.route('/api/feed', methods=['GET'])
+@token_required
+def get_feed(current_user):
+    limit = min(request.args.get('limit', FEED_PAGE_SIZE, type=int), FEED_MAX_PAGE_SIZE)
+    if limit < 1:
+        return jsonify({"message": "limit must be positive"}), 400
+
+    before = request.args.get('before')
+    if before:
+        try:
+            before = parse_cursor(before)
+        except ValueError:
+            return jsonify({"message": "Invalid cursor"}), 400
+
+    # Authors and comments (with their authors) are loaded for the whole page
+    # up front, so a page costs the same few queries whatever its size.
+    query = Post.query.options(
+        joinedload(Post.author),
+        selectinload(Post.comments).joinedload(PostComment.author)
+    )
+
+    def page_from_posts(before, n):
+        # Keyset page straight from the post table
+        page = query
+        if before:
+            before_created_at, before_id = before
+            page = page.filter(
+                (Post.created_at < before_created_at) |
+                ((Post.created_at == before_created_at) & (Post.id < before_id))
+            )
+        return page.order_by(Post.created_at.desc(), Post.id.desc()).limit(n).all()
+
+    if current_app.config['FEED_MODE'] == 'timeline':
+        # Read the precomputed timeline instead of sorting the post table
+        post_ids, resume = timeline_post_ids(before, limit + 1, current_app.config['TIMELINE_MAX_LENGTH'])
+        posts_by_id = {p.id: p for p in query.filter(Post.id.in_(post_ids))} if post_ids else {}
+        posts = [posts_by_id[pid] for pid in post_ids if pid in posts_by_id]
+        if resume:
+            # Older than the trimmed timelines hold: carry on from the post table
+            posts += page_from_posts(resume, limit + 1 - len(post_ids))
+    else:
+        posts = page_from_posts(before, limit + 1)
+
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+
+    # Resolve user_has_liked for the whole page in one IN query
+    liked_ids = set()
+    if posts:
+        liked_ids = {post_id for (post_id,) in db.session.query(PostLike.post_id).filter(
+            PostLike.user_id == current_user.id,
+            PostLike.post_id.in_([p.id for p in posts])
+        )}
+
+    feed_data = []
+    for p in posts:
+        post_dict = p.to_dict()
+        post_dict['user_has_liked'] = p.id in liked_ids
+        post_dict['comments_data'] = [c.to_dict() for c in p.comments]
+        feed_data.append(post_dict)
+
+    return jsonify({
+        "feed": feed_data,
+        "next_cursor": format_cursor(posts[-1].created_at, posts[-1].id) if has_more else None
+    }), 200
+
+
+@bp.cli.command('backfill-timelines')
+def backfill_timelines_command():
+    """Rebuild the materialised feed timeline from existing posts."""
+    entries = backfill_timelines(current_app.config['TIMELINE_MAX_LENGTH'])
+    click.echo(f"Wrote {entries} timeline entries.")
+
+@bp.route('/api/like_post', methods=['POST'])
+@token_required
+def like_post(current_user):
+    data = request.get_json()
+    post_id = data.get('post_id')
+
+    post = Post.query.get(post_id)
+    if not post:
+         return jsonify({"message": "Post not found"}), 404
+         
+    existing_like = PostLike.query.filter_by(post_id=post.id, user_id=current_user.id).first()
+    
+    if existing_like:
+         db.session.delete(existing_like)
+         delta = -1
+         msg = "Unliked"
+    else:
+         new_like = PostLike(post_id=post.id, user_id=current_user.id)
+         db.session.add(new_like)
+         delta = 1
+         msg = "Liked"
+    # In SQL, so concurrent likes of the same post don't overwrite each other
+    Post.query.filter_by(id=post.id).update({"likes_count": Post.likes_count + delta}, synchronize_session=False)
+    db.session.commit()
+
+    if post.user_id != current_user.id:
+        broker.publish(post.user_id, 'like', {
+            "post_id": post.id,
+            "user_id": current_user.id,
+            "user_name": current_user.name,
+            "liked": msg == "Liked",
+            "likes_count": post.likes_count
+        })
+    return jsonify({"message": msg, "likes_count": post.likes_count}), 200
+
+@bp.route('/api/comment_post', methods=['POST'])
+@token_required
+def comment_post(current_user):
+    data = request.get_json()
+    post_id = data.get('post_id')
+    content = data.get('content')
+    
+    if not post_id or not content:
+         return jsonify({"message": "Missing fields"}), 400
+
+    post = db.session.get(Post, post_id)
+    if not post:
+         return jsonify({"message": "Post not found"}), 404
+         
+    comment = PostComment(post_id=post.id, user_id=current_user.id, content=content)
+    db.session.add(comment)
+    db.session.commit()
+
+    comment_dict = comment.to_dict()
+    if post.user_id != current_user.id:
+        broker.publish(post.user_id, 'comment', comment_dict)
+    
+    return jsonify({"message": "Comment added", "comment": comment_dict}), 201
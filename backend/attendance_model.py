@@ -0,0 +1,205 @@
+import hashlib
+import threading
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import log_loss
+from sqlalchemy import func
+
+from database import db
+from models import AttendanceRecord, Subject, User, Event, Skill
+
+# Registry name of the attendance risk classifier
+MODEL_NAME = 'attendance_risk'
+# Bump when feature_matrix changes so old versions aren't mistaken for current data
+FEATURE_VERSION = 1
+# Columns of the feature matrix, in model input order
+FEATURE_COLUMNS = [
+    'total_classes', 'classes_attended', 'recent_absences_last_5', 'attendance_percentage',
+    'days_since_last_present', 'events_created', 'skills'
+]
+
+
+def feature_matrix(user_id=None, record_ids=None):
+    """Load attendance features with one joined query.
+
+    Returns (records, X): records holds per-row arrays (record ids, user ids,
+    names, subject ids/names, total, attended) and X is the float matrix in
+    FEATURE_COLUMNS order. Pass user_id to restrict to one student, or
+    record_ids to specific records.
+    """
+    # Per-user counts are pre-aggregated so the join stays one row per record
+    events = db.session.query(Event.creator_id.label('user_id'), func.count().label('n')) \
+        .group_by(Event.creator_id).subquery()
+    skills = db.session.query(Skill.user_id.label('user_id'), func.count().label('n')) \
+        .group_by(Skill.user_id).subquery()
+
+    query = db.session.query(
+        AttendanceRecord.id, AttendanceRecord.user_id, User.name,
+        AttendanceRecord.subject_id, Subject.subject_name,
+        Subject.total_classes, AttendanceRecord.classes_attended,
+        AttendanceRecord.recent_absences_last_5, AttendanceRecord.days_since_last_present,
+        func.coalesce(events.c.n, 0), func.coalesce(skills.c.n, 0)
+    ).join(Subject, AttendanceRecord.subject_id == Subject.id) \
+     .join(User, AttendanceRecord.user_id == User.id) \
+     .outerjoin(events, events.c.user_id == AttendanceRecord.user_id) \
+     .outerjoin(skills, skills.c.user_id == AttendanceRecord.user_id)
+    if user_id is not None:
+        query = query.filter(AttendanceRecord.user_id == user_id)
+    if record_ids is not None:
+        query = query.filter(AttendanceRecord.id.in_(record_ids))
+    rows = query.order_by(AttendanceRecord.id).all()
+
+    columns = list(zip(*rows)) or [()] * 11
+    numeric = np.array(columns[5:], dtype=np.float64).reshape(6, len(rows))
+    total, attended, absences, days_since, num_events, num_skills = numeric
+    perc = np.divide(attended * 100, total, out=np.zeros_like(total), where=total > 0)
+
+    records = {
+        "id": np.array(columns[0], dtype=np.int64),
+        "user_id": np.array(columns[1], dtype=np.int64),
+        "name": columns[2],
+        "subject_id": np.array(columns[3], dtype=np.int64),
+        "subject": columns[4],
+        "total_classes": total,
+        "classes_attended": attended
+    }
+    X = np.column_stack([total, attended, absences, perc, days_since, num_events, num_skills])
+    return records, X
+
+
+def risk_status(risk_prob):
+    return "HIGH RISK" if risk_prob > 0.70 else ("Medium Risk" if risk_prob > 0.40 else "Safe")
+
+
+def recommendation(total, attended, perc):
+    if perc < 75:
+        x_needed = int(((0.75 * total) - attended) / 0.25)
+        if x_needed > 0:
+            return f"Attend next {x_needed} classes to stay safe."
+        return "Attend the next class to be safe."
+    return "You are on track."
+
+
+def score_records(model, user_id=None, record_ids=None):
+    """Score every record (or one student's, or the given ones) with a single predict_proba call.
+
+    Returns (records, X, risk) as produced by feature_matrix plus the risk
+    probability per row.
+    """
+    records, X = feature_matrix(user_id, record_ids)
+    risk = model.predict_proba(X)[:, 1] if len(X) else np.zeros(0)
+    return records, X, risk
+
+
+def prediction_rows(records, X, risk, order):
+    """Build the JSON/CSV rows for the given row positions."""
+    rows = []
+    for i in order:
+        total = records["total_classes"][i]
+        attended = records["classes_attended"][i]
+        perc = X[i, 3]
+        rows.append({
+            "user_id": int(records["user_id"][i]),
+            "name": records["name"][i],
+            "subject_id": int(records["subject_id"][i]),
+            "subject": records["subject"][i],
+            "attendance_percentage": round(float(perc), 2),
+            "risk_probability": round(float(risk[i]), 2),
+            "status": risk_status(risk[i]),
+            "recommendation": recommendation(total, attended, perc)
+        })
+    return rows
+
+
+def risk_order(risk, descending=True):
+    """Row positions sorted by risk; ties keep record id order."""
+    return np.argsort(-risk if descending else risk, kind='stable')
+
+
+def data_watermark():
+    """One aggregate query whose result changes whenever feature_matrix's input does.
+
+    Covers inserts and deletes (counts, max ids) and the in-place updates
+    mark_attendance makes (column sums) of every table the features read.
+    """
+    def totals(*columns):
+        return db.session.query(*columns).scalar_subquery()
+    return tuple(db.session.query(
+        totals(func.count(AttendanceRecord.id)), totals(func.max(AttendanceRecord.id)),
+        totals(func.sum(AttendanceRecord.classes_attended)), totals(func.sum(AttendanceRecord.recent_absences_last_5)),
+        totals(func.sum(AttendanceRecord.days_since_last_present)),
+        totals(func.count(Subject.id)), totals(func.sum(Subject.total_classes)),
+        totals(func.count(Event.id)), totals(func.max(Event.id)),
+        totals(func.count(Skill.id)), totals(func.max(Skill.id)),
+    ).one())
+
+
+# Per-process cache of the campus-wide risk ordering, see ranked_record_ids
+_ranking_lock = threading.Lock()
+_ranking = None  # ((model version, data watermark), {'desc': record ids, 'asc': record ids})
+
+
+def ranked_record_ids(model, version, descending=True):
+    """Every attendance record id, sorted by risk with the given model version.
+
+    Scoring the whole campus is the expensive part of a risk page, so the
+    ordering is kept until the model version or data_watermark() changes;
+    callers then score just the page's records.
+    """
+    global _ranking
+    key = (version, data_watermark())
+    with _ranking_lock:
+        if _ranking is None or _ranking[0] != key:
+            records, X, risk = score_records(model)
+            _ranking = (key, {
+                'desc': records["id"][risk_order(risk, descending=True)],
+                'asc': records["id"][risk_order(risk, descending=False)],
+            })
+        return _ranking[1]['desc' if descending else 'asc']
+
+
+def data_fingerprint(X, y):
+    """sha256 of the training matrix and labels, used to skip no-op retrains."""
+    digest = hashlib.sha256(f"features-v{FEATURE_VERSION}:{X.shape}".encode())
+    digest.update(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(y, dtype=np.int8).tobytes())
+    return digest.hexdigest()
+
+
+def train_attendance_classifier(registry, progress=None):
+    """Fit the attendance risk model on every AttendanceRecord and publish it.
+
+    Returns (metadata of the current version or None, message). Training is
+    skipped when the data fingerprint matches the current version.
+    """
+    progress = progress or (lambda fraction: None)
+    _, X = feature_matrix()
+    if len(X) < 5:
+        return None, "Not enough data to train."
+    progress(0.5)
+
+    # Target label (1 if < 75%, 0 otherwise)
+    y = (X[:, 3] < 75).astype(np.int8)
+
+    # In case the data is too homogeneous to split/predict properly
+    if len(set(y.tolist())) < 2:
+        return None, "Need both Safe and Risky profile data to train model."
+
+    fingerprint = data_fingerprint(X, y)
+    current = registry.metadata(MODEL_NAME)
+    if current and current['fingerprint'] == fingerprint:
+        return current, f"Training data unchanged; keeping model {current['version']}."
+
+    model = LogisticRegression(max_iter=1000)
+    model.fit(X, y)
+    progress(0.9)
+
+    metrics = {
+        "n_samples": int(len(y)),
+        "positive_rate": round(float(y.mean()), 4),
+        "train_accuracy": round(float(model.score(X, y)), 4),
+        "log_loss": round(float(log_loss(y, model.predict_proba(X))), 4)
+    }
+    meta = registry.save(MODEL_NAME, model, fingerprint, metrics)
+    return meta, f"Model {meta['version']} trained successfully."
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+from database import db
+from models import User
+
+# Fields the auth decorators need; everything else loads the full User on demand
+AUTH_FIELDS = ('id', 'is_admin', 'is_suspended')
+
+
+class AuthenticatedUser:
+    """Stand-in for the User passed to token_required/admin_required views.
+
+    id, is_admin and is_suspended come from the auth cache. Reading any other
+    attribute (name, skills, to_dict, ...) loads the ORM User once per request
+    and forwards to it, as does every assignment, so views can keep treating
+    current_user as a User.
+    """
+
+    def __init__(self, user_id, is_admin, is_suspended):
+        object.__setattr__(self, 'id', user_id)
+        object.__setattr__(self, 'is_admin', bool(is_admin))
+        object.__setattr__(self, 'is_suspended', bool(is_suspended))
+        object.__setattr__(self, '_user', None)
+
+    def _load(self):
+        user = object.__getattribute__(self, '_user')
+        if user is None:
+            user = db.session.get(User, self.id)
+            object.__setattr__(self, '_user', user)
+        return user
+
+    def __getattr__(self, name):
+        # Only called for attributes not set in __init__
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+        if name in AUTH_FIELDS:
+            object.__setattr__(self, name, value)
+
+
+class AuthCache:
+    """Bounded LRU of (id, is_admin, is_suspended) per user id with a TTL.
+
+    Entries are per process: invalidate() only reaches this worker, so a
+    change made through another worker is picked up when the entry expires
+    (ttl seconds at most).
+    """
+
+    def __init__(self, max_size=10000, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # user_id -> (expires_at, is_admin, is_suspended)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return an AuthenticatedUser, or None when the user doesn't exist."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return AuthenticatedUser(user_id, entry[1], entry[2])
+            self.misses += 1
+
+        # Only the auth columns, not the whole row
+        row = db.session.query(User.is_admin, User.is_suspended).filter(User.id == user_id).first()
+        if row is None:
+            self.invalidate(user_id)
+            return None
+
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, row.is_admin, row.is_suspended)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return AuthenticatedUser(user_id, row.is_admin, row.is_suspended)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                    "max_size": self.max_size, "ttl": self.ttl}
+
+
+auth_cache = AuthCache()
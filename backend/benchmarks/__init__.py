@@ -0,0 +1 @@
+"""Stand-alone performance benchmarks. Run from backend/, e.g. ``python -m benchmarks.fake_detection``."""
@@ -0,0 +1,100 @@
+"""Query count and wall time of campus-wide attendance risk scoring.
+
+    python -m benchmarks.attendance_risk                 # 1k, 10k and 100k records
+    python -m benchmarks.attendance_risk --sizes 5000 50000
+
+Each size gets a fresh SQLite database with five subjects per student and a
+model trained on it. The batch path (one joined query, one predict_proba
+call, argsort by risk) is compared with the per-record loop the single-user
+endpoint used to run, for sizes up to --legacy-max.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'campusconnect_bench_attendance_risk.db')
+REGISTRY_DIR = os.path.join(tempfile.gettempdir(), 'campusconnect_bench_models')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['MODEL_REGISTRY_DIR'] = REGISTRY_DIR
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import app  # noqa: E402
+from model_registry import model_registry  # noqa: E402
+from database import db  # noqa: E402
+from models import User, Skill, Subject, AttendanceRecord  # noqa: E402
+from attendance_model import MODEL_NAME, train_attendance_classifier, score_records, risk_order  # noqa: E402
+from benchmarks.fake_detection import measure  # noqa: E402
+
+SUBJECTS = 5
+
+
+def populate(n_records, seed=42):
+    rnd = random.Random(seed)
+    db.drop_all()
+    db.create_all()
+    n_users = max(n_records // SUBJECTS, 1)
+    db.session.execute(insert(User), [
+        {"name": f"User {i}", "email": f"user{i}@bench.edu", "password_hash": "x"} for i in range(1, n_users + 1)
+    ])
+    db.session.execute(insert(Subject), [
+        {"subject_name": f"Subject {i}", "total_classes": 40} for i in range(1, SUBJECTS + 1)
+    ])
+    skills, records = [], []
+    for uid in range(1, n_users + 1):
+        skills += [{"user_id": uid, "skill_name": f"skill{rnd.randint(1, 50)}"} for _ in range(rnd.randint(0, 5))]
+        for sid in range(1, SUBJECTS + 1):
+            records.append({
+                "user_id": uid, "subject_id": sid, "classes_attended": rnd.randint(15, 40),
+                "recent_absences_last_5": rnd.randint(0, 5), "days_since_last_present": rnd.randint(0, 10)
+            })
+    for model, rows in ((Skill, skills), (AttendanceRecord, records)):
+        for start in range(0, len(rows), 50000):
+            db.session.execute(insert(model), rows[start:start + 50000])
+    db.session.commit()
+
+
+def batch_score():
+    model, _ = model_registry.load(MODEL_NAME)
+    _, _, risk = score_records(model)
+    risk_order(risk)
+
+
+def legacy_score():
+    # What scoring everyone through the old per-record loop amounted to
+    model, _ = model_registry.load(MODEL_NAME)
+    for r in AttendanceRecord.query.all():
+        total = r.subject.total_classes
+        perc = (r.classes_attended / total) * 100 if total > 0 else 0
+        model.predict_proba([[total, r.classes_attended, r.recent_absences_last_5, perc,
+                              r.days_since_last_present, len(r.user.events_created), len(r.user.skills)]])
+    db.session.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--legacy-max', type=int, default=1000,
+                        help='largest size to also time the old per-record loop at')
+    args = parser.parse_args()
+
+    print(f"{'records':>8} {'variant':>10} {'queries':>9} {'seconds':>9}")
+    with app.app_context():
+        for n_records in args.sizes:
+            populate(n_records)
+            shutil.rmtree(REGISTRY_DIR, ignore_errors=True)
+            train_attendance_classifier(model_registry)
+            variants = [('batch', batch_score)]
+            if n_records <= args.legacy_max:
+                variants.append(('per-record', legacy_score))
+            for name, fn in variants:
+                queries, elapsed = measure(fn)
+                print(f"{n_records:>8} {name:>10} {queries:>9} {elapsed:>9.2f}")
+    os.remove(DB_PATH)
+    shutil.rmtree(REGISTRY_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,409 @@
+"""Latency, throughput and SQL query count per endpoint, checked against a baseline.
+
+    python -m benchmarks.endpoints                        # compare with the stored baseline
+    python -m benchmarks.endpoints --update-baseline      # record a new baseline
+    python -m benchmarks.endpoints --concurrent --threads 16
+    python -m benchmarks.endpoints --only feed chat --requests 200
+    python -m benchmarks.endpoints --audit                # list probable N+1 queries
+
+A dataset from datagen.generate_dataset (fixed seed) is written to a
+temporary SQLite database, the attendance model is trained and partner
+recommendations are precomputed. Every endpoint is then called --requests
+times in-process through the test client (or for --max-seconds, whichever
+ends first) after a few warm-up calls, in --rounds interleaved rounds.
+p50/p95 latency, the best round's p50, sequential requests/sec and the
+median and maximum queries per request are reported.
+
+--concurrent also runs the write endpoints (like_post, join_event,
+mark_attendance) from --threads threads at once, each thread acting as
+different users against the same few rows, and then checks the rows for
+lost updates. Any lost or duplicated write fails the run, and such a run
+is never written as the baseline.
+
+The baseline lives in benchmarks/baselines/endpoints.json. A run fails
+(exit status 1) when a read endpoint's best p50 is more than --threshold
+(default 30%) and --min-delta-ms above its baseline, or any endpoint issues
+more queries per request than the baseline did. Latencies depend on the
+machine, so record the baseline on the machine that runs the comparison.
+
+--audit instead calls each read endpoint twice with query_audit enabled
+and lists the statements repeated --repeat-threshold or more times in one
+request (probable N+1 patterns) with the code that issued them.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+WORK_DIR = tempfile.mkdtemp(prefix='campusconnect_bench_endpoints_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORK_DIR, 'bench.db')}"
+os.environ['MODEL_REGISTRY_DIR'] = os.path.join(WORK_DIR, 'models')
+
+import jwt  # noqa: E402
+from sqlalchemy import event, func  # noqa: E402
+
+from app import app  # noqa: E402
+from database import db  # noqa: E402
+from models import (Event, EventParticipant, Post, PostLike, Subject, AttendanceRecord,  # noqa: E402
+                    Conversation, ProjectRequirement)
+from model_registry import model_registry  # noqa: E402
+from query_audit import query_audit  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines', 'endpoints.json')
+DATASET = {"users": 2000, "messages": 50000, "seed": 42}
+WARMUP = 3
+MIN_SAMPLES = 5
+
+
+class QueryCounter:
+    """Counts statements on db.engine; per thread, so concurrent runs don't mix."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def __call__(self, *args):
+        self.local.count = getattr(self.local, 'count', 0) + 1
+
+    def take(self):
+        count = getattr(self.local, 'count', 0)
+        self.local.count = 0
+        return count
+
+
+def token_for(user_id):
+    # Same claims as /api/login, minted directly so setup doesn't pay for scrypt
+    return jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                      app.config['SECRET_KEY'], algorithm="HS256")
+
+
+def prepare():
+    from datagen import generate_dataset
+    from attendance_model import train_attendance_classifier
+    from recommendations import recompute_recommendations
+
+    with app.app_context():
+        generate_dataset(**DATASET)
+        train_attendance_classifier(model_registry)
+        recompute_recommendations(full=True)
+        db.session.add(ProjectRequirement(project_name="Web Store", required_skills="react, node.js, sql"))
+        db.session.commit()
+
+        # The busiest student, and the partner they talk to most, make the
+        # chat endpoints do real work
+        counts = db.session.query(Conversation.user_low_id, func.count()).group_by(
+            Conversation.user_low_id).order_by(func.count().desc()).first()
+        student_id = counts[0] if counts and counts[0] != 1 else 2
+        partner = db.session.query(Conversation.user_high_id).filter(
+            Conversation.user_low_id == student_id).order_by(Conversation.last_timestamp.desc()).first()
+        project = db.session.query(ProjectRequirement.id).first()
+        return {
+            "student": student_id,
+            "partner": partner[0] if partner else student_id + 1,
+            "admin": 1,
+            "project": project[0],
+        }
+
+
+def read_endpoints(ids):
+    """(name, role, method, path, json body) of every read endpoint measured."""
+    s = ids["student"]
+    return [
+        ("feed", "student", "GET", "/api/feed", None),
+        ("recommend_students", "student", "GET", "/api/recommend_students", None),
+        ("recent_chats", "student", "GET", "/api/recent_chats", None),
+        ("chat", "student", "GET", f"/api/chat/{ids['partner']}", None),
+        ("events", "student", "GET", "/api/events", None),
+        ("profile", "student", "GET", "/api/profile", None),
+        ("user_profile", "student", "GET", f"/api/user/{ids['partner']}", None),
+        ("trust_score", "student", "GET", f"/api/trust_score/{s}", None),
+        ("attendance_summary", "student", "GET", f"/api/attendance_summary/{s}", None),
+        ("predict_attendance_risk", "student", "GET", f"/api/predict_attendance_risk/{s}", None),
+        ("skill_gap", "student", "POST", "/api/skill_gap", {"project_id": ids["project"]}),
+        ("admin_users", "admin", "GET", "/api/admin/users", None),
+        ("admin_stats", "admin", "GET", "/api/admin/stats", None),
+        ("admin_low_attendance", "admin", "GET", "/api/admin/low_attendance?per_page=100", None),
+        ("admin_attendance_risk", "admin", "GET", "/api/admin/attendance_risk?per_page=100", None),
+    ]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def summarise(latencies, queries, elapsed, errors=0):
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "req_per_sec": round(len(latencies) / elapsed, 1),
+        # Median, so an occasional auth cache expiry doesn't count as a regression
+        "queries": int(statistics.median(queries)),
+        "max_queries": max(queries),
+        "errors": errors,
+    }
+
+
+def run_reads(endpoints, ids, n_requests, max_seconds, rounds, counter):
+    """Measure each endpoint in `rounds` interleaved rounds.
+
+    Interleaving spreads a transient slowdown of the machine over every
+    endpoint instead of landing on one. best_p50_ms is the fastest round's
+    median, the figure the regression check uses.
+    """
+    client = app.test_client()
+    headers = {role: {'Authorization': f'Bearer {token_for(ids[role])}'} for role in ("student", "admin")}
+    samples = {name: ([], [], [0], [0.0], []) for name, *_ in endpoints}
+    for _ in range(rounds):
+        for name, role, method, path, body in endpoints:
+            latencies, queries, errors, elapsed, round_p50s = samples[name]
+            for _ in range(WARMUP):
+                client.open(path, method=method, headers=headers[role], json=body)
+            round_latencies = []
+            started = time.perf_counter()
+            for i in range(n_requests):
+                # Slow endpoints stop early, but keep enough samples for a p95
+                if i >= MIN_SAMPLES and time.perf_counter() - started > max_seconds:
+                    break
+                counter.take()
+                t0 = time.perf_counter()
+                resp = client.open(path, method=method, headers=headers[role], json=body)
+                round_latencies.append(time.perf_counter() - t0)
+                queries.append(counter.take())
+                errors[0] += resp.status_code >= 400
+            elapsed[0] += time.perf_counter() - started
+            latencies += round_latencies
+            round_p50s.append(statistics.median(round_latencies))
+
+    results = {}
+    for name, (latencies, queries, errors, elapsed, round_p50s) in samples.items():
+        results[name] = summarise(latencies, queries, elapsed[0], errors[0])
+        results[name]["best_p50_ms"] = round(min(round_p50s) * 1000, 3)
+    return results
+
+
+def hot_rows():
+    with app.app_context():
+        post_id = db.session.query(Post.id).order_by(Post.id.desc()).first()[0]
+        event_id = db.session.query(Event.id).order_by(Event.id).first()[0]
+        subject_id = db.session.query(AttendanceRecord.subject_id).group_by(
+            AttendanceRecord.subject_id).order_by(func.count().desc()).first()[0]
+        joined = db.session.query(EventParticipant.user_id).filter(EventParticipant.event_id == event_id)
+        students = [uid for (uid,) in db.session.query(AttendanceRecord.user_id).filter(
+            AttendanceRecord.subject_id == subject_id, AttendanceRecord.user_id.not_in(joined)
+        ).order_by(AttendanceRecord.user_id)]
+        return post_id, event_id, subject_id, students
+
+
+def consistency(post_id, event_id, subject_id, total_classes_before, attendance_requests):
+    """Anomalies left behind by concurrent writes, per endpoint."""
+    with app.app_context():
+        post = db.session.get(Post, post_id)
+        likes = PostLike.query.filter_by(post_id=post_id).count()
+        joined = db.session.query(EventParticipant.user_id, func.count()).filter(
+            EventParticipant.event_id == event_id).group_by(EventParticipant.user_id).having(func.count() > 1).count()
+        subject = db.session.get(Subject, subject_id)
+        return {
+            "like_post": {"likes_count_drift": post.likes_count - likes},
+            "join_event": {"duplicate_participants": joined},
+            "mark_attendance": {"lost_total_classes_updates":
+                                total_classes_before + attendance_requests - subject.total_classes},
+        }
+
+
+def run_concurrent(n_threads, n_requests, counter):
+    post_id, event_id, subject_id, students = hot_rows()
+    with app.app_context():
+        total_classes_before = db.session.get(Subject, subject_id).total_classes
+    # Every request comes from its own user so join_event never hits "Already joined"
+    users = students[:n_threads * n_requests]
+    tokens = [token_for(uid) for uid in users]
+    scenarios = [
+        ("like_post", "/api/like_post", {"post_id": post_id}),
+        ("join_event", "/api/join_event", {"event_id": event_id}),
+        ("mark_attendance", "/api/mark_attendance", {"subject_id": subject_id, "attended": True}),
+    ]
+
+    results = {}
+    attendance_ok = 0
+    for name, path, body in scenarios:
+        latencies, queries, errors = [], [], []
+        lock = threading.Lock()
+        barrier = threading.Barrier(n_threads)
+
+        def worker(offset):
+            nonlocal attendance_ok
+            client = app.test_client()
+            barrier.wait()
+            for token in tokens[offset::n_threads]:
+                counter.take()
+                t0 = time.perf_counter()
+                resp = client.post(path, headers={'Authorization': f'Bearer {token}'}, json=body)
+                elapsed = time.perf_counter() - t0
+                with lock:
+                    latencies.append(elapsed)
+                    queries.append(counter.take())
+                    errors.append(resp.status_code >= 400)
+                    if name == 'mark_attendance' and resp.status_code == 200:
+                        attendance_ok += 1
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        results[name] = summarise(latencies, queries, time.perf_counter() - started, sum(errors))
+
+    for name, anomalies in consistency(post_id, event_id, subject_id, total_classes_before, attendance_ok).items():
+        results[name].update(anomalies)
+    return results
+
+
+def anomalies(results):
+    """Lost or duplicated writes recorded by consistency(), as readable lines."""
+    return [f"{name}: {key} = {value}" for name, r in results.items() for key, value in r.items()
+            if value and (key in ("duplicate_participants", "likes_count_drift") or key.startswith("lost_"))]
+
+
+def compare(results, baseline, threshold, min_delta_ms, latency=True):
+    """Human-readable regressions of results against baseline.
+
+    Latency is judged on the best round's p50, which is far steadier
+    between runs than p95, and only when it is both threshold and
+    min_delta_ms above the baseline. Concurrent writes are compared on
+    query count, and any lost or duplicated write fails them outright.
+    """
+    regressions = anomalies(results)
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if latency:
+            current, reference = r["best_p50_ms"], base["best_p50_ms"]
+            if current > reference * (1 + threshold) and current - reference > min_delta_ms:
+                regressions.append(f"{name}: p50 {current:.1f} ms vs baseline {reference:.1f} ms")
+        if r["queries"] > base["queries"]:
+            regressions.append(f"{name}: {r['queries']} queries vs baseline {base['queries']}")
+    return regressions
+
+
+def run_audit(endpoints, ids, repeat_threshold):
+    """Probable N+1 statements per endpoint, from query_audit."""
+    client = app.test_client()
+    headers = {role: {'Authorization': f'Bearer {token_for(ids[role])}'} for role in ("student", "admin")}
+    query_audit.enabled = True
+    query_audit.repeat_threshold = repeat_threshold
+    query_audit.slow_query_ms = float('inf')  # timings are not the point here
+    query_audit.reset()
+    # The second call runs with warm caches, like most production requests
+    for name, role, method, path, body in endpoints:
+        for _ in range(2):
+            client.open(path, method=method, headers=headers[role], json=body)
+    query_audit.enabled = False
+    return query_audit.findings()
+
+
+def print_table(title, results):
+    print(f"\n{title}")
+    print(f"{'endpoint':>24} {'p50 ms':>8} {'p95 ms':>8} {'best p50':>9} {'req/s':>8} {'queries':>8} {'errors':>7}")
+    for name, r in results.items():
+        extra = '  '.join(f"{k}={v}" for k, v in r.items() if k not in
+                          ("p50_ms", "p95_ms", "best_p50_ms", "req_per_sec", "queries", "max_queries", "errors"))
+        best = f"{r['best_p50_ms']:.2f}" if "best_p50_ms" in r else "-"
+        print(f"{name:>24} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {best:>9} {r['req_per_sec']:>8.1f} "
+              f"{r['queries']:>8} {r['errors']:>7}  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50, help='measured calls per endpoint (per thread with --concurrent)')
+    parser.add_argument('--rounds', type=int, default=3, help='interleaved measuring rounds over the read endpoints')
+    parser.add_argument('--max-seconds', type=float, default=3,
+                        help='stop a round of a read endpoint after this long (at least %d calls)' % MIN_SAMPLES)
+    parser.add_argument('--only', nargs='+', help='endpoint names to run')
+    parser.add_argument('--concurrent', action='store_true', help='also run the concurrent write scenarios')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--threshold', type=float, default=0.3, help='allowed p50 slowdown as a fraction')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='ignore p50 slowdowns smaller than this, whatever the fraction')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='write this run as the new baseline')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    parser.add_argument('--audit', action='store_true', help='list probable N+1 queries instead of timing')
+    parser.add_argument('--repeat-threshold', type=int, default=5,
+                        help='with --audit, statements repeated this often in one request are reported')
+    args = parser.parse_args()
+
+    counter = QueryCounter()
+    try:
+        ids = prepare()
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', counter)
+        endpoints = [e for e in read_endpoints(ids) if not args.only or e[0] in args.only]
+        if args.audit:
+            findings = run_audit(endpoints, ids, args.repeat_threshold)
+            if args.json:
+                print(json.dumps(findings, indent=2))
+            else:
+                print(f"{len(findings)} statement(s) repeated {args.repeat_threshold}+ times in one request:")
+                for f in findings:
+                    print(f"\n{f['endpoint']}: {f['max_count']} x {f['statement'][:160]}")
+                    for frame in f['stack']:
+                        print(f"    {frame}")
+            return
+        results = {"reads": run_reads(endpoints, ids, args.requests, args.max_seconds, args.rounds, counter)}
+        if args.concurrent:
+            results["concurrent_writes"] = run_concurrent(args.threads, args.requests, counter)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table("Sequential reads", results["reads"])
+        if "concurrent_writes" in results:
+            print_table(f"Concurrent writes ({args.threads} threads)", results["concurrent_writes"])
+
+    if args.update_baseline:
+        lost = anomalies(results.get("concurrent_writes", {}))
+        if lost:
+            print("\nConcurrent writes lost or duplicated data; not recording them as the baseline:")
+            for line in lost:
+                print(f"  {line}")
+            sys.exit(1)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({"dataset": DATASET, "requests": args.requests, **results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline to compare with; run with --update-baseline first.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("dataset") != DATASET:
+        print("\nBaseline was recorded on a different dataset; not comparing.")
+        return
+    regressions = compare(results["reads"], baseline.get("reads", {}), args.threshold, args.min_delta_ms)
+    if "concurrent_writes" in results:
+        # Latency under contention swings too much between runs to gate on
+        regressions += compare(results["concurrent_writes"], baseline.get("concurrent_writes", {}),
+                               args.threshold, args.min_delta_ms, latency=False)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0%} against {os.path.relpath(args.baseline)}.")
+
+
+if __name__ == '__main__':
+    main()
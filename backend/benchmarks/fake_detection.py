@@ -0,0 +1,103 @@
+"""Query count and wall time of the fake-profile scan at increasing user counts.
+
+    python -m benchmarks.fake_detection                  # 1k, 10k and 100k users
+    python -m benchmarks.fake_detection --sizes 1000 5000
+
+Each size gets a fresh SQLite database with ~3 skills, ~2 interests, ~0.2
+events and ~10 sent messages per user. The per-user loop the scan used to
+run is measured alongside for sizes up to --legacy-max (it takes minutes at
+10k users).
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'campusconnect_bench_fake_detection.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from app import app  # noqa: E402
+from database import db  # noqa: E402
+from models import User, Skill, Interest, Event, Message  # noqa: E402
+from fake_detection import run_fake_detection_scan  # noqa: E402
+from counters import repair_counters  # noqa: E402
+
+
+def populate(n_users, seed=42):
+    rnd = random.Random(seed)
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(User), [
+        {"name": f"User {i}", "email": f"user{i}@bench.edu", "password_hash": "x"} for i in range(1, n_users + 1)
+    ])
+    skills, interests, events, messages = [], [], [], []
+    for uid in range(1, n_users + 1):
+        skills += [{"user_id": uid, "skill_name": f"skill{rnd.randint(1, 50)}"} for _ in range(rnd.randint(0, 6))]
+        interests += [{"user_id": uid, "interest_name": f"interest{rnd.randint(1, 20)}"} for _ in range(rnd.randint(0, 4))]
+        if rnd.random() < 0.2:
+            events.append({"creator_id": uid, "title": "Event", "description": "-", "date": "2026-01-01"})
+        # A few spammers send far more than everybody else
+        for _ in range(rnd.randint(0, 20) if rnd.random() > 0.01 else 200):
+            messages.append({"sender_id": uid, "receiver_id": rnd.randint(1, n_users), "content": "hi"})
+    for model, rows in ((Skill, skills), (Interest, interests), (Event, events), (Message, messages)):
+        for start in range(0, len(rows), 50000):
+            db.session.execute(insert(model), rows[start:start + 50000])
+    db.session.commit()
+    # Bulk inserts bypass the write paths that keep the counters current
+    repair_counters()
+    return len(messages)
+
+
+def legacy_scan():
+    # The per-user loop run_fake_detection used before the activity counters
+    users = User.query.all()
+    for u in users:
+        len(u.skills), len(u.events_created), len(u.interests)
+        Message.query.filter_by(sender_id=u.id).count()
+        Message.query.filter_by(receiver_id=u.id).count()
+        Message.query.filter_by(sender_id=u.id).count()
+    db.session.rollback()
+
+
+def measure(fn):
+    counter = {"queries": 0}
+
+    def count(*args):
+        counter["queries"] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    db.session.expunge_all()
+    return counter["queries"], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--legacy-max', type=int, default=1000,
+                        help='largest size to also time the old per-user loop at')
+    args = parser.parse_args()
+
+    print(f"{'users':>8} {'messages':>10} {'variant':>10} {'queries':>9} {'seconds':>9}")
+    with app.app_context():
+        for n_users in args.sizes:
+            n_messages = populate(n_users)
+            variants = [('counters', run_fake_detection_scan)]
+            if n_users <= args.legacy_max:
+                variants.append(('per-user', legacy_scan))
+            for name, fn in variants:
+                queries, elapsed = measure(fn)
+                print(f"{n_users:>8} {n_messages:>10} {name:>10} {queries:>9} {elapsed:>9.2f}")
+    os.remove(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Logins/sec under concurrency, and what a login burst does to other requests.
+
+    python -m benchmarks.login_throughput
+    python -m benchmarks.login_throughput --clients 8 32 --seconds 5 --method pbkdf2:sha256:600000
+
+The app is served by a threaded werkzeug server on a local port. For each
+client count, that many threads log in as fast as they can while one probe
+thread keeps calling GET /api/profile. Each run is repeated with the hashing
+pool effectively unbounded (every request hashes on its own thread, as
+before) and with the configured bound (PASSWORD_HASH_WORKERS /
+PASSWORD_HASH_QUEUE).
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'campusconnect_bench_login.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+
+from sqlalchemy import insert  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import app  # noqa: E402
+from database import db  # noqa: E402
+from models import User  # noqa: E402
+from passwords import password_hasher  # noqa: E402
+
+PASSWORD = 'password123'
+
+
+def populate(n_users, method):
+    db.drop_all()
+    db.create_all()
+    # Same password for everyone, so one hash will do
+    password_hash = generate_password_hash(PASSWORD, method)
+    db.session.execute(insert(User), [
+        {"name": f"User {i}", "email": f"user{i}@bench.edu", "password_hash": password_hash}
+        for i in range(1, n_users + 1)
+    ])
+    db.session.commit()
+
+
+def post_json(base, path, payload):
+    req = urllib.request.Request(base + path, data=json.dumps(payload).encode(),
+                                 headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def run(base, clients, seconds, n_users):
+    stop = time.monotonic() + seconds
+    statuses = []
+    probe_latencies = []
+    _, body = post_json(base, '/api/login', {"email": "user1@bench.edu", "password": PASSWORD})
+    token = body['token']
+
+    def login_loop(offset):
+        i = offset
+        while time.monotonic() < stop:
+            status, _ = post_json(base, '/api/login', {"email": f"user{i % n_users + 1}@bench.edu", "password": PASSWORD})
+            statuses.append(status)
+            i += clients
+
+    def probe_loop():
+        req = urllib.request.Request(base + '/api/profile', headers={'Authorization': f'Bearer {token}'})
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            with urllib.request.urlopen(req) as resp:
+                resp.read()
+            probe_latencies.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_loop, args=(i,)) for i in range(clients)]
+    threads.append(threading.Thread(target=probe_loop))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    ok = statuses.count(200)
+    busy = statuses.count(503)
+    latencies = sorted(probe_latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    return ok / seconds, busy, statistics.median(latencies) * 1000 if latencies else 0, p95 * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--method', default=app.config['PASSWORD_HASH_METHOD'])
+    args = parser.parse_args()
+
+    password_hasher.method = args.method
+    bounded = (password_hasher.max_workers, password_hasher.max_queue)
+    with app.app_context():
+        populate(args.users, args.method)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    print(f"method {args.method}")
+    print(f"{'clients':>8} {'pool':>10} {'logins/s':>9} {'503s':>6} {'probe p50 ms':>13} {'probe p95 ms':>13}")
+    for clients in args.clients:
+        for label, (workers, queue) in (('unbounded', (clients + 1, 10000)), ('bounded', bounded)):
+            password_hasher.shutdown()
+            password_hasher.max_workers, password_hasher.max_queue = workers, queue
+            rate, busy, p50, p95 = run(base, clients, args.seconds, args.users)
+            print(f"{clients:>8} {label:>10} {rate:>9.1f} {busy:>6} {p50:>13.1f} {p95:>13.1f}")
+
+    server.shutdown()
+    password_hasher.shutdown()
+    os.remove(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
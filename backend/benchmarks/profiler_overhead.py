@@ -0,0 +1,138 @@
+"""What the runtime profiler costs a request, off and on.
+
+    python -m benchmarks.profiler_overhead
+    python -m benchmarks.profiler_overhead --requests 500 --rounds 20
+
+Calls GET /api/profile (token check plus a few small queries) in-process
+through the test client in rounds, each running every variant once in a
+shuffled order:
+
+  no hooks      the profiler's request hooks removed from the app
+  no hooks (2)  the same again, as a control: its difference from 'no hooks'
+                is the measurement noise
+  off           hooks installed, no session running (production default)
+  sample 10%    sampling session on 10% of requests
+  sample 100%   sampling session on every request
+  cprofile 10%  cProfile on 10% of requests
+  cprofile 100% cProfile on every request
+
+and reports the best round's median latency and the difference from
+'no hooks'. On a busy machine the noise is larger than the hooks' own cost,
+so it also times the two hooks alone with no session running.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import timeit
+from datetime import datetime, timedelta
+
+WORK_DIR = tempfile.mkdtemp(prefix='campusconnect_bench_profiler_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORK_DIR, 'bench.db')}"
+os.environ['PROFILE_DIR'] = os.path.join(WORK_DIR, 'profiles')
+
+import jwt  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import app  # noqa: E402
+from database import db  # noqa: E402
+from models import User  # noqa: E402
+from profiling import profiler  # noqa: E402
+
+VARIANTS = [
+    ("no hooks", None, None),
+    ("no hooks (2)", None, None),
+    ("off", None, None),
+    ("sample 10%", 'sample', 0.1),
+    ("sample 100%", 'sample', 1.0),
+    ("cprofile 10%", 'cprofile', 0.1),
+    ("cprofile 100%", 'cprofile', 1.0),
+]
+
+
+def set_hooks(installed):
+    before = app.before_request_funcs.setdefault(None, [])
+    teardown = app.teardown_request_funcs.setdefault(None, [])
+    for hooks, hook in ((before, profiler._before_request), (teardown, profiler._teardown_request)):
+        if installed and hook not in hooks:
+            hooks.append(hook)
+        elif not installed and hook in hooks:
+            hooks.remove(hook)
+
+
+def set_session(mode, fraction):
+    profiler.stop()
+    # Apply the change now rather than on a request within the next second,
+    # and wait for the old session's thread to write its results and exit so
+    # it doesn't run into the next measurement
+    profiler._refresh(float('inf'))
+    for thread in threading.enumerate():
+        if thread.name.startswith('profiler-'):
+            thread.join()
+    if mode:
+        profiler.start(mode, fraction, seconds=3600)
+        profiler._refresh(float('inf'))
+    profiler._next_check = time.monotonic() + 3600
+
+
+def run(client, headers, n_requests):
+    latencies = []
+    for _ in range(n_requests):
+        t0 = time.perf_counter()
+        client.get('/api/profile', headers=headers)
+        latencies.append(time.perf_counter() - t0)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300, help='calls per variant per round')
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        with app.app_context():
+            db.create_all()
+            user = User(name="Bench User", email="bench@bench.edu",
+                        password_hash=generate_password_hash("password123", 'pbkdf2:sha256:1000'))
+            db.session.add(user)
+            db.session.commit()
+            token = jwt.encode({'user_id': user.id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                               app.config['SECRET_KEY'], algorithm="HS256")
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+
+        # The hooks alone, as a request with no session running pays for them
+        set_session(None, None)
+        with app.test_request_context('/api/profile'):
+            profiler._before_request()
+            n = 200000
+            hook_ns = timeit.timeit(lambda: (profiler._before_request(), profiler._teardown_request(None)),
+                                    number=n) / n * 1e9
+
+        best = {name: float('inf') for name, *_ in VARIANTS}
+        rnd = random.Random(42)
+        for _ in range(args.rounds):
+            for name, mode, fraction in rnd.sample(VARIANTS, len(VARIANTS)):
+                set_hooks(not name.startswith("no hooks"))
+                set_session(mode, fraction)
+                run(client, headers, 50)  # warm up
+                best[name] = min(best[name], run(client, headers, args.requests))
+        set_session(None, None)
+        set_hooks(True)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    print(f"Hooks with no session running: {hook_ns:.0f} ns per request\n")
+    base = best["no hooks"]
+    print(f"{'variant':>14} {'best p50 us':>12} {'vs no hooks':>12}")
+    for name, *_ in VARIANTS:
+        print(f"{name:>14} {best[name] * 1e6:>12.1f} {(best[name] - base) / base:>+12.1%}")
+
+
+if __name__ == '__main__':
+    main()
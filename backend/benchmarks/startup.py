@@ -0,0 +1,83 @@
+"""Worker startup cost: time to import the app and resident memory afterwards.
+
+    python -m benchmarks.startup                       # this tree, 5 runs
+    python -m benchmarks.startup --ref HEAD~5 --runs 10
+
+Every run is a fresh interpreter that imports the app module exactly as a
+gunicorn worker does, so nothing is shared with earlier runs. --ref also
+measures the backend/ of another git revision (extracted with git archive)
+for comparison across releases.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ML_MODULES = ('numpy', 'scipy', 'sklearn', 'joblib')
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+rss_kb = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+print(json.dumps({
+    "seconds": elapsed,
+    "rss_mb": rss_kb / 1024,
+    "ml_loaded": [m for m in %r if m in sys.modules],
+}))
+''' % (ML_MODULES,)
+
+
+def measure(backend_dir, runs):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}")
+        results = []
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, '-c', PROBE], cwd=backend_dir, env=env,
+                                 capture_output=True, text=True, check=True)
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "seconds": statistics.median(r["seconds"] for r in results),
+        "rss_mb": statistics.median(r["rss_mb"] for r in results),
+        "ml_loaded": results[-1]["ml_loaded"],
+    }
+
+
+def extract(ref, dest):
+    repo_root = os.path.dirname(BACKEND_DIR)
+    archive = subprocess.run(['git', 'archive', ref, 'backend'], cwd=repo_root, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', dest], input=archive, check=True)
+    return os.path.join(dest, 'backend')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--ref', help='git revision to compare against')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = {"working tree": measure(BACKEND_DIR, args.runs)}
+    if args.ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            results[args.ref] = measure(extract(args.ref, tmp), args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'tree':>14} {'import s':>9} {'RSS MB':>8}  ML modules loaded")
+    for tree, r in results.items():
+        print(f"{tree:>14} {r['seconds']:>9.2f} {r['rss_mb']:>8.1f}  {', '.join(r['ml_loaded']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
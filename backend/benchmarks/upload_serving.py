@@ -0,0 +1,123 @@
+"""Image bytes transferred over repeated feed loads.
+
+    python -m benchmarks.upload_serving
+    python -m benchmarks.upload_serving --users 30 --posts 20 --loads 10
+
+Builds a feed whose posts and authors all carry uploaded photos, then loads
+the first feed page --loads times and fetches every image it references,
+the way a browser rendering it would. Compared:
+
+  originals     full-size uploads re-downloaded on every load (no cache)
+  revalidate    size copies; the client sends If-None-Match and gets 304s
+  cached        size copies; the client honours Cache-Control: immutable
+
+Only image traffic is counted; the feed JSON is the same in every variant.
+"""
+import argparse
+import io
+import os
+import random
+import shutil
+import tempfile
+
+WORK_DIR = tempfile.mkdtemp(prefix='campusconnect_bench_uploads_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORK_DIR, 'bench.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(WORK_DIR, 'uploads')
+
+from sqlalchemy import insert  # noqa: E402
+from werkzeug.datastructures import FileStorage  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import app  # noqa: E402
+from database import db  # noqa: E402
+from models import User, Post  # noqa: E402
+from uploads import store_image  # noqa: E402
+
+PASSWORD = 'password123'
+
+
+def photo(rnd, size):
+    from PIL import Image
+    # Noise compresses worse than a real photo, so sizes are on the high side
+    image = Image.merge('RGB', [Image.effect_noise(size, rnd.randint(20, 60)) for _ in range(3)])
+    buf = io.BytesIO()
+    image.save(buf, 'JPEG', quality=85)
+    buf.seek(0)
+    return FileStorage(stream=buf, filename='photo.jpg')
+
+
+def populate(n_users, n_posts, seed=42):
+    rnd = random.Random(seed)
+    folder = app.config['UPLOAD_FOLDER']
+    db.create_all()
+    password_hash = generate_password_hash(PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+    db.session.execute(insert(User), [
+        {"name": f"User {i}", "email": f"user{i}@bench.edu", "password_hash": password_hash,
+         "profile_photo": store_image(photo(rnd, (1200, 1200)), folder)}
+        for i in range(1, n_users + 1)
+    ])
+    db.session.execute(insert(Post), [
+        {"user_id": rnd.randint(1, n_users), "content": f"Post {i}",
+         "image_url": store_image(photo(rnd, (2000, 1500)), folder)}
+        for i in range(1, n_posts + 1)
+    ])
+    db.session.commit()
+
+
+def feed_images(client, headers, original):
+    posts = client.get('/api/feed', headers=headers).get_json()['feed']
+    urls = []
+    for post in posts:
+        if original:
+            author = client.get(f"/api/user/{post['user_id']}", headers=headers).get_json()
+            urls += [author['profile_photo_original'], post['image_original_url']]
+        else:
+            urls += [post['author_photo'], post['image_url']]
+    # A page references the same avatar many times but loads it once
+    return list(dict.fromkeys(u for u in urls if u))
+
+
+def run(client, headers, variant, loads):
+    cache = {}  # url -> (etag, immutable)
+    requests = transferred = repeat_bytes = 0
+    for load in range(loads):
+        for url in feed_images(client, headers, original=(variant == 'originals')):
+            request_headers = {}
+            if variant != 'originals' and url in cache:
+                etag, immutable = cache[url]
+                if variant == 'cached' and immutable:
+                    continue
+                request_headers['If-None-Match'] = etag
+            resp = client.get(url, headers=request_headers)
+            requests += 1
+            transferred += len(resp.data)
+            if load:
+                repeat_bytes += len(resp.data)
+            cache[url] = (resp.headers.get('ETag'), 'immutable' in resp.headers.get('Cache-Control', ''))
+    return requests, transferred, repeat_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=20)
+    parser.add_argument('--loads', type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        with app.app_context():
+            populate(args.users, args.posts)
+        client = app.test_client()
+        token = client.post('/api/login', json={"email": "user1@bench.edu", "password": PASSWORD}).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        print(f"{'variant':>11} {'requests':>9} {'total MB':>9} {'repeat-load MB':>15}")
+        for variant in ('originals', 'revalidate', 'cached'):
+            requests, transferred, repeat_bytes = run(client, headers, variant, args.loads)
+            print(f"{variant:>11} {requests:>9} {transferred / 1e6:>9.2f} {repeat_bytes / 1e6:>15.2f}")
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Per-worker memory under gunicorn.conf.py with 1 vs 8 workers.
+
+    python -m benchmarks.worker_rss
+    python -m benchmarks.worker_rss --workers 1 4 8 --users 50000 --after 60
+
+Starts gunicorn against a generated SQLite database (users with skills and
+attendance records, plus a trained risk model) with and without
+preloading, waits for the workers to warm up, then reads each process's RSS
+and PSS from /proc. RSS counts shared pages in full for every process; PSS
+splits them between the processes sharing them, so total PSS is what the
+machine actually spends. Linux only.
+
+Memory is read twice: once the workers have warmed up, and again after
+--after seconds (default 330) of serving live partner recommendations,
+which use the skill index. The second reading catches shared state that
+workers rebuild privately after a while; the index used to do so after
+300 s.
+"""
+import argparse
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+WORK_DIR = tempfile.mkdtemp(prefix='campusconnect_bench_rss_')
+DB_PATH = os.path.join(WORK_DIR, 'bench.db')
+REGISTRY_DIR = os.path.join(WORK_DIR, 'models')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['MODEL_REGISTRY_DIR'] = REGISTRY_DIR
+
+import jwt  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app import app  # noqa: E402
+from database import db  # noqa: E402
+from models import User, Skill, Subject, AttendanceRecord  # noqa: E402
+from model_registry import model_registry  # noqa: E402
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def populate(n_users, seed=42):
+    from attendance_model import train_attendance_classifier
+
+    rnd = random.Random(seed)
+    db.create_all()
+    db.session.execute(insert(User), [
+        {"name": f"User {i}", "email": f"user{i}@bench.edu", "password_hash": "x"} for i in range(1, n_users + 1)
+    ])
+    db.session.execute(insert(Subject), [{"subject_name": f"Subject {i}", "total_classes": 40} for i in range(1, 6)])
+    skills, records = [], []
+    for uid in range(1, n_users + 1):
+        skills += [{"user_id": uid, "skill_name": f"skill{rnd.randint(1, 500)}"} for _ in range(rnd.randint(1, 8))]
+        records += [{"user_id": uid, "subject_id": sid, "classes_attended": rnd.randint(15, 40)} for sid in range(1, 6)]
+    for model, rows in ((Skill, skills), (AttendanceRecord, records)):
+        for start in range(0, len(rows), 50000):
+            db.session.execute(insert(model), rows[start:start + 50000])
+    db.session.commit()
+    train_attendance_classifier(model_registry)
+
+
+def read_memory(pid):
+    """(RSS MB, PSS MB) of a process."""
+    rss = pss = 0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss = int(line.split()[1])
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    pss = int(line.split()[1])
+    except FileNotFoundError:
+        pss = rss
+    return rss / 1024, pss / 1024
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(p) for p in f.read().split()]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve_requests(port, n_users, seconds, seed=42):
+    """Call /api/recommend_students as random users for `seconds`."""
+    rnd = random.Random(seed)
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        token = jwt.encode({'user_id': rnd.randint(1, n_users), 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           app.config['SECRET_KEY'], algorithm="HS256")
+        req = urllib.request.Request(f'http://127.0.0.1:{port}/api/recommend_students',
+                                     headers={'Authorization': f'Bearer {token}'})
+        try:
+            urllib.request.urlopen(req, timeout=30).read()
+        except OSError:
+            pass
+        time.sleep(0.05)
+
+
+def run(n_workers, preload, settle, after, n_users):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(n_workers), PORT=str(port), GUNICORN_PRELOAD='1' if preload else '0')
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline and len(children(proc.pid)) < n_workers:
+            time.sleep(0.2)
+        # Workers warm up (or finish booting) before we read their memory
+        time.sleep(settle)
+        readings = [(read_memory(proc.pid), [read_memory(pid) for pid in children(proc.pid)])]
+        if after:
+            serve_requests(port, n_users, after)
+            readings.append((read_memory(proc.pid), [read_memory(pid) for pid in children(proc.pid)]))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return readings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--settle', type=float,
+                        help='seconds to wait after workers start (default 5 + 4 per worker, for warm-up)')
+    parser.add_argument('--after', type=float, default=330,
+                        help='seconds of traffic before the second reading (0 skips it)')
+    args = parser.parse_args()
+
+    try:
+        with app.app_context():
+            populate(args.users)
+
+        print(f"{'workers':>8} {'preload':>8} {'reading':>9} {'worker RSS':>11} {'worker PSS':>11} {'total PSS MB':>13}")
+        for n_workers in args.workers:
+            for preload in (False, True):
+                readings = run(n_workers, preload, args.settle or 5 + 4 * n_workers, args.after, args.users)
+                for label, (master, workers) in zip(('warm', f'+{args.after:g}s'), readings):
+                    avg_rss = sum(w[0] for w in workers) / len(workers)
+                    avg_pss = sum(w[1] for w in workers) / len(workers)
+                    total_pss = master[1] + sum(w[1] for w in workers)
+                    print(f"{n_workers:>8} {'on' if preload else 'off':>8} {label:>9} "
+                          f"{avg_rss:>11.1f} {avg_pss:>11.1f} {total_pss:>13.1f}")
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from database import db
+
+# The poller re-reads this many ids below the highest one it has seen, so rows
+# whose transaction committed after a higher id (concurrent writers) are not skipped
+POLL_OVERLAP = 200
+PRUNE_EVERY_SECONDS = 60
+
+
+class Subscription:
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.closed = False
+
+
+class Broker:
+    """Pub/sub for pushing events to /api/stream clients.
+
+    With the 'db' transport (the default) publish() stores each event in the
+    stream_event table and hands it straight to this process's subscribers.
+    Every process with open streams runs a poller thread that reads the rows
+    other processes wrote every poll_interval seconds, so events reach a
+    client whichever gunicorn worker holds its stream. Event ids are the row
+    ids, and a reconnecting client that sends Last-Event-ID is replayed what
+    it missed from the table, on any worker. Rows older than retention
+    seconds are pruned by the pollers.
+
+    The 'local' transport keeps everything in memory: no database writes,
+    but events only reach clients connected to the same process, so it needs
+    a single worker. Its ids are "<boot id>-<sequence>" and replay comes from
+    a bounded in-process history.
+
+    In both, a client whose missed events can't be replayed (aged out, or an
+    id from another process in 'local' mode) is told to resync instead.
+    """
+
+    def __init__(self, history=1000, max_connections=100, queue_size=100, transport='db',
+                 poll_interval=1.0, retention=3600):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self.transport = transport
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._history_size = history
+        self._app = None
+        self._reset()
+        # Workers forked from a preloaded master must not share its identity or state
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self.boot_id = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+        self._history = deque(maxlen=self._history_size)  # (sequence, user_id, event), 'local' only
+        self._subscribers = {}  # user_id -> set of Subscription
+        self._connections = 0
+        self._poller = None
+        self._last_polled = 0  # highest stream_event id the poller has read
+        self._seen = deque(maxlen=POLL_OVERLAP * 4)  # ids already delivered by the poller
+        self._seen_ids = set()
+
+    def init_app(self, app):
+        # The poller thread needs an app context for its queries
+        self._app = app
+
+    def publish(self, user_id, event_type, data):
+        if self.transport == 'db':
+            from models import StreamEvent
+            row = StreamEvent(user_id=user_id, event_type=event_type, data=json.dumps(data), origin=self.boot_id)
+            db.session.add(row)
+            db.session.commit()
+            event = {"id": str(row.id), "event": event_type, "data": data}
+        else:
+            with self._lock:
+                sequence = next(self._sequence)
+                event = {"id": f"{self.boot_id}-{sequence}", "event": event_type, "data": data}
+                self._history.append((sequence, user_id, event))
+        self._deliver(user_id, event)
+
+    def _deliver(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for sub in subscribers:
+            try:
+                sub.queue.put_nowait(event)
+            except queue.Full:
+                # Slow consumer: drop it, the client resumes from Last-Event-ID
+                sub.closed = True
+
+    def subscribe(self, user_id):
+        """Register a connection, or return None when the worker is at capacity."""
+        if self.transport == 'db' and self._poller is None:
+            self._start_poller()
+        with self._lock:
+            if self._connections >= self.max_connections:
+                return None
+            self._connections += 1
+            sub = Subscription(user_id, self.queue_size)
+            self._subscribers.setdefault(user_id, set()).add(sub)
+            return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs and sub in subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+                self._connections -= 1
+
+    def replay(self, user_id, last_event_id):
+        """Return (events after last_event_id for the user, needs_resync)."""
+        if self.transport == 'db':
+            return self._replay_db(user_id, last_event_id or '')
+        boot_id, _, sequence = (last_event_id or '').partition('-')
+        if boot_id != self.boot_id or not sequence.isdigit():
+            return [], True
+        sequence = int(sequence)
+        with self._lock:
+            if self._history and self._history[0][0] > sequence + 1:
+                return [], True
+            return [event for seq, uid, event in self._history if seq > sequence and uid == user_id], False
+
+    def _replay_db(self, user_id, last_event_id):
+        from models import StreamEvent
+        if not last_event_id.isdigit():
+            return [], True
+        last = int(last_event_id)
+        oldest = db.session.query(func.min(StreamEvent.id)).scalar()
+        if oldest is None or oldest > last + 1:
+            return [], True  # pruned (or never seen): we can't tell what was missed
+        rows = StreamEvent.query.filter(StreamEvent.user_id == user_id, StreamEvent.id > last) \
+            .order_by(StreamEvent.id).limit(self._history_size + 1).all()
+        if len(rows) > self._history_size:
+            return [], True
+        return [row.to_event() for row in rows], False
+
+    # --- 'db' transport: reading other processes' events ---
+
+    def _start_poller(self):
+        from models import StreamEvent
+        with self._lock:
+            if self._poller is not None:
+                return
+            # Start from what exists now; older events are replay's job
+            self._last_polled = db.session.query(func.max(StreamEvent.id)).scalar() or 0
+            self._poller = threading.Thread(target=self._poll_loop, daemon=True, name='stream-poller')
+            self._poller.start()
+
+    def _poll_loop(self):
+        next_prune = time.monotonic()
+        with self._app.app_context():
+            while True:
+                time.sleep(self.poll_interval)
+                if not self._connections:
+                    continue
+                try:
+                    self._poll_once()
+                    if time.monotonic() >= next_prune:
+                        self._prune()
+                        next_prune = time.monotonic() + PRUNE_EVERY_SECONDS
+                except Exception:
+                    # Database hiccup: try again next interval
+                    db.session.rollback()
+                finally:
+                    # End the transaction so the next poll sees new commits
+                    db.session.remove()
+
+    def _poll_once(self):
+        from models import StreamEvent
+        rows = StreamEvent.query.filter(
+            StreamEvent.id > self._last_polled - POLL_OVERLAP,
+            StreamEvent.origin != self.boot_id,
+        ).order_by(StreamEvent.id).all()
+        for row in rows:
+            self._last_polled = max(self._last_polled, row.id)
+            if row.id in self._seen_ids:
+                continue
+            if len(self._seen) == self._seen.maxlen:
+                self._seen_ids.discard(self._seen[0])
+            self._seen.append(row.id)
+            self._seen_ids.add(row.id)
+            if row.user_id in self._subscribers:
+                self._deliver(row.user_id, row.to_event())
+
+    def _prune(self):
+        from models import StreamEvent
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+        StreamEvent.query.filter(StreamEvent.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+
+    @property
+    def connections(self):
+        return self._connections
+
+
+broker = Broker()
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
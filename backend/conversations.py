@@ -0,0 +1,171 @@
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models import Conversation, Message, User
+
+
+def user_pair(a, b):
+    a, b = int(a), int(b)
+    return (a, b) if a < b else (b, a)
+
+
+def get_conversation(a, b):
+    low, high = user_pair(a, b)
+    return Conversation.query.filter_by(user_low_id=low, user_high_id=high).first()
+
+
+def _get_or_create(low, high):
+    conversation = Conversation.query.filter_by(user_low_id=low, user_high_id=high).first()
+    if conversation:
+        return conversation
+    try:
+        with db.session.begin_nested():
+            conversation = Conversation(user_low_id=low, user_high_id=high)
+            db.session.add(conversation)
+        return conversation
+    except IntegrityError:
+        # Another request created the pair first
+        return Conversation.query.filter_by(user_low_id=low, user_high_id=high).one()
+
+
+def record_message(message):
+    """Attach a new message to its conversation and update the pair's summary row.
+
+    The message is flushed here so its id and timestamp are known. The caller commits.
+    """
+    low, high = user_pair(message.sender_id, message.receiver_id)
+    conversation = _get_or_create(low, high)
+    message.conversation_id = conversation.id
+    db.session.flush()
+    unread_column = 'unread_low' if int(message.receiver_id) == low else 'unread_high'
+    # Increment in SQL so concurrent senders don't lose updates
+    db.session.execute(
+        update(Conversation).where(Conversation.id == conversation.id).values(
+            last_message_id=message.id,
+            last_timestamp=message.timestamp,
+            **{unread_column: getattr(Conversation, unread_column) + 1}
+        )
+    )
+    return conversation
+
+
+def mark_read(user_id, other_id):
+    """Clear user_id's unread count with other_id and flag the messages read."""
+    conversation = get_conversation(user_id, other_id)
+    if conversation is None:
+        return
+    unread_column = 'unread_low' if user_id == conversation.user_low_id else 'unread_high'
+    if getattr(conversation, unread_column) == 0:
+        return
+    setattr(conversation, unread_column, 0)
+    # The conversation_id prefix of its (conversation_id, timestamp, id) index
+    Message.query.filter(
+        Message.conversation_id == conversation.id, Message.receiver_id == user_id, Message.is_read == False
+    ).update({"is_read": True}, synchronize_session=False)
+    db.session.commit()
+
+
+def recent_conversations(user_id, before=None, limit=50):
+    """Return (rows, has_more) for the user's conversations, newest first.
+
+    One query over the per-side indexes, joined to the counterpart User and
+    the last Message. Each row is (Conversation, User, last content, unread).
+    """
+    is_low = Conversation.user_low_id == user_id
+    other_id = case((is_low, Conversation.user_high_id), else_=Conversation.user_low_id)
+    unread = case((is_low, Conversation.unread_low), else_=Conversation.unread_high)
+
+    query = db.session.query(Conversation, User, Message.content, unread).join(
+        User, User.id == other_id
+    ).join(
+        Message, Message.id == Conversation.last_message_id
+    ).filter(is_low | (Conversation.user_high_id == user_id))
+
+    if before:
+        before_timestamp, before_id = before
+        query = query.filter(
+            (Conversation.last_timestamp < before_timestamp) |
+            ((Conversation.last_timestamp == before_timestamp) & (Conversation.id < before_id))
+        )
+
+    rows = query.order_by(Conversation.last_timestamp.desc(), Conversation.id.desc()).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+
+def rebuild_conversations():
+    """Recompute every conversation row from the Message table."""
+    low = case((Message.sender_id < Message.receiver_id, Message.sender_id), else_=Message.receiver_id)
+    high = case((Message.sender_id < Message.receiver_id, Message.receiver_id), else_=Message.sender_id)
+    unread_low = func.sum(case(((Message.receiver_id == low) & (Message.is_read == False), 1), else_=0))
+    unread_high = func.sum(case(((Message.receiver_id == high) & (Message.is_read == False), 1), else_=0))
+
+    # Message ids grow with time, so the highest id in a pair is its latest message
+    pairs = db.session.query(
+        low.label('low'), high.label('high'), func.max(Message.id).label('last_id'), unread_low, unread_high
+    ).group_by(low, high).all()
+
+    last_ids = [p.last_id for p in pairs]
+    timestamps = {}
+    for start in range(0, len(last_ids), 5000):
+        chunk = last_ids[start:start + 5000]
+        timestamps.update(db.session.query(Message.id, Message.timestamp).filter(Message.id.in_(chunk)))
+
+    # Update the pairs' rows in place rather than delete and reinsert them:
+    # messages reference conversation.id, so a delete would break the foreign key
+    existing = {(c.user_low_id, c.user_high_id): c.id for c in
+                db.session.query(Conversation.id, Conversation.user_low_id, Conversation.user_high_id)}
+    updates, inserts = [], []
+    for p in pairs:
+        row = {
+            "last_message_id": p.last_id,
+            "last_timestamp": timestamps[p.last_id],
+            "unread_low": p[3] or 0,
+            "unread_high": p[4] or 0,
+        }
+        conversation_id = existing.pop((p.low, p.high), None)
+        if conversation_id is None:
+            inserts.append(dict(row, user_low_id=p.low, user_high_id=p.high))
+        else:
+            updates.append(dict(row, id=conversation_id))
+    for start in range(0, len(updates), 5000):
+        db.session.execute(update(Conversation), updates[start:start + 5000])
+    for start in range(0, len(inserts), 5000):
+        db.session.execute(insert(Conversation), inserts[start:start + 5000])
+
+    # Point every message at its conversation row, then drop the rows of
+    # pairs that no longer have messages (nothing references them now)
+    db.session.execute(update(Message).values(conversation_id=select(Conversation.id).where(
+        Conversation.user_low_id == low, Conversation.user_high_id == high
+    ).scalar_subquery()))
+    stale = list(existing.values())
+    for start in range(0, len(stale), 5000):
+        db.session.execute(delete(Conversation).where(Conversation.id.in_(stale[start:start + 5000])))
+    db.session.commit()
+    return len(pairs)
+
+
+def message_page(conversation_id, before=None, after=None, limit=50):
+    """Return (messages oldest first, has_more) for one keyset page of a conversation.
+
+    before/after are anchor messages; without either the newest page is
+    returned. has_more says whether older (or, with after, newer) messages
+    remain. Pages walk the (conversation_id, timestamp, id) index.
+    """
+    query = Message.query.filter(Message.conversation_id == conversation_id)
+    if after is not None:
+        query = query.filter(
+            (Message.timestamp > after.timestamp) |
+            ((Message.timestamp == after.timestamp) & (Message.id > after.id))
+        ).order_by(Message.timestamp.asc(), Message.id.asc())
+        messages = query.limit(limit + 1).all()
+        return messages[:limit], len(messages) > limit
+
+    if before is not None:
+        query = query.filter(
+            (Message.timestamp < before.timestamp) |
+            ((Message.timestamp == before.timestamp) & (Message.id < before.id))
+        )
+    messages = query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit + 1).all()
+    has_more = len(messages) > limit
+    return messages[:limit][::-1], has_more
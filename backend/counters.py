@@ -0,0 +1,101 @@
+from sqlalchemy import func, update
+
+from database import db
+from models import User, Skill, Interest, Event, Message
+
+# Counter column -> the foreign key it counts rows by
+COUNTER_SOURCES = {
+    'skills_count': Skill.user_id,
+    'interests_count': Interest.user_id,
+    'events_created_count': Event.creator_id,
+    'messages_sent_count': Message.sender_id,
+    'messages_received_count': Message.receiver_id,
+}
+
+
+def compute_trust_score(num_skills, num_events, messages_received, messages_sent, is_anomaly_flagged):
+    """Trust score from activity counts, bounded to 0..100."""
+    # Base score starts at 50, +5 per skill, +10 per event created,
+    # +2 per message received
+    score = 50 + num_skills * 5 + num_events * 10 + messages_received * 2
+
+    # Penalties
+    if messages_sent > 10 and messages_received == 0:
+        score -= 10 # Spam penalty
+    if num_skills == 0:
+        score -= 20
+    if is_anomaly_flagged:
+        score -= 50
+
+    return max(0, min(100, score))
+
+
+def user_trust_score(user):
+    """O(1) trust score from the user's stored activity counters."""
+    return compute_trust_score(
+        user.skills_count, user.events_created_count, user.messages_received_count,
+        user.messages_sent_count, user.is_suspicious
+    )
+
+
+def increment(user_id, **deltas):
+    """Adjust counters in SQL (count = count + delta) so concurrent writers don't lose updates.
+
+    Runs inside the caller's transaction; commit as usual.
+    """
+    values = {name: getattr(User, name) + delta for name, delta in deltas.items() if delta}
+    if values:
+        db.session.execute(update(User).where(User.id == user_id).values(values))
+
+
+def record_message_counts(message):
+    increment(message.sender_id, messages_sent_count=1)
+    increment(message.receiver_id, messages_received_count=1)
+
+
+def aggregate_counts(user_ids=None):
+    """Return (user ids, counts matrix) computed from the source tables.
+
+    One GROUP BY query per counter; columns follow COUNTER_SOURCES. user_ids
+    must be sorted and defaults to every user. Users without rows in a table
+    get 0 for it.
+    """
+    # numpy is only needed for the bulk rebuild, not on the request path
+    import numpy as np
+
+    if user_ids is None:
+        user_ids = np.fromiter((uid for (uid,) in db.session.query(User.id).order_by(User.id)), dtype=np.int64)
+    counts = np.zeros((len(user_ids), len(COUNTER_SOURCES)), dtype=np.int64)
+
+    for col, key in enumerate(COUNTER_SOURCES.values()):
+        rows = np.array(db.session.query(key, func.count()).group_by(key).all(), dtype=np.int64).reshape(-1, 2)
+        # user_ids is sorted, so positions come from a binary search
+        positions = np.searchsorted(user_ids, rows[:, 0])
+        known = (positions < len(user_ids)) & (user_ids[np.minimum(positions, len(user_ids) - 1)] == rows[:, 0])
+        counts[positions[known], col] = rows[known, 1]
+    return user_ids, counts
+
+
+def repair_counters():
+    """Rebuild every user's counters from the source tables.
+
+    Returns the number of users whose stored counters were wrong.
+    """
+    import numpy as np
+
+    current = np.array(
+        db.session.query(User.id, *[getattr(User, name) for name in COUNTER_SOURCES]).order_by(User.id).all(),
+        dtype=np.int64
+    ).reshape(-1, len(COUNTER_SOURCES) + 1)
+    user_ids, stored = current[:, 0], current[:, 1:]
+    _, counts = aggregate_counts(user_ids)
+    drifted = np.flatnonzero((stored != counts).any(axis=1))
+
+    if len(drifted):
+        # One executemany UPDATE for just the rows that drifted
+        db.session.execute(update(User), [
+            {"id": int(user_ids[i]), **{name: int(counts[i, col]) for col, name in enumerate(COUNTER_SOURCES)}}
+            for i in drifted
+        ])
+    db.session.commit()
+    return len(drifted)
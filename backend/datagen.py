@@ -0,0 +1,424 @@
+"""Synthetic datasets at production scale for load tests and benchmarks.
+
+Everything is drawn from one numpy Generator, so the same seed and end date
+always produce the same rows (ids included). Rows go in with executemany
+batches through the Core tables of the app's models, in primary key order,
+with the secondary indexes dropped during the load and rebuilt afterwards.
+The denormalised tables the write paths normally maintain (conversation
+summaries, user activity counters, feed timelines, post like counts) are
+filled in to match, so the app behaves as if the data had come through the
+API.
+"""
+import time
+from datetime import datetime
+
+import numpy as np
+from werkzeug.security import generate_password_hash
+
+from counters import repair_counters
+from database import db
+from models import (User, Skill, Interest, Subject, AttendanceRecord, Event, EventParticipant, Connection,
+                    Post, PostLike, PostComment, Message, Conversation)
+from timelines import backfill_timelines, DEFAULT_TIMELINE_LENGTH
+
+DEFAULT_END = datetime(2026, 1, 1)
+PASSWORD = 'password123'
+ADMIN_EMAIL = 'admin@campus.edu'
+
+FIRST_NAMES = ["Aarav", "Aditi", "Alex", "Ananya", "Arjun", "Chen", "Diya", "Emma", "Fatima", "Hana",
+               "Ishaan", "Jia", "Kabir", "Lucas", "Maya", "Mohammed", "Nikhil", "Olivia", "Priya", "Rahul",
+               "Riya", "Sara", "Tanvi", "Vikram", "Wei", "Yusuf", "Zara", "Omar", "Leila", "Dev"]
+LAST_NAMES = ["Sharma", "Khan", "Patel", "Singh", "Gupta", "Iyer", "Reddy", "Das", "Ali", "Nair",
+              "Mehta", "Joshi", "Chopra", "Kapoor", "Bose", "Rao", "Wang", "Smith", "Garcia", "Ahmed"]
+BRANCHES = ["Computer Science", "Information Technology", "Electronics", "Mechanical", "Civil", "Electrical"]
+BRANCH_WEIGHTS = [0.32, 0.2, 0.16, 0.14, 0.09, 0.09]
+YEARS = ["1st Year", "2nd Year", "3rd Year", "4th Year"]
+
+# Ordered roughly by popularity; draws follow a Zipf-like curve over the list
+SKILLS = ["python", "java", "sql", "html", "css", "javascript", "react", "c++", "machine learning", "git",
+          "data science", "node.js", "docker", "aws", "linux", "django", "flask", "c", "kotlin", "android",
+          "figma", "deep learning", "pandas", "mongodb", "typescript", "spring", "tensorflow", "pytorch",
+          "kubernetes", "go", "rust", "swift", "flutter", "azure", "gcp", "redis", "graphql", "angular",
+          "vue", "excel", "matlab", "autocad", "solidworks", "embedded c", "arduino", "raspberry pi", "iot",
+          "cybersecurity", "networking", "blockchain", "unity", "unreal engine", "r", "tableau", "power bi",
+          "nlp", "computer vision", "opencv", "hadoop", "spark"]
+INTERESTS = ["hackathons", "ai research", "web dev", "app dev", "cloud computing", "open source", "cybersecurity",
+             "competitive programming", "robotics", "startups", "game dev", "data visualization", "ui/ux",
+             "music", "photography", "debate", "sports", "quizzing", "entrepreneurship", "volunteering"]
+SUBJECTS = [("Data Structures", 40), ("DBMS", 40), ("Operating Systems", 40), ("Computer Networks", 35),
+            ("Machine Learning", 30), ("Discrete Mathematics", 40), ("Software Engineering", 35),
+            ("Compiler Design", 30)]
+EVENT_TITLES = ["Hackathon Prep", "AI Study Group", "Web Dev Bootcamp", "Open Source Sprint", "Robotics Meetup",
+                "Placement Mock Interviews", "Cloud Workshop", "Game Jam", "Startup Pitch Night", "CTF Practice"]
+MESSAGES = ["Hey, are you free to work on the project today?", "Sure, let's meet at the library.",
+            "Did you finish the assignment?", "Can you share the notes from class?", "Sounds good!",
+            "I pushed the fix, can you review it?", "What time is the lab tomorrow?", "Thanks a lot!",
+            "Want to team up for the hackathon?", "Running 10 minutes late.", "ok", "See you there."]
+SPAM_MESSAGES = ["Hello! Get free crypto! Click my profile link!", "Earn money from home, DM me now!!!"]
+POSTS = ["Just built my first React app! Looking for feedback!", "Anyone going to the ML workshop tomorrow?",
+         "Stuck on a Python bug, any ideas?", "Hackathon team forming, need a backend developer.",
+         "Sharing my notes for Operating Systems, hope they help.", "Finally cleared the DBMS exam!",
+         "Looking for a partner for the robotics project.", "Who's up for a study session this weekend?"]
+COMMENTS = ["Looks awesome!", "I'll be there!", "Messaged you.", "Great work!", "Count me in.",
+            "Try restarting the kernel.", "Congrats!", "Can you share the link?"]
+
+
+def zipf_weights(n, exponent=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def datetimes(end, seconds_before):
+    """Python datetimes for an array of offsets (in seconds) before end."""
+    return (np.datetime64(end, 'us') - (seconds_before * 1e6).astype('timedelta64[us]')).tolist()
+
+
+def bulk_insert(model, columns, batch_size):
+    """executemany the rows given as equal-length column arrays into model's table."""
+    table = model.__table__
+    names = list(columns)
+    arrays = [np.asarray(columns[name]) if not isinstance(columns[name], list) else columns[name] for name in names]
+    n = len(arrays[0]) if arrays else 0
+    connection = db.session.connection()
+    for start in range(0, n, batch_size):
+        # tolist() turns numpy scalars into the Python types DB drivers accept
+        chunk = [a[start:start + batch_size] for a in arrays]
+        chunk = [c.tolist() if isinstance(c, np.ndarray) else c for c in chunk]
+        connection.execute(table.insert(), [dict(zip(names, values)) for values in zip(*chunk)])
+    return n
+
+
+def unique_pairs(a, b):
+    """Drop repeated (a, b) pairs, keeping first-draw order stable."""
+    keys = a.astype(np.int64) * (1 << 32) + b.astype(np.int64)
+    _, first = np.unique(keys, return_index=True)
+    first.sort()
+    return a[first], b[first]
+
+
+def choose_per_row(rng, counts, n_choices, weights):
+    """For each row draw counts[i] distinct indices into a weighted pool."""
+    rows, picks = [], []
+    for i, k in enumerate(counts):
+        if k:
+            rows.append(np.full(k, i))
+            picks.append(rng.choice(n_choices, size=k, replace=False, p=weights))
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(rows), np.concatenate(picks)
+
+
+def drop_indexes(tables):
+    """Drop the secondary indexes of tables and return them for create_indexes()."""
+    indexes = [index for table in tables for index in table.indexes]
+    bind = db.session.connection()
+    for index in indexes:
+        index.drop(bind)
+    return indexes
+
+
+def create_indexes(indexes):
+    bind = db.session.connection()
+    for index in indexes:
+        index.create(bind)
+    return len(indexes)
+
+
+# Settings that trade durability for load speed (a fixture can be regenerated)
+SQLITE_LOAD_PRAGMAS = (('journal_mode', 'OFF'), ('synchronous', 'OFF'), ('temp_store', 'MEMORY'),
+                       ('cache_size', '-262144'))
+# message <-> conversation reference each other, so one side always goes in first
+MYSQL_LOAD_SETTINGS = (('FOREIGN_KEY_CHECKS', '0'), ('UNIQUE_CHECKS', '0'))
+
+
+def tune_connection():
+    """Apply the load settings to the session's connection; returns the previous values."""
+    connection = db.session.connection()
+    saved = []
+    if db.engine.dialect.name == 'sqlite':
+        for name, value in SQLITE_LOAD_PRAGMAS:
+            saved.append((name, connection.exec_driver_sql(f'PRAGMA {name}').scalar()))
+            connection.exec_driver_sql(f'PRAGMA {name}={value}')
+    elif db.engine.dialect.name == 'mysql':
+        for name, value in MYSQL_LOAD_SETTINGS:
+            saved.append((name, connection.exec_driver_sql(f'SELECT @@SESSION.{name}').scalar()))
+            connection.exec_driver_sql(f'SET SESSION {name}={value}')
+    return saved
+
+
+def restore_connection(saved):
+    """Undo tune_connection() so the pooled connection is safe for ordinary use again."""
+    connection = db.session.connection()
+    for name, value in saved:
+        if db.engine.dialect.name == 'sqlite':
+            connection.exec_driver_sql(f'PRAGMA {name}={value}')
+        else:
+            connection.exec_driver_sql(f'SET SESSION {name}={value}')
+
+
+def generate_dataset(users=10000, messages=200000, posts=None, likes=None, comments=None, events=None,
+                     connections_per_user=8, skills_per_user=4, bot_fraction=0.01, days=180,
+                     seed=42, end=DEFAULT_END, batch_size=20000, timeline_length=DEFAULT_TIMELINE_LENGTH,
+                     progress=None):
+    """Drop every table and fill the database with a synthetic campus.
+
+    User 1 is an admin (ADMIN_EMAIL); every account's password is PASSWORD.
+    posts, likes, comments and events default to multiples of users.
+    progress(step, rows, seconds) is called after each table. Returns the
+    row count per table.
+    """
+    rng = np.random.default_rng(seed)
+    posts = users * 2 if posts is None else posts
+    likes = posts * 5 if likes is None else likes
+    comments = posts if comments is None else comments
+    events = max(users // 20, 1) if events is None else events
+    horizon = days * 86400.0
+    counts = {}
+
+    def step(name, fn):
+        started = time.perf_counter()
+        counts[name] = fn()
+        if progress:
+            progress(name, counts[name], time.perf_counter() - started)
+
+    db.drop_all()
+    db.create_all()
+    db.session.commit()
+    saved = tune_connection()
+
+    # Per-user traits shared by the tables below
+    ids = np.arange(1, users + 1)
+    n_bots = int(users * bot_fraction) if users > 1 else 0
+    is_bot = np.zeros(users, dtype=bool)
+    if n_bots:
+        is_bot[rng.choice(np.arange(1, users), size=n_bots, replace=False)] = True
+    activity = rng.lognormal(0, 1, users)  # how much each user posts, chats and likes
+    activity[is_bot] *= 5
+    activity_p = activity / activity.sum()
+
+    def load_users():
+        first = rng.integers(0, len(FIRST_NAMES), users)
+        last = rng.integers(0, len(LAST_NAMES), users)
+        branch = rng.choice(len(BRANCHES), users, p=BRANCH_WEIGHTS)
+        year = rng.integers(0, len(YEARS), users)
+        password_hash = generate_password_hash(PASSWORD)
+        names = [f"{FIRST_NAMES[f]} {LAST_NAMES[l]}" for f, l in zip(first.tolist(), last.tolist())]
+        emails = [f"user{i}@campus.edu" for i in ids.tolist()]
+        emails[0], names[0] = ADMIN_EMAIL, "System Administrator"
+        return bulk_insert(User, {
+            "id": ids,
+            "name": names,
+            "email": emails,
+            "password_hash": [password_hash] * users,
+            "branch": [BRANCHES[b] for b in branch.tolist()],
+            "year": [YEARS[y] for y in year.tolist()],
+            "bio": [f"Hi, I'm {n.split()[0]}." if not bot else "Click my link!" for n, bot in zip(names, is_bot.tolist())],
+            "is_admin": ids == 1,
+            "is_suspicious": np.zeros(users, dtype=bool),
+            "is_suspended": np.zeros(users, dtype=bool),
+        }, batch_size)
+
+    def load_tags(model, column, pool, mean):
+        def load():
+            per_user = np.clip(rng.poisson(mean, users), 1, len(pool) // 2)
+            per_user[is_bot] = 0
+            rows, picks = choose_per_row(rng, per_user, len(pool), zipf_weights(len(pool)))
+            return bulk_insert(model, {
+                "id": np.arange(1, len(rows) + 1),
+                "user_id": ids[rows],
+                column: [pool[p] for p in picks.tolist()],
+            }, batch_size)
+        return load
+
+    def load_attendance():
+        bulk_insert(Subject, {
+            "id": np.arange(1, len(SUBJECTS) + 1),
+            "subject_name": [s for s, _ in SUBJECTS],
+            "total_classes": [t for _, t in SUBJECTS],
+        }, batch_size)
+        # Everyone but the admin takes five subjects
+        per_user = 5
+        user_rows = np.repeat(np.arange(2, users + 1), per_user)
+        subject = np.concatenate([rng.choice(len(SUBJECTS), per_user, replace=False) for _ in range(users - 1)]) \
+            if users > 1 else np.zeros(0, dtype=np.int64)
+        total = np.array([t for _, t in SUBJECTS])[subject]
+        diligence = rng.beta(5, 1.5, users)[user_rows - 1]
+        diligence[is_bot[user_rows - 1]] = rng.uniform(0, 0.4, is_bot[user_rows - 1].sum())
+        attended = rng.binomial(total, diligence)
+        recent_absences = rng.binomial(5, 1 - diligence)
+        days_since = np.minimum(rng.geometric(np.clip(diligence, 0.05, 0.95)) - 1, 60)
+        return bulk_insert(AttendanceRecord, {
+            "id": np.arange(1, len(user_rows) + 1),
+            "user_id": user_rows,
+            "subject_id": subject + 1,
+            "classes_attended": attended,
+            "recent_absences_last_5": recent_absences,
+            "days_since_last_present": days_since,
+        }, batch_size)
+
+    state = {}
+
+    def load_connections():
+        n = users * connections_per_user // 2
+        a = rng.choice(ids, n, p=activity_p)
+        b = rng.integers(1, users + 1, n)
+        keep = a != b
+        a, b = a[keep], b[keep]
+        low, high = np.minimum(a, b), np.maximum(a, b)
+        low, high = unique_pairs(low, high)
+        accepted = rng.random(len(low)) < 0.85
+        state['connections'] = (low[accepted], high[accepted])
+        flip = rng.random(len(low)) < 0.5  # who sent the request
+        return bulk_insert(Connection, {
+            "id": np.arange(1, len(low) + 1),
+            "user1_id": np.where(flip, high, low),
+            "user2_id": np.where(flip, low, high),
+            "status": np.where(accepted, 'accepted', 'pending'),
+        }, batch_size)
+
+    def load_events():
+        creators = rng.choice(ids, events, p=activity_p)
+        offsets = rng.uniform(-horizon / 2, horizon, events)  # some in the future
+        dates = [d.strftime("%Y-%m-%d") for d in datetimes(end, offsets)]
+        titles = rng.integers(0, len(EVENT_TITLES), events)
+        bulk_insert(Event, {
+            "id": np.arange(1, events + 1),
+            "creator_id": creators,
+            "title": [EVENT_TITLES[t] for t in titles.tolist()],
+            "description": [f"Join us for {EVENT_TITLES[t].lower()}!" for t in titles.tolist()],
+            "date": dates,
+            "tags": ["campus,students"] * events,
+        }, batch_size)
+        per_event = np.minimum(rng.zipf(1.8, events) * 3, users)
+        event_rows = np.repeat(np.arange(1, events + 1), per_event)
+        people = rng.integers(1, users + 1, len(event_rows))
+        event_rows, people = unique_pairs(event_rows, people)
+        bulk_insert(EventParticipant, {
+            "id": np.arange(1, len(event_rows) + 1),
+            "event_id": event_rows,
+            "user_id": people,
+        }, batch_size)
+        return events
+
+    def load_posts():
+        # Sorted so post ids grow with created_at, as they do in production
+        offsets = np.sort(rng.uniform(0, horizon, posts))[::-1]
+        authors = rng.choice(ids, posts, p=activity_p)
+        popularity = rng.pareto(1.5, posts) + 1
+        state['post_times'] = offsets
+        like_posts = rng.choice(np.arange(1, posts + 1), likes, p=popularity / popularity.sum())
+        like_users = rng.choice(ids, likes, p=activity_p)
+        like_posts, like_users = unique_pairs(like_posts, like_users)
+        texts = rng.integers(0, len(POSTS), posts)
+        bulk_insert(Post, {
+            "id": np.arange(1, posts + 1),
+            "user_id": authors,
+            "content": [POSTS[t] for t in texts.tolist()],
+            "image_url": [None] * posts,
+            "created_at": datetimes(end, offsets),
+            "likes_count": np.bincount(like_posts, minlength=posts + 1)[1:],
+        }, batch_size)
+        bulk_insert(PostLike, {
+            "id": np.arange(1, len(like_posts) + 1),
+            "post_id": like_posts,
+            "user_id": like_users,
+        }, batch_size)
+        comment_posts = rng.choice(np.arange(1, posts + 1), comments, p=popularity / popularity.sum())
+        delay = np.minimum(rng.exponential(6 * 3600, comments), offsets[comment_posts - 1])
+        order = np.argsort(-(offsets[comment_posts - 1] - delay), kind='stable')
+        texts = rng.integers(0, len(COMMENTS), comments)
+        bulk_insert(PostComment, {
+            "id": np.arange(1, comments + 1),
+            "post_id": comment_posts[order],
+            "user_id": rng.choice(ids, comments, p=activity_p),
+            "content": [COMMENTS[t] for t in texts[order].tolist()],
+            "created_at": datetimes(end, (offsets[comment_posts - 1] - delay)[order]),
+        }, batch_size)
+        return posts
+
+    def load_messages():
+        # Conversation pairs: mostly between connections, plus strangers and bot spam
+        conn_low, conn_high = state['connections']
+        n_pairs = max(messages // 15, 1)
+        from_connections = rng.choice(len(conn_low), min(int(n_pairs * 0.7), len(conn_low)), replace=False) \
+            if len(conn_low) else np.zeros(0, dtype=np.int64)
+        strangers = n_pairs - len(from_connections)
+        a = rng.choice(ids, strangers, p=activity_p)
+        b = rng.integers(1, users + 1, strangers)
+        low = np.concatenate([conn_low[from_connections], np.minimum(a, b)])
+        high = np.concatenate([conn_high[from_connections], np.maximum(a, b)])
+        keep = low != high
+        low, high = unique_pairs(low[keep], high[keep])
+        spammer = np.where(is_bot[low - 1], low, np.where(is_bot[high - 1], high, 0))
+        n_pairs = len(low)
+
+        # Message i belongs to conversation conv[i]; timestamps ascend with id
+        pair_weight = activity[low - 1] * activity[high - 1]
+        conv = rng.choice(n_pairs, messages, p=pair_weight / pair_weight.sum())
+        offsets = np.sort(rng.uniform(0, horizon, messages))[::-1]
+        from_low = rng.random(messages) < 0.5
+        sender = np.where(spammer[conv] > 0, spammer[conv], np.where(from_low, low[conv], high[conv]))
+        receiver = np.where(sender == low[conv], high[conv], low[conv])
+        is_read = (offsets > 3 * 86400) | (rng.random(messages) < 0.5)
+        texts = np.where(spammer[conv] > 0, rng.integers(0, len(SPAM_MESSAGES), messages),
+                         rng.integers(0, len(MESSAGES), messages))
+        is_spam = (spammer[conv] > 0).tolist()
+
+        # Only pairs that actually exchanged messages get a summary row
+        used, last_index = np.unique(conv[::-1], return_index=True)
+        last_index = messages - 1 - last_index
+        conversation_id = np.zeros(n_pairs, dtype=np.int64)
+        conversation_id[used] = np.arange(1, len(used) + 1)
+        unread = ~is_read
+        unread_low = np.bincount(conv[unread & (receiver == low[conv])], minlength=n_pairs)
+        unread_high = np.bincount(conv[unread & (receiver == high[conv])], minlength=n_pairs)
+        timestamps = datetimes(end, offsets)
+
+        # Conversations reference their last message and messages their
+        # conversation, so summary rows go in first with the ids precomputed
+        bulk_insert(Conversation, {
+            "id": conversation_id[used],
+            "user_low_id": low[used],
+            "user_high_id": high[used],
+            "last_message_id": last_index + 1,
+            "last_timestamp": [timestamps[i] for i in last_index.tolist()],
+            "unread_low": unread_low[used],
+            "unread_high": unread_high[used],
+        }, batch_size)
+        return bulk_insert(Message, {
+            "id": np.arange(1, messages + 1),
+            "sender_id": sender,
+            "receiver_id": receiver,
+            "conversation_id": conversation_id[conv],
+            "content": [(SPAM_MESSAGES if spam else MESSAGES)[t] for t, spam in zip(texts.tolist(), is_spam)],
+            "timestamp": timestamps,
+            "is_read": is_read,
+        }, batch_size)
+
+    loaded = [User, Skill, Interest, Subject, AttendanceRecord, Connection, Event, EventParticipant,
+              Post, PostLike, PostComment, Conversation, Message]
+    indexes = drop_indexes([model.__table__ for model in loaded])
+    step('users', load_users)
+    step('skills', load_tags(Skill, 'skill_name', SKILLS, skills_per_user))
+    step('interests', load_tags(Interest, 'interest_name', INTERESTS, 2))
+    step('attendance_records', load_attendance)
+    step('connections', load_connections)
+    step('events', load_events)
+    step('posts', load_posts)
+    step('messages', load_messages)
+    # Building each index once over the loaded rows beats maintaining it per insert
+    step('indexes', lambda: create_indexes(indexes))
+    db.session.commit()
+
+    step('timeline_entries', lambda: backfill_timelines(timeline_length))
+    step('counters', repair_counters)
+    if db.engine.dialect.name == 'sqlite':
+        db.session.connection().exec_driver_sql('ANALYZE')
+    restore_connection(saved)
+    db.session.commit()
+    # The steps commit in between, so the load may have checked out (and
+    # tuned) more than one pooled connection: close them all
+    db.session.remove()
+    db.engine.dispose()
+    return counts
+
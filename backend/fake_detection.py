@@ -0,0 +1,45 @@
+import numpy as np
+from sqlalchemy import update
+from sklearn.ensemble import IsolationForest
+
+from database import db
+from models import User
+
+# Column order of the feature matrix fed to the Isolation Forest
+FEATURE_COLUMNS = ['skills', 'events', 'interests', 'messages_sent']
+
+
+def activity_counts():
+    """Return (user ids, counts matrix in FEATURE_COLUMNS order) read from the User counter columns."""
+    rows = db.session.query(
+        User.id, User.skills_count, User.events_created_count, User.interests_count, User.messages_sent_count
+    ).order_by(User.id).all()
+    matrix = np.array(rows, dtype=np.int64).reshape(-1, len(FEATURE_COLUMNS) + 1)
+    return matrix[:, 0], matrix[:, 1:]
+
+
+def run_fake_detection_scan(progress=None):
+    """Flag anomalous accounts (is_suspicious); trust scores follow from the flag.
+
+    Returns the number of flagged accounts, or None when there are too few
+    users to fit the model. progress(fraction) is called between stages.
+    """
+    progress = progress or (lambda fraction: None)
+    user_ids, counts = activity_counts()
+    if len(user_ids) < 5:
+        return None
+    progress(0.3)
+
+    # Use Isolation Forest for fake profile detection
+    model = IsolationForest(contamination=0.1, random_state=42)
+    # Predictions: 1 for normal, -1 for anomaly
+    flagged = model.fit_predict(counts) == -1
+    progress(0.6)
+
+    # One executemany UPDATE keyed by primary key
+    db.session.execute(update(User), [
+        {"id": int(uid), "is_suspicious": bool(flag)}
+        for uid, flag in zip(user_ids, flagged)
+    ])
+    db.session.commit()
+    return int(flagged.sum())
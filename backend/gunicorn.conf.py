@@ -0,0 +1,68 @@
+"""Production gunicorn settings: `gunicorn -c gunicorn.conf.py app:app`.
+
+The app is loaded and its read-only ML state (skill index, attendance risk
+model, ML libraries) built once in the master; forked workers then share
+those pages copy-on-write. GUNICORN_PRELOAD=0 restores per-worker loading.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# The 'local' stream transport only reaches clients of its own process, so it
+# gets one worker; the default 'db' transport works across any number
+stream_transport = os.environ.get('STREAM_TRANSPORT', 'db')
+workers = int(os.environ.get('WEB_CONCURRENCY', 1 if stream_transport == 'local' else 2))
+# Threaded workers: slow requests (and open /api/stream connections) hold a
+# thread rather than a whole process
+worker_class = 'gthread'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+# Every open stream holds a thread for as long as the client stays, so each
+# worker gets STREAM_MAX_CONNECTIONS threads for streams on top of the
+# GUNICORN_THREADS that serve ordinary requests
+stream_slots = int(os.environ.setdefault('STREAM_MAX_CONNECTIONS', '32'))
+request_threads = int(os.environ.get('GUNICORN_THREADS', 8))
+threads = request_threads + stream_slots
+
+# A login holds its request thread while it waits for the hashing pool, so
+# bound running + queued hashes to leave two request threads for everything else
+hash_workers = int(os.environ.setdefault('PASSWORD_HASH_WORKERS', str(min(4, max(request_threads - 2, 1)))))
+os.environ.setdefault('PASSWORD_HASH_QUEUE', str(max(request_threads - 2 - hash_workers, 0)))
+
+
+def _warm(server):
+    from app import warm_shared_state
+    warm_shared_state(server.app.wsgi())
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported, before any fork
+    if preload_app:
+        _warm(server)
+        # Move everything built so far out of the collector's generations so
+        # workers' GC passes don't write to (and un-share) those pages
+        gc.freeze()
+
+
+def on_reload(server):
+    # `kill -HUP <master>`: rebuild the shared state in the master before the
+    # replacement workers fork, so they share the fresh copy again
+    if preload_app:
+        gc.unfreeze()
+        _warm(server)
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        _warm(worker)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app import app
+        from database import db
+        with app.app_context():
+            # Drop any pool state inherited from the master without closing its sockets
+            db.engine.dispose(close=False)
@@ -0,0 +1,198 @@
+import importlib
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update
+
+from database import db
+from models import Job
+
+ACTIVE_STATES = ('queued', 'running')
+HOSTNAME = socket.gethostname()
+
+# job type -> function(progress) returning a summary dict
+JOB_TYPES = {}
+
+
+def job_type(name):
+    """Register a function that runs inside a pool process.
+
+    The function receives a progress(fraction) callback and returns a JSON
+    summary stored on the Job row. Anything the web workers need beyond that
+    (e.g. a trained model) has to be persisted by the job itself.
+    """
+    def register(fn):
+        JOB_TYPES[name] = fn
+        return fn
+    return register
+
+
+class _Progress:
+    # Throttled writer so tight loops don't commit on every step
+    def __init__(self, job_id, min_interval=1.0):
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self._last = 0.0
+
+    def __call__(self, fraction):
+        now = time.monotonic()
+        if fraction < 1.0 and now - self._last < self.min_interval:
+            return
+        self._last = now
+        db.session.execute(update(Job).where(Job.id == self.job_id).values(progress=min(max(fraction, 0.0), 1.0)))
+        db.session.commit()
+
+
+def _runner_id():
+    return f"{HOSTNAME}:{os.getpid()}"
+
+
+def _runner_alive(runner):
+    """False when runner is a process on this host that no longer exists."""
+    host, _, pid = (runner or '').rpartition(':')
+    if host != HOSTNAME or not pid.isdigit():
+        return True  # another machine's (or unknown): only stale_after applies
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _fail(job_id, error):
+    """Mark a job failed unless it already finished."""
+    db.session.execute(update(Job).where(Job.id == job_id, Job.state.in_(ACTIVE_STATES)).values(
+        state='failed', finished_at=datetime.utcnow(), error=error
+    ))
+    db.session.commit()
+
+
+def _worker_app():
+    # Pool processes are spawned, so they import the Flask app afresh
+    return importlib.import_module('app').app
+
+
+def _run_job(job_id, name):
+    """Entry point inside the pool process."""
+    app = _worker_app()
+    with app.app_context():
+        fn = JOB_TYPES[name]
+        db.session.execute(update(Job).where(Job.id == job_id).values(
+            state='running', started_at=datetime.utcnow(), runner=_runner_id()
+        ))
+        db.session.commit()
+        try:
+            summary = fn(_Progress(job_id))
+        except Exception:
+            db.session.rollback()
+            db.session.execute(update(Job).where(Job.id == job_id).values(
+                state='failed', finished_at=datetime.utcnow(), error=traceback.format_exc(limit=5)
+            ))
+            db.session.commit()
+            raise
+        db.session.execute(update(Job).where(Job.id == job_id).values(
+            state='succeeded', progress=1.0, finished_at=datetime.utcnow(), result=json.dumps(summary)
+        ))
+        db.session.commit()
+
+
+class JobRunner:
+    """Runs registered job types on a local process pool, tracked in the job table.
+
+    Submitting a type that already has a queued or running job returns that
+    job instead of starting another. A job whose pool crashed, or whose
+    process (on this host) is gone after a restart, is marked failed by
+    fail_orphaned(), which runs before each submit and from `flask init-db`.
+    Jobs stuck in an active state for longer than stale_after (e.g. on
+    another host) no longer block new ones either.
+    """
+
+    def __init__(self, max_workers=2, stale_after=3600):
+        self.max_workers = max_workers
+        self.stale_after = stale_after
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def fail_orphaned(self):
+        """Mark active jobs whose process no longer exists as failed. Returns how many."""
+        orphaned = [job.id for job in Job.query.filter(Job.state.in_(ACTIVE_STATES))
+                    if not _runner_alive(job.runner)]
+        for job_id in orphaned:
+            _fail(job_id, "The process running this job exited before it finished.")
+        return len(orphaned)
+
+    def submit(self, name, requested_by=None):
+        """Return (job, created). created is False when an active job was reused."""
+        if name not in JOB_TYPES:
+            raise KeyError(name)
+
+        self.fail_orphaned()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        existing = Job.query.filter(
+            Job.job_type == name, Job.state.in_(ACTIVE_STATES), Job.created_at >= cutoff
+        ).order_by(Job.created_at.desc()).first()
+        if existing:
+            return existing, False
+
+        job = Job(job_type=name, requested_by=requested_by, runner=_runner_id())
+        db.session.add(job)
+        db.session.commit()
+
+        # Two workers may have raced past the check above; the older job wins
+        earlier = Job.query.filter(
+            Job.job_type == name, Job.state.in_(ACTIVE_STATES), Job.created_at >= cutoff, Job.id < job.id
+        ).order_by(Job.id).first()
+        if earlier:
+            db.session.delete(job)
+            db.session.commit()
+            return earlier, False
+
+        job_id, app, pool = job.id, current_app._get_current_object(), self._pool()
+        future = pool.submit(_run_job, job_id, name)
+        future.add_done_callback(lambda f: self._finished(app, pool, job_id, f))
+        return job, True
+
+    def _finished(self, app, pool, job_id, future):
+        """Record pool failures that _run_job couldn't (e.g. a crashed pool process)."""
+        if future.cancelled():
+            error = "The job was cancelled before it started."
+        elif isinstance(future.exception(), BrokenProcessPool):
+            error = "A pool process died while the job was queued or running."
+            with self._lock:
+                # A broken pool refuses new work: start a fresh one on the next submit
+                if self._executor is pool:
+                    self._executor = None
+        elif future.exception() is not None:
+            error = "".join(traceback.format_exception(future.exception(), limit=5))
+        else:
+            return
+        with app.app_context():
+            _fail(job_id, error)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+job_runner = JobRunner()
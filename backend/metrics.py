@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+# Upper bounds of the histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        """Prometheus lines for this histogram (buckets are cumulative)."""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class EndpointStats:
+    __slots__ = ('latency', 'statements', 'sql_seconds', 'response_bytes', 'statuses')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.sql_seconds = 0.0
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.statuses = {}
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """Per-endpoint request latency, SQL work, response size and status counts.
+
+    init_app() hooks the Flask request cycle and SQLAlchemy's cursor events
+    on db.engine. SQL statements are attributed to the request running on
+    the same thread; statements outside a request (CLI, jobs) are ignored.
+
+    Each worker process counts in memory and, once it has served a request,
+    writes a snapshot (with the gauges() values) to <root>/<pid>.json every
+    flush_interval seconds. render() reads every worker's snapshot, so a
+    scrape answered by any worker returns all of them, each series labelled
+    worker="<pid>"; sum over the label for the whole deployment. Snapshots
+    not rewritten for three intervals belong to exited workers and are
+    removed. root must be shared by the workers; None keeps metrics to the
+    answering process.
+    """
+
+    def __init__(self, root=None, flush_interval=5.0):
+        self.root = root
+        self.flush_interval = flush_interval
+        # Callable returning (name, help, value) for point-in-time values
+        # owned by other modules, e.g. cache sizes
+        self.gauges = None
+        self._lock = threading.Lock()
+        self._endpoints = {}  # (endpoint, method) -> EndpointStats
+        self.started_at = time.time()
+        self._flusher = None
+        # A forked worker starts its own counters and flusher
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.started_at = time.time()
+        self._flusher = None
+
+    def init_app(self, app, db):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        with app.app_context():
+            engine = db.engine
+        # Once per engine, however many times init_app runs against it
+        if not event.contains(engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'sql_statements' in g:
+            g.sql_statement_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'sql_statement_started' in g:
+            g.sql_statements += 1
+            g.sql_seconds += time.perf_counter() - g.pop('sql_statement_started')
+
+    def _after_request(self, response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        if self._flusher is None and self.root:
+            self._start_flusher()
+        elapsed = time.perf_counter() - started
+        # Streamed bodies (SSE, files) have no length up front, and asking
+        # would buffer the whole generator
+        size = 0 if response.is_streamed else response.calculate_content_length() or 0
+        key = (request.endpoint or 'unmatched', request.method)
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = EndpointStats()
+            stats.latency.observe(elapsed)
+            stats.statements.observe(g.sql_statements)
+            stats.sql_seconds += g.sql_seconds
+            stats.response_bytes.observe(size)
+            stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+
+        server_timing = current_app.config.get('SERVER_TIMING')
+        if server_timing or (server_timing is None and current_app.debug):
+            response.headers.add('Server-Timing', f'app;dur={elapsed * 1000:.1f}')
+            response.headers.add('Server-Timing',
+                                 f'db;dur={g.sql_seconds * 1000:.1f};desc="{g.sql_statements} queries"')
+        return response
+
+    def snapshot(self):
+        """This process's metrics as a JSON-serialisable dict."""
+        with self._lock:
+            endpoints = [
+                {"endpoint": endpoint, "method": method, "sql_seconds": stats.sql_seconds,
+                 "statuses": {str(status): count for status, count in stats.statuses.items()},
+                 **{name: [getattr(stats, name).counts, getattr(stats, name).sum, getattr(stats, name).count]
+                    for name in ('latency', 'statements', 'response_bytes')}}
+                for (endpoint, method), stats in sorted(self._endpoints.items())
+            ]
+        return {"pid": os.getpid(), "started_at": self.started_at, "endpoints": endpoints,
+                "gauges": [list(gauge) for gauge in (self.gauges() if self.gauges else ())]}
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name='metrics-flush')
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            try:
+                self.flush()
+            except Exception:
+                pass  # e.g. the directory is briefly unavailable: try again next time
+            time.sleep(self.flush_interval)
+
+    def flush(self):
+        """Write this process's snapshot to <root>/<pid>.json."""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def _snapshots(self):
+        """Every live worker's snapshot, this process's taken now."""
+        own = self.snapshot()
+        snapshots = [own]
+        if not self.root or not os.path.isdir(self.root):
+            return snapshots
+        stale_before = time.time() - 3 * self.flush_interval
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith('.json') or name == f"{own['pid']}.json":
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                if os.stat(path).st_mtime < stale_before:
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # removed or rewritten under us
+        return snapshots
+
+    def render(self):
+        """All workers' metrics in the Prometheus text exposition format."""
+        snapshots = self._snapshots()
+        lines = []
+        families = (
+            ('http_request_duration_seconds', 'Request latency.', 'latency', LATENCY_BUCKETS),
+            ('http_request_sql_statements', 'SQL statements issued per request.', 'statements', STATEMENT_BUCKETS),
+            ('http_response_size_bytes', 'Response body size.', 'response_bytes', SIZE_BUCKETS),
+        )
+        for name, help_text, key, buckets in families:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for snap in snapshots:
+                for stats in snap['endpoints']:
+                    histogram = Histogram(buckets)
+                    histogram.counts, histogram.sum, histogram.count = stats[key]
+                    lines += histogram.samples(name, self._labels(snap, stats))
+
+        lines += ['# HELP http_request_sql_seconds_total Time spent in SQL statements.',
+                  '# TYPE http_request_sql_seconds_total counter']
+        for snap in snapshots:
+            for stats in snap['endpoints']:
+                lines.append(f'http_request_sql_seconds_total{{{self._labels(snap, stats)}}} {stats["sql_seconds"]:.6f}')
+
+        lines += ['# HELP http_requests_total Requests by status code.', '# TYPE http_requests_total counter']
+        for snap in snapshots:
+            for stats in snap['endpoints']:
+                for status, count in sorted(stats['statuses'].items()):
+                    lines.append(f'http_requests_total{{{self._labels(snap, stats)},status="{status}"}} {count}')
+
+        lines += ['# HELP process_start_time_seconds Start time of the worker process.',
+                  '# TYPE process_start_time_seconds gauge']
+        lines += [f'process_start_time_seconds{{worker="{snap["pid"]}"}} {snap["started_at"]:.3f}' for snap in snapshots]
+        gauges = {}
+        for snap in snapshots:
+            for name, help_text, value in snap['gauges']:
+                gauges.setdefault((name, help_text), []).append(f'{name}{{worker="{snap["pid"]}"}} {value}')
+        for (name, help_text), samples in gauges.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge'] + samples
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _labels(snap, stats):
+        return f'worker="{snap["pid"]}",endpoint="{_label(stats["endpoint"])}",method="{stats["method"]}"'
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class ModelRegistry:
+    """Versioned store for trained models on local disk.
+
+    Layout: <root>/<name>/v<N>/model.joblib and meta.json, plus a CURRENT
+    file naming the live version. New versions are written to a temporary
+    directory and renamed into place, and CURRENT is swapped with
+    os.replace, so readers never see a half-written model.
+
+    Every worker process loads the current version lazily and re-checks the
+    CURRENT file (one stat call) on each lookup, reloading when another
+    process has published a new version.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._loaded = {}  # name -> (CURRENT stat signature, version, model, meta)
+
+    def _dir(self, name):
+        return os.path.join(self.root, name)
+
+    def _current_path(self, name):
+        return os.path.join(self._dir(name), 'CURRENT')
+
+    def current_version(self, name):
+        try:
+            with open(self._current_path(name)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def metadata(self, name, version=None):
+        version = version or self.current_version(name)
+        if version is None:
+            return None
+        with open(os.path.join(self._dir(name), version, 'meta.json')) as f:
+            return json.load(f)
+
+    def save(self, name, model, fingerprint, metrics):
+        """Publish a new version and make it current. Returns its metadata."""
+        import joblib
+
+        model_dir = self._dir(name)
+        os.makedirs(model_dir, exist_ok=True)
+        existing = [int(d[1:]) for d in os.listdir(model_dir) if d.startswith('v') and d[1:].isdigit()]
+        number = max(existing, default=0) + 1
+
+        while True:
+            version = f"v{number}"
+            tmp_dir = os.path.join(model_dir, f".{version}.{os.getpid()}.tmp")
+            os.makedirs(tmp_dir)
+            meta = {
+                "name": name,
+                "version": version,
+                "fingerprint": fingerprint,
+                "metrics": metrics,
+                "trained_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+            }
+            joblib.dump(model, os.path.join(tmp_dir, 'model.joblib'))
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+                json.dump(meta, f, indent=2)
+            try:
+                os.rename(tmp_dir, os.path.join(model_dir, version))
+                break
+            except OSError:
+                # Another process published this number first
+                for fname in os.listdir(tmp_dir):
+                    os.remove(os.path.join(tmp_dir, fname))
+                os.rmdir(tmp_dir)
+                number += 1
+
+        tmp_current = self._current_path(name) + f".{os.getpid()}.tmp"
+        with open(tmp_current, 'w') as f:
+            f.write(version)
+        os.replace(tmp_current, self._current_path(name))
+        return meta
+
+    def load(self, name):
+        """Return (model, meta) for the current version, or (None, None) if none exists."""
+        try:
+            st = os.stat(self._current_path(name))
+        except FileNotFoundError:
+            return None, None
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+
+        with self._lock:
+            cached = self._loaded.get(name)
+            if cached and cached[0] == signature:
+                return cached[2], cached[3]
+
+            import joblib
+
+            version = self.current_version(name)
+            model = joblib.load(os.path.join(self._dir(name), version, 'model.joblib'))
+            meta = self.metadata(name, version)
+            self._loaded[name] = (signature, version, model, meta)
+            return model, meta
+
+
+model_registry = ModelRegistry(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trained_models'))
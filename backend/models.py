@@ -1,5 +1,7 @@
 from database import db
+from uploads import sized_url
 from datetime import datetime
+import json
 
 class Subject(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -15,7 +17,7 @@ class Subject(db.Model):
 
 class AttendanceRecord(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
     classes_attended = db.Column(db.Integer, nullable=False, default=0)
     recent_absences_last_5 = db.Column(db.Integer, nullable=False, default=0)
@@ -46,8 +48,15 @@ class User(db.Model):
     is_admin = db.Column(db.Boolean, default=False)
     is_suspicious = db.Column(db.Boolean, default=False)
     is_suspended = db.Column(db.Boolean, default=False)
-    trust_score = db.Column(db.Integer, default=50)
     profile_photo = db.Column(db.String(255), nullable=True)
+    skills_updated_at = db.Column(db.DateTime, nullable=True)
+    # Activity counters kept in step by the write paths (see counters.py);
+    # `flask repair-counters` rebuilds them from the underlying tables
+    skills_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    interests_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    events_created_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    messages_sent_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    messages_received_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relationships
     skills = db.relationship('Skill', backref='user', lazy=True, cascade="all, delete-orphan")
@@ -58,6 +67,10 @@ class User(db.Model):
     post_likes = db.relationship('PostLike', backref='user', lazy=True, cascade="all, delete-orphan")
     post_comments = db.relationship('PostComment', backref='author', lazy=True, cascade="all, delete-orphan")
     
+    def current_trust_score(self):
+        from counters import user_trust_score
+        return user_trust_score(self)
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -68,8 +81,10 @@ class User(db.Model):
             "bio": self.bio,
             "is_admin": self.is_admin,
             "is_suspicious": self.is_suspicious,
-            "trust_score": self.trust_score,
-            "profile_photo": self.profile_photo,
+            "trust_score": self.current_trust_score(),
+            # Stored uploads have fixed-size copies; the original stays available
+            "profile_photo": sized_url(self.profile_photo, 'avatar'),
+            "profile_photo_original": self.profile_photo,
             "skills": [s.skill_name for s in self.skills],
             "interests": [i.interest_name for i in self.interests],
             "is_suspended": self.is_suspended
@@ -99,6 +114,40 @@ class Skill(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     skill_name = db.Column(db.String(100), nullable=False)
 
+class PartnerRecommendation(db.Model):
+    __table_args__ = (db.Index('ix_partner_recommendation_user_rank', 'user_id', 'rank'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    partner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    partner = db.relationship('User', foreign_keys=[partner_id], lazy=True)
+
+class RecommendationRun(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    mode = db.Column(db.String(20), nullable=False) # full, partial
+    status = db.Column(db.String(20), default='running') # running, complete
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    users_processed = db.Column(db.Integer, default=0)
+    users_per_sec = db.Column(db.Float, nullable=True)
+    peak_memory_mb = db.Column(db.Float, nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "status": self.status,
+            "started_at": self.started_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "finished_at": self.finished_at.strftime("%Y-%m-%d %H:%M:%S") if self.finished_at else None,
+            "users_processed": self.users_processed,
+            "users_per_sec": round(self.users_per_sec, 1) if self.users_per_sec is not None else None,
+            "peak_memory_mb": round(self.peak_memory_mb, 1) if self.peak_memory_mb is not None else None
+        }
+
 class Interest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -132,9 +181,12 @@ class EventParticipant(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
 class Message(db.Model):
+    __table_args__ = (db.Index('ix_message_conversation_timestamp_id', 'conversation_id', 'timestamp', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=True)
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     is_read = db.Column(db.Boolean, default=False)
@@ -149,6 +201,38 @@ class Message(db.Model):
             "is_read": self.is_read
         }
 
+class Conversation(db.Model):
+    # One row per user pair (low id, high id), maintained on every message write
+    __table_args__ = (
+        db.UniqueConstraint('user_low_id', 'user_high_id', name='uq_conversation_pair'),
+        db.Index('ix_conversation_low_last', 'user_low_id', 'last_timestamp'),
+        db.Index('ix_conversation_high_last', 'user_high_id', 'last_timestamp'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_low_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_high_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # use_alter breaks the message <-> conversation foreign key cycle for create/drop ordering
+    last_message_id = db.Column(db.Integer, db.ForeignKey('message.id', use_alter=True, name='fk_conversation_last_message'), nullable=True)
+    last_timestamp = db.Column(db.DateTime, nullable=True)
+    unread_low = db.Column(db.Integer, nullable=False, default=0) # unread by user_low
+    unread_high = db.Column(db.Integer, nullable=False, default=0) # unread by user_high
+
+class StreamEvent(db.Model):
+    # Recent /api/stream events, shared by every worker process (see broker.py)
+    __table_args__ = (db.Index('ix_stream_event_user_id', 'user_id', 'id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: events are short-lived and must not block deleting a user
+    user_id = db.Column(db.Integer, nullable=False)
+    event_type = db.Column(db.String(30), nullable=False)
+    data = db.Column(db.Text, nullable=False) # JSON
+    origin = db.Column(db.String(32), nullable=False) # Broker.boot_id of the publishing process
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_event(self):
+        return {"id": str(self.id), "event": self.event_type, "data": json.loads(self.data)}
+
 class Connection(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user1_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -170,6 +254,8 @@ class ProjectRequirement(db.Model):
         }
 
 class Post(db.Model):
+    __table_args__ = (db.Index('ix_post_created_at_id', 'created_at', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -179,28 +265,40 @@ class Post(db.Model):
 
     comments = db.relationship('PostComment', backref='post', lazy=True, cascade="all, delete-orphan")
     likes = db.relationship('PostLike', backref='post', lazy=True, cascade="all, delete-orphan")
+    timeline_entries = db.relationship('TimelineEntry', backref='post', lazy=True, cascade="all, delete-orphan")
 
     def to_dict(self):
         return {
             "id": self.id,
             "user_id": self.user_id,
             "author_name": self.author.name if getattr(self, 'author', None) else "Unknown",
-            "author_photo": self.author.profile_photo if getattr(self, 'author', None) else None,
+            "author_photo": sized_url(self.author.profile_photo, 'avatar') if getattr(self, 'author', None) else None,
             "content": self.content,
-            "image_url": self.image_url,
+            "image_url": sized_url(self.image_url, 'feed'),
+            "image_original_url": self.image_url,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S"),
             "likes_count": self.likes_count,
             "comments_count": len(self.comments)
         }
 
+class TimelineEntry(db.Model):
+    # Materialised feed row: the newest posts, in feed order
+    __table_args__ = (db.Index('ix_timeline_entry_created', 'created_at', 'post_id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False) # copy of Post.created_at for ordering
+
 class PostLike(db.Model):
+    __table_args__ = (db.Index('ix_post_like_user_post', 'user_id', 'post_id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
 class PostComment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -211,9 +309,40 @@ class PostComment(db.Model):
             "post_id": self.post_id,
             "user_id": self.user_id,
             "author_name": self.author.name if getattr(self, 'author', None) else "Unknown",
-            "author_photo": self.author.profile_photo if getattr(self, 'author', None) else None,
+            "author_photo": sized_url(self.author.profile_photo, 'avatar') if getattr(self, 'author', None) else None,
             "content": self.content,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S")
         }
 
+class Job(db.Model):
+    # Background job state, shared by every web worker and pool process
+    __table_args__ = (db.Index('ix_job_type_state', 'job_type', 'state'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    state = db.Column(db.String(20), nullable=False, default='queued') # queued, running, succeeded, failed
+    progress = db.Column(db.Float, nullable=False, default=0.0)
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    result = db.Column(db.Text, nullable=True) # JSON summary
+    error = db.Column(db.Text, nullable=True)
+    # "<host>:<pid>" of the process responsible for it: the submitting web
+    # worker while queued, the pool process once running
+    runner = db.Column(db.String(100), nullable=True)
 
+    def to_dict(self):
+        fmt = lambda dt: dt.strftime("%Y-%m-%d %H:%M:%S") if dt else None
+        return {
+            "id": self.id,
+            "job_type": self.job_type,
+            "state": self.state,
+            "progress": round(self.progress, 3),
+            "requested_by": self.requested_by,
+            "created_at": fmt(self.created_at),
+            "started_at": fmt(self.started_at),
+            "finished_at": fmt(self.finished_at),
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error
+        }
@@ -0,0 +1,80 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool already has its maximum of work queued."""
+
+
+class PasswordHasher:
+    """Runs password hashing on a small bounded thread pool.
+
+    hashlib's PBKDF2 and scrypt release the GIL, so hashes on the pool run in
+    parallel while the web worker's other threads keep serving requests. At
+    most max_workers hashes run at once and max_queue more may wait; beyond
+    that hash()/verify() raise HasherBusy straight away so a login burst is
+    shed with a 503.
+
+    The calling request thread still waits for its hash, so this only
+    protects other endpoints when max_workers + max_queue is below the
+    number of request threads per process (GUNICORN_THREADS): a burst then
+    holds at most that many threads. With more, every thread can end up
+    waiting on the pool before the limit is reached.
+
+    method is any werkzeug generate_password_hash method, e.g. 'scrypt' or
+    'pbkdf2:sha256:600000'. Stored hashes made with a different method are
+    reported by needs_rehash() so they can be upgraded on login.
+    """
+
+    def __init__(self, method='scrypt', max_workers=4, max_queue=2):
+        self.method = method
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.rejected = 0
+        self._executor = None
+        self._in_flight = 0
+        self._prefix = None  # (method, canonical hash prefix)
+        self._lock = threading.Lock()
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise HasherBusy()
+            self._in_flight += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='password-hash')
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def hash(self, password):
+        return self._submit(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._submit(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when password_hash wasn't made with the configured method and cost."""
+        if self._prefix is None or self._prefix[0] != self.method:
+            # werkzeug fills in default parameters (e.g. 'scrypt' -> 'scrypt:32768:8:1'),
+            # so take the canonical prefix from a real hash once
+            self._prefix = (self.method, generate_password_hash('', self.method).split('$', 1)[0])
+        return password_hash.split('$', 1)[0] != self._prefix[1]
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,292 @@
+import collections
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, request
+
+MODES = ('sample', 'cprofile')
+DEFAULT_SAMPLE_INTERVAL = 0.005
+# How often a worker looks for a new or stopped session, and writes out
+# what it has collected while one runs
+POLL_SECONDS = 1.0
+
+
+def collapse(frame, root):
+    """The stack ending at frame as 'root;outer;...;inner', the collapsed-stack format."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.append(root)
+    return ';'.join(reversed(names))
+
+
+class ProfileSession:
+    """One profiling window, as seen by this worker process."""
+
+    def __init__(self, config, root):
+        self.id = config['id']
+        self.mode = config['mode']
+        self.fraction = config['fraction']
+        self.endpoint = config.get('endpoint')
+        self.until = config['until']
+        self.dir = os.path.join(root, self.id)
+        self.lock = threading.Lock()
+        self.stacks = collections.Counter()  # sample mode: collapsed stack -> samples
+        self.stats = None  # cprofile mode: pstats.Stats merged over requests
+        self.targets = {}  # thread id -> endpoint of the sampled request it runs
+
+    def matches(self, endpoint):
+        if self.endpoint and endpoint != self.endpoint:
+            return False
+        return self.fraction >= 1 or random.random() < self.fraction
+
+    def add_profile(self, profile):
+        import pstats
+        with self.lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+
+    def sample(self):
+        frames = sys._current_frames()
+        with self.lock:
+            for thread_id, endpoint in self.targets.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.stacks[collapse(frame, endpoint)] += 1
+
+    def flush(self):
+        """Write this worker's results to <dir>/<pid>.collapsed or .pstats."""
+        os.makedirs(self.dir, exist_ok=True)
+        ext = 'collapsed' if self.mode == 'sample' else 'pstats'
+        path = os.path.join(self.dir, f"{os.getpid()}.{ext}")
+        tmp_path = f"{path}.tmp"
+        with self.lock:
+            if self.mode == 'sample':
+                if not self.stacks:
+                    return
+                with open(tmp_path, 'w') as f:
+                    for stack, count in sorted(self.stacks.items()):
+                        f.write(f"{stack} {count}\n")
+            else:
+                if self.stats is None:
+                    return
+                self.stats.dump_stats(tmp_path)
+        os.replace(tmp_path, path)
+
+
+class Profiler:
+    """Per-request profiling that an admin switches on at runtime.
+
+    A session (mode, fraction of requests, optional endpoint, end time) is
+    written to <root>/session.json, so it reaches every worker process:
+    each one re-checks that file at most once per POLL_SECONDS, from its
+    next request. While a session runs, matching requests are profiled
+    either by a sampler thread that reads their stacks every
+    sample_interval seconds ('sample', aggregated as collapsed stacks for
+    flamegraphs) or with cProfile ('cprofile', merged pstats). Each worker
+    writes its results under <root>/<session id>/ once a second and when
+    the session ends; results() merges them.
+
+    cProfile runs on one request per process at a time: from Python 3.12 a
+    second profiler can't be enabled while one is active, and the active one
+    records every thread. Matching requests that arrive meanwhile are not
+    profiled, and on 3.12+ a profile also holds whatever other threads ran
+    during its request. A failure to start or stop profiling is logged and
+    never fails the request.
+
+    With no session running, a request costs one clock read and a compare.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.sample_interval = DEFAULT_SAMPLE_INTERVAL
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._signature = None
+        self._config = None
+        self._session = None
+        # thread id -> (session, cProfile.Profile or None) for requests being
+        # profiled; a plain dict so teardown can skip the rest when it's empty
+        self._profiled = {}
+        # Held while a request runs under cProfile
+        self._cprofile_lock = threading.Lock()
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def _session_path(self):
+        return os.path.join(self.root, 'session.json')
+
+    def _before_request(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._refresh(now)
+        session = self._session
+        if session is None or not session.matches(request.endpoint):
+            return
+        thread_id = threading.get_ident()
+        if session.mode == 'sample':
+            with session.lock:
+                session.targets[thread_id] = request.endpoint or 'unmatched'
+            self._profiled[thread_id] = (session, None)
+        elif self._cprofile_lock.acquire(blocking=False):
+            try:
+                import cProfile
+                profile = cProfile.Profile()
+                profile.enable()
+            except Exception:
+                # e.g. another profiler (a debugger, coverage) holds the hook
+                self._cprofile_lock.release()
+                current_app.logger.exception("Could not start cProfile for %s", request.endpoint)
+                return
+            self._profiled[thread_id] = (session, profile)
+
+    def _teardown_request(self, exc):
+        if not self._profiled:
+            return
+        session, profile = self._profiled.pop(threading.get_ident(), (None, None))
+        if session is None:
+            return
+        if profile is None:
+            with session.lock:
+                session.targets.pop(threading.get_ident(), None)
+        else:
+            try:
+                profile.disable()
+                session.add_profile(profile)
+            except Exception:
+                current_app.logger.exception("Could not record cProfile results")
+            finally:
+                self._cprofile_lock.release()
+
+    def _refresh(self, now):
+        with self._lock:
+            if now < self._next_check:
+                return  # another thread just did it
+            self._next_check = now + POLL_SECONDS
+            config = self.read_session()
+            session = self._session
+            if session is not None and (config is None or config['id'] != session.id
+                                        or time.time() >= config['until']):
+                self._session = None  # its thread notices, flushes and exits
+            if self._session is None and config is not None and time.time() < config['until']:
+                session = ProfileSession(config, self.root)
+                self._session = session
+                threading.Thread(target=self._run, args=(session,), daemon=True,
+                                 name=f"profiler-{session.id}").start()
+
+    def _run(self, session):
+        """Sample (in 'sample' mode) and periodically flush until the session ends."""
+        next_flush = time.monotonic() + POLL_SECONDS
+        interval = self.sample_interval if session.mode == 'sample' else POLL_SECONDS
+        while self._session is session and time.time() < session.until:
+            time.sleep(interval)
+            if session.mode == 'sample':
+                session.sample()
+            if time.monotonic() >= next_flush:
+                session.flush()
+                next_flush = time.monotonic() + POLL_SECONDS
+        if self._session is session:
+            self._session = None
+        session.flush()
+
+    def read_session(self):
+        """The last session written to session.json, or None."""
+        path = self._session_path()
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._signature, self._config = None, None
+            return None
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if signature != self._signature:
+            with open(path) as f:
+                self._config = json.load(f)
+            self._signature = signature
+        return self._config
+
+    def start(self, mode, fraction=1.0, endpoint=None, seconds=60):
+        """Start a session in every worker (from their next request). Returns its config."""
+        config = {
+            "id": datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f'),
+            "mode": mode,
+            "fraction": fraction,
+            "endpoint": endpoint,
+            "seconds": seconds,
+            "until": time.time() + seconds,
+            "started_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self._write_session(config)
+        return config
+
+    def stop(self):
+        """End the running session early. Returns its config, or None if none was running."""
+        config = self.read_session()
+        if config is None or time.time() >= config['until']:
+            return None
+        config = dict(config, until=time.time())
+        self._write_session(config)
+        return config
+
+    def _write_session(self, config):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self._session_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(config, f, indent=2)
+        os.replace(tmp_path, self._session_path())
+        # Pick the change up on this worker's next request
+        self._next_check = 0.0
+
+    def status(self):
+        config = self.read_session()
+        if config is None:
+            return {"session": None, "active": False, "workers": []}
+        session_dir = os.path.join(self.root, config['id'])
+        files = sorted(os.listdir(session_dir)) if os.path.isdir(session_dir) else []
+        return {
+            "session": config,
+            "active": time.time() < config['until'],
+            "workers": [name.split('.')[0] for name in files if not name.endswith('.tmp')],
+        }
+
+    def results(self, session_id=None):
+        """(mode, merged results) for a session, by default the last one.
+
+        'sample' results are collapsed-stack text; 'cprofile' results are a
+        pstats.Stats. Returns (None, None) if no worker has written any yet.
+        """
+        config = self.read_session()
+        session_id = session_id or (config and config['id'])
+        if not session_id:
+            return None, None
+        session_dir = os.path.join(self.root, os.path.basename(session_id))
+        if not os.path.isdir(session_dir):
+            return None, None
+        files = [os.path.join(session_dir, name) for name in sorted(os.listdir(session_dir))]
+        collapsed = [path for path in files if path.endswith('.collapsed')]
+        if collapsed:
+            stacks = collections.Counter()
+            for path in collapsed:
+                with open(path) as f:
+                    for line in f:
+                        stack, _, count = line.rstrip('\n').rpartition(' ')
+                        stacks[stack] += int(count)
+            return 'sample', ''.join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+        dumps = [path for path in files if path.endswith('.pstats')]
+        if dumps:
+            import pstats
+            return 'cprofile', pstats.Stats(*dumps)
+        return None, None
+
+
+profiler = Profiler(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
@@ -0,0 +1,169 @@
+import os
+import re
+import threading
+import time
+import traceback
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+DEFAULT_REPEAT_THRESHOLD = 5
+DEFAULT_SLOW_QUERY_MS = 100
+# Frames shown for where a repeated statement was issued
+STACK_DEPTH = 3
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+# IN lists expanded from a Python list of any length
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%s|:\w+)\s*,)+\s*(?:\?|%s|:\w+)\s*\)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request issued more statements than its endpoint's budget allows."""
+
+
+def normalize(statement):
+    """The statement with literals and IN lists replaced, so repeats group together."""
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _STRING.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    return _PLACEHOLDER_LIST.sub('(?, ...)', statement)
+
+
+def app_frames(depth=STACK_DEPTH):
+    """The innermost frames of the current stack that are in this app's own code."""
+    frames = []
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        path = os.path.abspath(frame.filename)
+        if not path.startswith(basedir) or path == os.path.abspath(__file__) or 'site-packages' in path:
+            continue
+        frames.append(f"{os.path.relpath(path, basedir)}:{frame.lineno} in {frame.name}")
+        if len(frames) == depth:
+            break
+    return frames
+
+
+class QueryAudit:
+    """Development-time SQL checks: N+1 patterns, slow queries and query budgets.
+
+    While enabled, every statement run during a request is grouped by its
+    normalized text. After the request, a statement repeated at least
+    repeat_threshold times is logged as a probable N+1 together with the
+    app frames that first issued it. Any statement slower than slow_query_ms
+    is logged with its EXPLAIN plan. A request issuing more statements than
+    its endpoint's budget is logged, or raises QueryBudgetExceeded when
+    fail_over_budget is set so a test client call fails.
+
+    When disabled each hook returns straight away.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.repeat_threshold = DEFAULT_REPEAT_THRESHOLD
+        self.slow_query_ms = DEFAULT_SLOW_QUERY_MS
+        self.budgets = {}  # endpoint -> max statements per request
+        self.default_budget = None
+        self.fail_over_budget = False
+        self._lock = threading.Lock()
+        self._findings = {}  # (endpoint, normalized) -> finding dict
+
+    def init_app(self, app, db):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        with app.app_context():
+            engine = db.engine
+        # Once per engine, however many times init_app runs against it
+        if not event.contains(engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_request(self):
+        if self.enabled:
+            g.query_audit = {}
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            conn.info['query_audit_started'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not self.enabled:
+            return
+        started = conn.info.pop('query_audit_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+
+        if has_request_context() and 'query_audit' in g:
+            key = normalize(statement)
+            group = g.query_audit.get(key)
+            if group is None:
+                # Walking the stack is slow, so only the first occurrence pays for it
+                group = g.query_audit[key] = {"count": 0, "seconds": 0.0, "stack": app_frames()}
+            group["count"] += 1
+            group["seconds"] += elapsed
+
+        if elapsed * 1000 >= self.slow_query_ms and has_app_context():
+            plan = '' if executemany else explain(conn, statement, parameters)
+            current_app.logger.warning("Slow query (%.1f ms): %s%s", elapsed * 1000,
+                                       _WHITESPACE.sub(' ', statement).strip(), plan)
+
+    def _after_request(self, response):
+        groups = g.pop('query_audit', None)
+        if groups is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        for statement, group in groups.items():
+            if group["count"] < self.repeat_threshold:
+                continue
+            current_app.logger.warning(
+                "Possible N+1 in %s: %d x %s (%.1f ms)\n    %s", endpoint, group["count"], statement,
+                group["seconds"] * 1000, '\n    '.join(group["stack"]) or '(no app frame)')
+            with self._lock:
+                finding = self._findings.setdefault((endpoint, statement), {
+                    "endpoint": endpoint, "statement": statement, "max_count": 0, "stack": group["stack"]})
+                finding["max_count"] = max(finding["max_count"], group["count"])
+
+        budget = self.budgets.get(endpoint, self.default_budget)
+        total = sum(group["count"] for group in groups.values())
+        if budget is not None and total > budget:
+            message = f"{endpoint} issued {total} SQL statements (budget {budget})"
+            if self.fail_over_budget:
+                raise QueryBudgetExceeded(message)
+            current_app.logger.warning(message)
+        return response
+
+    def findings(self):
+        """Probable N+1 statements seen since the last reset, most repeated first."""
+        with self._lock:
+            return sorted(self._findings.values(), key=lambda f: -f["max_count"])
+
+    def reset(self):
+        with self._lock:
+            self._findings.clear()
+
+
+def explain(conn, statement, parameters):
+    """The database's plan for a SELECT, formatted for the log ('' otherwise)."""
+    if not statement.lstrip().upper().startswith('SELECT'):
+        return ''
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    # A raw DBAPI cursor on the same connection, so the EXPLAIN itself is not audited
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    except Exception as e:
+        return f"\n    EXPLAIN failed: {e}"
+    finally:
+        cursor.close()
+    if conn.dialect.name == 'sqlite':
+        lines = [row[-1] for row in rows]  # (id, parent, notused, detail)
+    else:
+        lines = [' | '.join(str(col) for col in row) for row in rows]
+    return ''.join(f"\n    {line}" for line in lines)
+
+
+query_audit = QueryAudit()
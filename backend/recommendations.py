@@ -0,0 +1,191 @@
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import delete, insert
+
+from database import db
+from models import User, PartnerRecommendation, RecommendationRun
+from skill_index import SkillIndex
+
+# Partners stored per user. Keeping more than the dashboard shows lets a
+# partial run drop a changed partner without losing the next best match.
+DEFAULT_TOP_K = 10
+# Rows multiplied against the whole matrix at once. Peak memory of the job is
+# roughly block_size x (number of users sharing a skill) similarity entries.
+DEFAULT_BLOCK_SIZE = 256
+
+
+def _top_k(cols, vals, k):
+    if len(vals) > k:
+        keep = np.argpartition(-vals, k - 1)[:k]
+        cols, vals = cols[keep], vals[keep]
+    order = np.argsort(-vals, kind='stable')
+    return cols[order], vals[order]
+
+
+def _blockwise_top_k(X, XT, rows, k, block_size):
+    """Yield (row, partner rows, scores) for each row, one block at a time."""
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        sims = (X[block] @ XT).tocsr()
+        for i, row in enumerate(block):
+            lo, hi = sims.indptr[i], sims.indptr[i + 1]
+            cols, vals = sims.indices[lo:hi], sims.data[lo:hi]
+            mask = (cols != row) & (vals > 0)
+            yield row, *_top_k(cols[mask], vals[mask], k)
+
+
+def _write_lists(lists, computed_at):
+    """Replace the stored lists for the given users. lists: {user_id: [(partner_id, score)]}"""
+    if not lists:
+        return
+    db.session.execute(delete(PartnerRecommendation).where(PartnerRecommendation.user_id.in_(list(lists))))
+    rows = [
+        {"user_id": user_id, "partner_id": partner_id, "score": score, "rank": rank, "computed_at": computed_at}
+        for user_id, partners in lists.items()
+        for rank, (partner_id, score) in enumerate(partners)
+    ]
+    if rows:
+        db.session.execute(insert(PartnerRecommendation), rows)
+    db.session.commit()
+
+
+def _recompute_rows(X, XT, user_ids, rows, k, block_size, computed_at, progress):
+    pending = {}
+    done = 0
+    for row, partner_rows, scores in _blockwise_top_k(X, XT, rows, k, block_size):
+        pending[user_ids[row]] = [(user_ids[p], float(s)) for p, s in zip(partner_rows, scores)]
+        if len(pending) >= block_size:
+            _write_lists(pending, computed_at)
+            done += len(pending)
+            progress(done / len(rows))
+            pending = {}
+    _write_lists(pending, computed_at)
+
+
+def _drop_stale_lists(user_ids, computed_at, block_size):
+    """After a full run, delete the lists of users who are no longer in the index."""
+    stale = {uid for (uid,) in db.session.query(PartnerRecommendation.user_id).filter(
+        PartnerRecommendation.computed_at < computed_at
+    ).distinct()} - set(user_ids)
+    stale = sorted(stale)
+    for start in range(0, len(stale), block_size):
+        db.session.execute(delete(PartnerRecommendation).where(
+            PartnerRecommendation.user_id.in_(stale[start:start + block_size])
+        ))
+        db.session.commit()
+
+
+def _merge_changed(X, XT, user_ids, row_of, changed, k, block_size, computed_at):
+    """Patch other users' lists with fresh scores against the changed users.
+
+    Returns the rows that could not be patched exactly and need a full
+    recompute: a full list that lost a changed partner may have had its
+    replacement ranked below the stored top k.
+    """
+    changed_rows = [row_of[uid] for uid in changed if uid in row_of]
+
+    # Similarity is symmetric, so one pass over the changed rows gives every
+    # user's score against every changed user.
+    fresh = {}
+    for start in range(0, len(changed_rows), block_size):
+        block = changed_rows[start:start + block_size]
+        sims = (X[block] @ XT).tocoo()
+        for i, col, val in zip(sims.row, sims.col, sims.data):
+            if val > 0 and col != block[i]:
+                fresh.setdefault(user_ids[col], []).append((user_ids[block[i]], float(val)))
+
+    holders = db.session.query(PartnerRecommendation.user_id).filter(
+        PartnerRecommendation.partner_id.in_(list(changed))
+    ).distinct()
+    affected = (set(fresh) | {uid for (uid,) in holders}) - changed
+
+    needs_full = []
+    affected = sorted(affected)
+    for start in range(0, len(affected), block_size):
+        chunk = affected[start:start + block_size]
+        existing = {}
+        for rec in PartnerRecommendation.query.filter(PartnerRecommendation.user_id.in_(chunk)):
+            existing.setdefault(rec.user_id, []).append((rec.partner_id, rec.score))
+
+        patched = {}
+        for uid in chunk:
+            if uid not in row_of:
+                patched[uid] = []
+                continue
+            old = existing.get(uid, [])
+            kept = [(p, s) for p, s in old if p not in changed]
+            if len(old) >= k and len(kept) < len(old):
+                needs_full.append(row_of[uid])
+                continue
+            patched[uid] = sorted(kept + fresh.get(uid, []), key=lambda pair: -pair[1])[:k]
+        _write_lists(patched, computed_at)
+    return needs_full
+
+
+def recompute_recommendations(full=False, k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE,
+                              trace_memory=False, progress=None):
+    """Materialise the top-k similar students for every user (or only changed ones).
+
+    A partial run recomputes users whose skills changed since the last
+    completed run and patches everyone else's lists against them. Each
+    user's list is replaced in the same transaction as its old one is
+    deleted, so readers never see a user without recommendations mid-run.
+    Returns the RecommendationRun row with throughput, and with peak traced
+    memory when trace_memory is set (tracemalloc slows the run down).
+    """
+    progress = progress or (lambda fraction: None)
+    last_run = RecommendationRun.query.filter_by(status='complete').order_by(
+        RecommendationRun.started_at.desc()
+    ).first()
+    mode = 'full' if full or last_run is None else 'partial'
+
+    run = RecommendationRun(mode=mode, started_at=datetime.utcnow())
+    db.session.add(run)
+    db.session.commit()
+
+    owns_tracing = trace_memory and not tracemalloc.is_tracing()
+    if owns_tracing:
+        tracemalloc.start()
+    if trace_memory:
+        tracemalloc.reset_peak()
+    t0 = time.perf_counter()
+
+    index = SkillIndex(max_age=None).build()
+    X, user_ids = index.matrix()
+    XT = X.T.tocsr()
+    row_of = {uid: row for row, uid in enumerate(user_ids)}
+
+    if mode == 'full':
+        rows = list(range(len(user_ids)))
+        processed = len(rows)
+    else:
+        changed = {uid for (uid,) in db.session.query(User.id).filter(User.skills_updated_at >= last_run.started_at)}
+        rows = []
+        processed = 0
+        if changed:
+            # Changed users who no longer have skills simply end up with no partners
+            _write_lists({uid: [] for uid in changed if uid not in row_of}, run.started_at)
+            rows = [row_of[uid] for uid in changed if uid in row_of]
+            unpatched = _merge_changed(X, XT, user_ids, row_of, changed, k, block_size, run.started_at)
+            rows += unpatched
+            processed = len(changed) + len(unpatched)
+
+    _recompute_rows(X, XT, user_ids, rows, k, block_size, run.started_at, progress)
+    if mode == 'full':
+        _drop_stale_lists(user_ids, run.started_at, block_size)
+
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if owns_tracing:
+        tracemalloc.stop()
+
+    run.status = 'complete'
+    run.finished_at = datetime.utcnow()
+    run.users_processed = processed
+    run.users_per_sec = processed / elapsed if elapsed > 0 else None
+    run.peak_memory_mb = peak / (1024 * 1024) if peak is not None else None
+    db.session.commit()
+    return run
@@ -174,6 +174,13 @@ def seed_database():
         db.session.add_all(comments)
         
         db.session.commit()
+
+        # Summary rows for the seeded chat history
+        from conversations import rebuild_conversations
+        rebuild_conversations()
+        # Seed rows bypass the write paths, so derive the activity counters
+        from counters import repair_counters
+        repair_counters()
         print("Database seeded successfully!")
 
 if __name__ == '__main__':
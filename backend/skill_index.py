@@ -0,0 +1,240 @@
+import os
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+from flask import current_app, has_app_context
+
+from database import db
+from models import Skill
+
+
+class SkillIndex:
+    """In-process sparse index of student skill vectors.
+
+    Rows are L2-normalised binary skill vectors stored as a CSR matrix, so the
+    cosine similarity of one user against everybody is a single sparse
+    row-times-matrix product instead of the full N x N similarity matrix.
+
+    Under gunicorn.conf.py the index is built once in the master and shared
+    copy-on-write by the workers, so it is not rebuilt on a timer. Skill
+    edits are applied incrementally in the worker that served them; other
+    workers pick them up when the index is rebuilt, except for the querying
+    user's own row, which recommend_students refreshes from the Skill table
+    before every lookup. request_rebuild() touches
+    stamp_path, a file every worker can see, and each worker rebuilds on its
+    next lookup after the stamp changes.
+    """
+
+    # Number of staged row updates after which they are folded into the CSR matrix
+    COMPACT_AFTER = 256
+
+    def __init__(self, max_age=None, stamp_path=None):
+        # Seconds after which the index is rebuilt anyway; None never does.
+        # A rebuilt index is private to the worker that built it
+        self.max_age = max_age
+        # Defaults to the app's SKILL_INDEX_STAMP
+        self.stamp_path = stamp_path
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.vocabulary = {}  # skill name -> column
+        self._user_ids = []   # row -> user id (None once the row is retired)
+        self._row_of = {}     # user id -> row
+        self._matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._staged = []     # (user id, column list) rows not yet in the matrix
+        self._dead_rows = set()
+        self.built_at = None
+        self._stamp = None
+
+    # --- building ---
+
+    def build(self):
+        """Load every skill in one query and build the matrix from scratch."""
+        # Read before the skills, so a rebuild requested during the load isn't lost
+        stamp = self._read_stamp()
+        rows = db.session.query(Skill.user_id, Skill.skill_name).all()
+        skills_by_user = {}
+        for user_id, skill_name in rows:
+            skills_by_user.setdefault(user_id, set()).add(skill_name)
+
+        with self._lock:
+            self._reset()
+            for user_id, names in skills_by_user.items():
+                self._staged.append((user_id, self._columns(names)))
+            self._compact()
+            self.built_at = time.monotonic()
+            self._stamp = stamp
+        return self
+
+    def ensure_built(self):
+        stamp = self._read_stamp()
+        with self._lock:
+            stale = self.built_at is None or stamp != self._stamp or (
+                self.max_age is not None and time.monotonic() - self.built_at > self.max_age
+            )
+        if stale:
+            self.build()
+        return self
+
+    def _stamp_file(self):
+        if self.stamp_path or not has_app_context():
+            return self.stamp_path
+        return current_app.config.get('SKILL_INDEX_STAMP')
+
+    def _read_stamp(self):
+        # One stat call per lookup, like ModelRegistry.load
+        path = self._stamp_file()
+        if not path:
+            return None
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def request_rebuild(self):
+        """Make every process rebuild its index on its next lookup."""
+        path = self._stamp_file()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(f"{time.time()}\n")
+        # os.replace gives a new inode, so the stamp changes even within the mtime resolution
+        os.replace(tmp_path, path)
+
+    def _columns(self, names):
+        cols = []
+        for name in names:
+            col = self.vocabulary.get(name)
+            if col is None:
+                col = len(self.vocabulary)
+                self.vocabulary[name] = col
+            cols.append(col)
+        return sorted(set(cols))
+
+    def _compact(self):
+        """Fold staged rows into the CSR matrix and drop retired rows."""
+        n_cols = len(self.vocabulary)
+        if not self._staged and not self._dead_rows and self._matrix.shape[1] == n_cols:
+            return
+
+        keep = [row for row, uid in enumerate(self._user_ids) if uid is not None]
+        base = self._matrix[keep] if self._dead_rows else self._matrix.copy()
+        base.resize((len(keep), n_cols))
+        user_ids = [self._user_ids[row] for row in keep]
+
+        if self._staged:
+            indptr = [0]
+            indices = []
+            data = []
+            for user_id, cols in self._staged:
+                indices.extend(cols)
+                data.extend([1.0 / np.sqrt(len(cols))] * len(cols))
+                indptr.append(len(indices))
+                user_ids.append(user_id)
+            staged = sparse.csr_matrix(
+                (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+                shape=(len(self._staged), n_cols),
+            )
+            base = sparse.vstack([base, staged], format='csr')
+
+        self._matrix = base
+        self._user_ids = user_ids
+        self._row_of = {uid: row for row, uid in enumerate(user_ids)}
+        self._staged = []
+        self._dead_rows = set()
+
+    # --- incremental updates ---
+
+    def _retire(self, user_id):
+        row = self._row_of.pop(user_id, None)
+        if row is not None:
+            self._user_ids[row] = None
+            self._dead_rows.add(row)
+        self._staged = [(uid, cols) for uid, cols in self._staged if uid != user_id]
+
+    def update_user(self, user_id, skill_names):
+        """Replace a user's skill vector after /api/add_skills."""
+        with self._lock:
+            if self.built_at is None:
+                return
+            names = {s for s in skill_names if s}
+            cols = self._columns(names) if names else None
+            if cols == self._query_columns(user_id):
+                return  # already current
+            self._retire(user_id)
+            if cols:
+                self._staged.append((user_id, cols))
+            if len(self._staged) + len(self._dead_rows) >= self.COMPACT_AFTER:
+                self._compact()
+
+    def remove_user(self, user_id):
+        with self._lock:
+            if self.built_at is None:
+                return
+            self._retire(user_id)
+
+    # --- queries ---
+
+    def _query_columns(self, user_id):
+        for uid, cols in self._staged:
+            if uid == user_id:
+                return cols
+        row = self._row_of.get(user_id)
+        if row is None:
+            return None
+        indptr = self._matrix.indptr
+        return self._matrix.indices[indptr[row]:indptr[row + 1]].tolist()
+
+    def similar(self, user_id, k=5):
+        """Return up to k (user_id, cosine score) pairs with a positive score.
+
+        Only the querying user's row is multiplied against the index; rows
+        staged since the last compaction are scored directly from their
+        column sets so writes never force a rebuild on the read path.
+        """
+        with self._lock:
+            cols = self._query_columns(user_id)
+            if not cols:
+                return []
+            norm = 1.0 / np.sqrt(len(cols))
+
+            n_rows, n_cols = self._matrix.shape
+            main_cols = [c for c in cols if c < n_cols]
+            candidates = []
+            if n_rows and main_cols:
+                query = sparse.csr_matrix(
+                    (np.full(len(main_cols), norm, dtype=np.float32), main_cols, [0, len(main_cols)]),
+                    shape=(1, n_cols),
+                )
+                scores = (self._matrix @ query.T).toarray().ravel()
+                own_row = self._row_of.get(user_id)
+                if own_row is not None:
+                    scores[own_row] = 0
+                if self._dead_rows:
+                    scores[list(self._dead_rows)] = 0
+                top = np.argpartition(-scores, min(k, n_rows) - 1)[:k]
+                candidates.extend((self._user_ids[i], float(scores[i])) for i in top if scores[i] > 0)
+
+            query_set = set(cols)
+            for uid, staged_cols in self._staged:
+                if uid == user_id:
+                    continue
+                overlap = len(query_set.intersection(staged_cols))
+                if overlap:
+                    candidates.append((uid, overlap * norm / np.sqrt(len(staged_cols))))
+
+        candidates.sort(key=lambda pair: -pair[1])
+        return candidates[:k]
+
+    def matrix(self):
+        """Return (csr matrix, row -> user id list) as a consistent snapshot."""
+        with self._lock:
+            self._compact()
+            return self._matrix, list(self._user_ids)
+
+
+skill_index = SkillIndex()
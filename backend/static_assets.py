@@ -0,0 +1,181 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import threading
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only .gz copies are built
+    brotli = None
+
+# Files that get a content hash in their name and can be cached forever.
+# HTML keeps its name (it's what the browser asks for) and is revalidated
+HASHED_EXTENSIONS = ('.js', '.css')
+COMPRESSED_EXTENSIONS = ('.html', '.js', '.css', '.svg', '.json', '.txt')
+MANIFEST_NAME = 'manifest.json'
+# Tried in this order when the client accepts more than one
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+_REFERENCE = re.compile(r'''((?:src|href)=["'])([^"'/:?#]+)(["'])''')
+
+
+def fingerprint(content, length=12):
+    return hashlib.sha256(content).hexdigest()[:length]
+
+
+def hashed_name(name, content):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{fingerprint(content)}{ext}"
+
+
+def write_compressed(path, content):
+    """Write .gz (and .br when brotli is installed) next to path if they're smaller."""
+    written = []
+    # mtime=0 keeps the output identical between builds of the same content
+    gz = gzip.compress(content, compresslevel=9, mtime=0)
+    if len(gz) < len(content):
+        with open(path + '.gz', 'wb') as f:
+            f.write(gz)
+        written.append('gzip')
+    if brotli is not None:
+        br = brotli.compress(content, quality=11)
+        if len(br) < len(content):
+            with open(path + '.br', 'wb') as f:
+                f.write(br)
+            written.append('br')
+    return written
+
+
+def build_assets(src, dest):
+    """Write fingerprinted, precompressed copies of the files in src to dest.
+
+    JS and CSS are renamed to name.<sha256 prefix>.ext, HTML is copied with
+    its local src/href references pointing at the hashed names, and every
+    text file gets .gz/.br siblings. manifest.json maps each source name to
+    the file to serve. Returns the manifest.
+    """
+    shutil.rmtree(dest, ignore_errors=True)
+    os.makedirs(dest)
+    names = sorted(n for n in os.listdir(src) if os.path.isfile(os.path.join(src, n)))
+
+    contents = {}
+    for name in names:
+        with open(os.path.join(src, name), 'rb') as f:
+            contents[name] = f.read()
+
+    files = {}
+    for name in names:
+        if name.endswith(HASHED_EXTENSIONS):
+            files[name] = hashed_name(name, contents[name])
+    for name in names:
+        if name not in files:
+            files[name] = name
+    hashed = {n: out for n, out in files.items() if n.endswith(HASHED_EXTENSIONS)}
+
+    def rewrite(match):
+        return match.group(1) + hashed.get(match.group(2), match.group(2)) + match.group(3)
+
+    manifest = {"files": {}}
+    for name in names:
+        content = contents[name]
+        if name.endswith('.html'):
+            content = _REFERENCE.sub(rewrite, content.decode('utf-8')).encode('utf-8')
+        out = files[name]
+        path = os.path.join(dest, out)
+        with open(path, 'wb') as f:
+            f.write(content)
+        encodings = write_compressed(path, content) if name.endswith(COMPRESSED_EXTENSIONS) else []
+        manifest["files"][name] = {
+            "file": out,
+            "immutable": name in hashed,
+            "size": len(content),
+            "encodings": encodings,
+        }
+
+    with open(os.path.join(dest, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class StaticAsset:
+    __slots__ = ('path', 'mimetype', 'cache_control', 'variants')
+
+    def __init__(self, path, immutable, encodings=()):
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.cache_control = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+        suffixes = dict(ENCODINGS)
+        # Kept in ENCODINGS order so negotiation prefers br over gzip
+        self.variants = [(enc, path + suffixes[enc]) for enc, _ in ENCODINGS if enc in encodings]
+
+    def negotiate(self, accept_encodings):
+        """(path, content encoding or None) of the best variant the client accepts."""
+        for encoding, path in self.variants:
+            if accept_encodings[encoding] > 0:
+                return path, encoding
+        return self.path, None
+
+
+class StaticAssets:
+    """In-memory table of the frontend files, built once per process.
+
+    With a build in <frontend>/dist (flask build-assets) the table comes from
+    its manifest: hashed names are served with immutable caching and every
+    file has its precompressed variants. Without one, the frontend directory
+    is listed once and served as is with revalidation, as before the build
+    step existed. Either way requests are answered from the table without
+    touching the filesystem to find out what exists.
+    """
+
+    def __init__(self, frontend_dir=None):
+        self.frontend_dir = frontend_dir
+        self._table = None
+        self._lock = threading.Lock()
+
+    @property
+    def dist_dir(self):
+        return os.path.join(self.frontend_dir, 'dist')
+
+    def _load(self):
+        table = {}
+        manifest_path = os.path.join(self.dist_dir, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            for name, entry in manifest["files"].items():
+                path = os.path.join(self.dist_dir, entry["file"])
+                table[entry["file"]] = StaticAsset(path, entry["immutable"], entry["encodings"])
+                if entry["file"] != name:
+                    # Pages cached from before a deploy may still ask for the
+                    # plain name; serve the current build, but revalidated
+                    table[name] = StaticAsset(path, False, entry["encodings"])
+        else:
+            for name in os.listdir(self.frontend_dir):
+                path = os.path.join(self.frontend_dir, name)
+                if os.path.isfile(path):
+                    table[name] = StaticAsset(path, False)
+        return table
+
+    def ensure_loaded(self):
+        if self._table is None:
+            with self._lock:
+                if self._table is None:
+                    self._table = self._load()
+        return self._table
+
+    def get(self, name):
+        return self.ensure_loaded().get(name)
+
+    def reload(self):
+        with self._lock:
+            self._table = None
+
+
+static_assets = StaticAssets()
@@ -0,0 +1,98 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+WORK_DIR = tempfile.mkdtemp(prefix='campusconnect_tests_')
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+
+# create_app reads its settings from the environment when app.py is imported.
+# Every request runs under the query audit with budgets enforced, so a view
+# that starts issuing a statement per row fails its test.
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(WORK_DIR, 'test.db')}",
+    'UPLOAD_FOLDER': os.path.join(WORK_DIR, 'uploads'),
+    'MODEL_REGISTRY_DIR': os.path.join(WORK_DIR, 'models'),
+    'METRICS_DIR': os.path.join(WORK_DIR, 'metrics'),
+    'PROFILE_DIR': os.path.join(WORK_DIR, 'profiles'),
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',  # fast hashes; strength is not under test
+    'QUERY_AUDIT': '1',
+    'QUERY_BUDGET_FAIL': '1',
+    'QUERY_BUDGET_DEFAULT': '12',
+    # The first message of a pair also creates its conversation (savepoint,
+    # insert); deleting a user loads each relationship the ORM cascades over
+    'QUERY_BUDGETS': 'api.send_message=16,api.delete_user=25',
+})
+sys.path.insert(0, BACKEND_DIR)
+
+from app import app as flask_app  # noqa: E402
+from auth_cache import auth_cache  # noqa: E402
+from database import db  # noqa: E402
+from models import User  # noqa: E402
+
+
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    # SQLite only enforces foreign keys when asked, MySQL always does
+    dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        event.listen(db.engine, 'connect', _enable_foreign_keys)
+        db.engine.dispose()
+    return flask_app
+
+
+@pytest.fixture(autouse=True)
+def database(app):
+    """Fresh tables for every test."""
+    with app.app_context():
+        with db.engine.connect() as connection:
+            # message and conversation reference each other, so drop with checks off
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            db.metadata.drop_all(connection)
+            db.metadata.create_all(connection)
+            connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+            connection.commit()
+    # Ids are reused across tests, so nothing cached by id may survive one
+    auth_cache.clear()
+    yield
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """make_user(name, **columns) -> id of a new user whose password is 'password123'."""
+    def make(name='Student', **columns):
+        columns.setdefault('email', f"{name.lower().replace(' ', '.')}@college.edu")
+        with app.app_context():
+            user = User(name=name, password_hash=generate_password_hash(
+                'password123', method=app.config['PASSWORD_HASH_METHOD']), **columns)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make
+
+
+@pytest.fixture
+def auth(app):
+    """auth(user_id) -> Authorization headers with a token like /api/login issues."""
+    def headers(user_id):
+        token = jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           app.config['SECRET_KEY'], algorithm="HS256")
+        return {'Authorization': f'Bearer {token}'}
+    return headers
@@ -0,0 +1,58 @@
+from auth_cache import auth_cache
+from database import db
+from models import User
+
+
+def test_suspension_takes_effect_on_the_next_request(client, auth, make_user):
+    admin, student = make_user('Admin', is_admin=True), make_user('Ann')
+    assert client.get('/api/profile', headers=auth(student)).status_code == 200  # now cached
+
+    assert client.post(f'/api/admin/suspend/{student}', headers=auth(admin)).status_code == 200
+    assert client.get('/api/profile', headers=auth(student)).status_code == 403
+
+    assert client.post(f'/api/admin/suspend/{student}', headers=auth(admin)).status_code == 200
+    assert client.get('/api/profile', headers=auth(student)).status_code == 200
+
+
+def test_a_deleted_users_token_stops_working(client, auth, make_user):
+    admin, student = make_user('Admin', is_admin=True), make_user('Ann')
+    assert client.get('/api/profile', headers=auth(student)).status_code == 200
+
+    assert client.delete(f'/api/admin/user/{student}', headers=auth(admin)).status_code == 200
+    assert client.get('/api/profile', headers=auth(student)).status_code == 401
+
+
+def test_admin_routes_follow_a_revoked_admin_flag(app, client, auth, make_user):
+    admin = make_user('Admin', is_admin=True)
+    assert client.get('/api/admin/users', headers=auth(admin)).status_code == 200
+
+    with app.app_context():
+        db.session.get(User, admin).is_admin = False
+        db.session.commit()
+    # Changes made outside the views are only picked up once the entry expires
+    assert client.get('/api/admin/users', headers=auth(admin)).status_code == 200
+    auth_cache.invalidate(admin)
+    assert client.get('/api/admin/users', headers=auth(admin)).status_code == 403
+
+
+def test_entries_expire_after_the_ttl(app, client, auth, make_user, monkeypatch):
+    student = make_user('Ann')
+    monkeypatch.setattr(auth_cache, 'ttl', 0)
+    assert client.get('/api/profile', headers=auth(student)).status_code == 200
+
+    with app.app_context():
+        db.session.get(User, student).is_suspended = True
+        db.session.commit()
+    assert client.get('/api/profile', headers=auth(student)).status_code == 403
+
+
+def test_repeat_requests_are_served_from_the_cache(app, client, auth, make_user):
+    student = make_user('Ann')
+    client.get('/api/profile', headers=auth(student))
+    before = auth_cache.stats()
+
+    response = client.get('/api/profile', headers=auth(student))
+    assert response.status_code == 200
+    assert response.json['user']['name'] == 'Ann'  # the rest of the row still loads on demand
+    after = auth_cache.stats()
+    assert (after['hits'] - before['hits'], after['misses'] - before['misses']) == (1, 0)
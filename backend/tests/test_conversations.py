@@ -0,0 +1,82 @@
+from sqlalchemy import update
+
+from conversations import rebuild_conversations
+from database import db
+from models import Conversation, Message, User
+
+
+def conversation_rows():
+    return sorted((c.user_low_id, c.user_high_id, c.last_message_id, c.unread_low, c.unread_high)
+                  for c in Conversation.query)
+
+
+def send(client, auth, sender, receiver, content='hi'):
+    response = client.post('/api/chat', headers=auth(sender), json={'receiver_id': receiver, 'content': content})
+    assert response.status_code == 201
+
+
+def test_rebuild_matches_what_the_write_path_maintained(app, client, auth, make_user):
+    a, b, c = make_user('Ann'), make_user('Ben'), make_user('Cal')
+    for _ in range(3):
+        send(client, auth, a, b)
+    send(client, auth, b, a)
+    send(client, auth, a, c)
+    with app.app_context():
+        maintained = conversation_rows()
+        ids = sorted(c.id for c in Conversation.query)
+
+        # Messages reference the rows, so a rebuild must work in place, again and again
+        assert rebuild_conversations() == 2
+        assert rebuild_conversations() == 2
+        assert conversation_rows() == maintained
+        assert sorted(c.id for c in Conversation.query) == ids
+        assert Message.query.filter(Message.conversation_id.is_(None)).count() == 0
+
+
+def test_rebuild_drops_pairs_without_messages(app, client, auth, make_user):
+    a, b, c = make_user('Ann'), make_user('Ben'), make_user('Cal')
+    send(client, auth, a, b)
+    send(client, auth, a, c)
+    with app.app_context():
+        db.session.execute(update(Conversation).values(last_message_id=None))
+        Message.query.filter_by(receiver_id=c).delete()
+        db.session.commit()
+
+        assert rebuild_conversations() == 1
+        assert [(row[0], row[1]) for row in conversation_rows()] == [(min(a, b), max(a, b))]
+
+
+def test_opening_a_chat_reads_only_the_incoming_messages(app, client, auth, make_user):
+    a, b = make_user('Ann'), make_user('Ben')
+    send(client, auth, a, b)
+    send(client, auth, a, b)
+    send(client, auth, b, a)
+
+    assert client.get(f'/api/chat/{a}', headers=auth(b)).status_code == 200
+
+    with app.app_context():
+        assert Message.query.filter_by(receiver_id=b, is_read=False).count() == 0
+        assert Message.query.filter_by(receiver_id=a, is_read=False).count() == 1
+    unread = {chat['other_user_id']: chat['unread_count']
+              for user in (a, b) for chat in client.get('/api/recent_chats', headers=auth(user)).json['recent_chats']}
+    assert unread == {a: 0, b: 1}
+
+
+def test_deleting_a_user_removes_their_messages_and_conversations(app, client, auth, make_user):
+    admin = make_user('Admin', is_admin=True)
+    a, b, c = make_user('Ann'), make_user('Ben'), make_user('Cal')
+    send(client, auth, a, b)
+    send(client, auth, b, a)
+    send(client, auth, c, b)
+    send(client, auth, a, c)
+
+    response = client.delete(f'/api/admin/user/{b}', headers=auth(admin))
+    assert response.status_code == 200
+
+    with app.app_context():
+        assert Message.query.filter((Message.sender_id == b) | (Message.receiver_id == b)).count() == 0
+        assert [(row[0], row[1]) for row in conversation_rows()] == [(min(a, c), max(a, c))]
+        counters = {u.id: (u.messages_sent_count, u.messages_received_count) for u in User.query}
+        assert counters[a] == (1, 0)
+        assert counters[c] == (0, 1)
+        assert rebuild_conversations() == 1
@@ -0,0 +1,115 @@
+import os
+import subprocess
+import sys
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from database import db
+from jobs import HOSTNAME, JOB_TYPES, JobRunner
+from models import Job
+
+
+class FakePool:
+    """Stands in for the process pool: keeps the futures instead of running anything."""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+@pytest.fixture
+def runner():
+    runner = JobRunner()
+    runner._executor = FakePool()
+    return runner
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def add_job(state='running', runner=None, job_type='fake_detection'):
+    job = Job(job_type=job_type, state=state, runner=runner)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def test_api_job_types_are_registered(app):
+    assert {'fake_detection', 'recompute_recommendations', 'train_attendance_model'} <= set(JOB_TYPES)
+
+
+def test_fail_orphaned_only_fails_jobs_whose_local_process_is_gone(app, runner):
+    with app.app_context():
+        orphan = add_job(runner=f"{HOSTNAME}:{dead_pid()}")
+        alive = add_job(runner=f"{HOSTNAME}:{os.getpid()}")
+        remote = add_job(runner=f"elsewhere.{HOSTNAME}:{dead_pid()}")
+        finished = add_job(state='succeeded', runner=f"{HOSTNAME}:{dead_pid()}")
+
+        assert runner.fail_orphaned() == 1
+        states = {job.id: job.state for job in Job.query}
+        assert states == {orphan: 'failed', alive: 'running', remote: 'running', finished: 'succeeded'}
+        assert 'exited' in db.session.get(Job, orphan).error
+
+
+def test_submit_reuses_the_active_job(app, runner):
+    with app.app_context():
+        job, created = runner.submit('fake_detection')
+        assert created
+        again, created = runner.submit('fake_detection')
+        assert not created
+        assert again.id == job.id
+        assert len(runner._executor.futures) == 1
+
+
+def test_submit_replaces_an_orphaned_job(app, runner):
+    with app.app_context():
+        orphan = add_job(runner=f"{HOSTNAME}:{dead_pid()}")
+        job, created = runner.submit('fake_detection')
+        assert created
+        assert job.id != orphan
+        assert db.session.get(Job, orphan).state == 'failed'
+
+
+def test_submit_rejects_unknown_job_types(app, runner):
+    with app.app_context(), pytest.raises(KeyError):
+        runner.submit('no_such_job')
+
+
+def test_a_broken_pool_fails_the_job_and_is_replaced(app, runner):
+    with app.app_context():
+        pool = runner._executor
+        job, _ = runner.submit('fake_detection')
+        job_id = job.id
+
+        pool.futures[0].set_exception(BrokenProcessPool())
+        db.session.expire_all()
+        job = db.session.get(Job, job_id)
+        assert job.state == 'failed'
+        assert 'pool process died' in job.error
+        assert runner._executor is None
+
+        # The failed job no longer blocks a new one
+        runner._executor = FakePool()
+        assert runner.submit('fake_detection')[1]
+
+
+def test_a_job_that_raised_keeps_its_error(app, runner):
+    with app.app_context():
+        job, _ = runner.submit('fake_detection')
+        job_id = job.id
+        runner._executor.futures[0].set_exception(ValueError('bad input'))
+        db.session.expire_all()
+        assert 'bad input' in db.session.get(Job, job_id).error
+        assert runner._executor is not None
@@ -0,0 +1,41 @@
+import os
+
+from model_registry import ModelRegistry
+
+
+def test_load_without_a_published_version(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.load('risk') == (None, None)
+    assert registry.current_version('risk') is None
+    assert registry.metadata('risk') is None
+
+
+def test_every_reader_switches_to_a_newly_published_version(tmp_path):
+    trainer, worker = ModelRegistry(str(tmp_path)), ModelRegistry(str(tmp_path))
+
+    trainer.save('risk', {'weights': [1]}, fingerprint='a', metrics={'accuracy': 0.5})
+    model, meta = worker.load('risk')
+    assert model == {'weights': [1]}
+    assert meta['version'] == 'v1'
+    assert worker.load('risk')[0] is model  # unchanged CURRENT: served from memory
+
+    trainer.save('risk', {'weights': [2]}, fingerprint='b', metrics={'accuracy': 0.75})
+    for registry in (trainer, worker):
+        model, meta = registry.load('risk')
+        assert model == {'weights': [2]}
+        assert (meta['version'], meta['fingerprint'], meta['metrics']) == ('v2', 'b', {'accuracy': 0.75})
+
+    assert worker.current_version('risk') == 'v2'
+    assert worker.metadata('risk', 'v1')['fingerprint'] == 'a'
+    # Nothing half-written is left beside the published versions
+    assert sorted(os.listdir(tmp_path / 'risk')) == ['CURRENT', 'v1', 'v2']
+
+
+def test_save_numbers_past_every_version_on_disk(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    registry.save('risk', 'first', fingerprint='a', metrics={})
+    os.makedirs(tmp_path / 'risk' / 'v2' / 'model.joblib')  # published by another process, not yet CURRENT
+
+    meta = registry.save('risk', 'second', fingerprint='b', metrics={})
+    assert meta['version'] == 'v3'
+    assert registry.load('risk') == ('second', meta)
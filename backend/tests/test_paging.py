@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db
+from models import Post
+from timelines import backfill_timelines
+
+
+def walk(client, headers, path, key, limit):
+    """Every item of a keyset-paged list, following next_cursor to the end."""
+    items, cursor = [], None
+    while True:
+        url = f"{path}?limit={limit}" + (f"&before={cursor}" if cursor else '')
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        items += response.json[key]
+        cursor = response.json['next_cursor']
+        if not cursor:
+            return items
+
+
+def add_posts(app, author, timestamps):
+    with app.app_context():
+        posts = [Post(user_id=author, content=f"post {i}", created_at=ts) for i, ts in enumerate(timestamps)]
+        db.session.add_all(posts)
+        db.session.commit()
+        return [p.id for p in posts]
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 50])
+def test_feed_pages_cover_every_post_once_in_order(app, client, auth, make_user, limit):
+    author = make_user('Ann')
+    now = datetime(2026, 1, 1)
+    # Ties on created_at are ordered by id, so no page boundary can skip or repeat one
+    add_posts(app, author, [now] * 4 + [now - timedelta(minutes=i) for i in range(1, 4)] + [now + timedelta(minutes=1)])
+    with app.app_context():
+        expected = [p.id for p in Post.query.order_by(Post.created_at.desc(), Post.id.desc())]
+
+    got = [post['id'] for post in walk(client, auth(author), '/api/feed', 'feed', limit)]
+    assert got == expected
+
+
+@pytest.mark.parametrize('limit', [1, 2, 4])
+def test_timeline_feed_matches_the_post_table_past_its_trimmed_end(app, client, auth, make_user, limit, monkeypatch):
+    author = make_user('Ann')
+    add_posts(app, author, [datetime(2026, 1, 1) - timedelta(minutes=i) for i in range(5)])
+    monkeypatch.setitem(app.config, 'TIMELINE_MAX_LENGTH', 3)
+    with app.app_context():
+        backfill_timelines(3)
+    monkeypatch.setitem(app.config, 'FEED_MODE', 'timeline')
+    for i in range(4):
+        # New posts fan out to the timeline, which keeps only the newest 3
+        assert client.post('/api/create_post', headers=auth(author), json={'content': f"new {i}"}).status_code == 201
+
+    timeline = [post['id'] for post in walk(client, auth(author), '/api/feed', 'feed', limit)]
+    monkeypatch.setitem(app.config, 'FEED_MODE', 'query')
+    assert timeline == [post['id'] for post in walk(client, auth(author), '/api/feed', 'feed', limit)]
+    assert len(timeline) == 9
+
+
+def test_feed_rejects_a_malformed_cursor(client, auth, make_user):
+    user = make_user('Ann')
+    assert client.get('/api/feed?before=yesterday', headers=auth(user)).status_code == 400
+
+
+def test_chat_history_pages_back_and_forward(app, client, auth, make_user):
+    a, b = make_user('Ann'), make_user('Ben')
+    for i in range(7):
+        client.post('/api/chat', headers=auth(a if i % 2 else b), json={'receiver_id': b if i % 2 else a, 'content': f"m{i}"})
+
+    newest = client.get(f'/api/chat/{b}?limit=3', headers=auth(a)).json
+    assert [m['content'] for m in newest['messages']] == ['m4', 'm5', 'm6']
+    assert newest['has_more']
+
+    older = client.get(f"/api/chat/{b}?limit=3&before_id={newest['messages'][0]['id']}", headers=auth(a)).json
+    assert [m['content'] for m in older['messages']] == ['m1', 'm2', 'm3']
+    assert older['has_more']
+
+    oldest = client.get(f"/api/chat/{b}?limit=3&before_id={older['messages'][0]['id']}", headers=auth(a)).json
+    assert [m['content'] for m in oldest['messages']] == ['m0']
+    assert not oldest['has_more']
+
+    newer = client.get(f"/api/chat/{b}?limit=2&after_id={older['messages'][1]['id']}", headers=auth(a)).json
+    assert [m['content'] for m in newer['messages']] == ['m3', 'm4']
+    assert newer['has_more']
+
+
+def test_chat_anchor_must_belong_to_the_conversation(client, auth, make_user):
+    a, b, c = make_user('Ann'), make_user('Ben'), make_user('Cal')
+    client.post('/api/chat', headers=auth(a), json={'receiver_id': b, 'content': 'hi'})
+    client.post('/api/chat', headers=auth(a), json={'receiver_id': c, 'content': 'hi'})
+    other = client.get(f'/api/chat/{c}', headers=auth(a)).json['messages'][0]['id']
+    assert client.get(f'/api/chat/{b}?before_id={other}', headers=auth(a)).status_code == 404
+
+
+def test_recent_chats_pages_newest_conversation_first(client, auth, make_user):
+    me = make_user('Ann')
+    partners = [make_user(f'Partner {i}') for i in range(5)]
+    for partner in partners:
+        client.post('/api/chat', headers=auth(partner), json={'receiver_id': me, 'content': 'hi'})
+    client.post('/api/chat', headers=auth(me), json={'receiver_id': partners[0], 'content': 'back to you'})
+
+    chats = walk(client, auth(me), '/api/recent_chats', 'recent_chats', 2)
+    assert [chat['other_user_id'] for chat in chats] == [partners[0]] + partners[:0:-1]
+    assert chats[0]['latest_message'] == 'back to you'
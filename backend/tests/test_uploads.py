@@ -0,0 +1,141 @@
+import hashlib
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from database import db
+from models import User
+
+
+def png_bytes(color='red', size=(320, 200)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def upload(client, headers, data, name='photo.png'):
+    return client.post('/api/upload_profile_photo', headers=headers,
+                       data={'profile_photo': (io.BytesIO(data), name)}, content_type='multipart/form-data')
+
+
+@pytest.fixture
+def photo(client, auth, make_user):
+    """(bytes, response json) of a profile photo uploaded by a new user."""
+    data = png_bytes()
+    response = upload(client, auth(make_user('Ann')), data)
+    assert response.status_code == 200
+    return data, response.json
+
+
+def test_upload_is_stored_under_its_content_hash(app, client, auth, make_user):
+    data = png_bytes()
+    user = make_user('Ann')
+    body = upload(client, auth(user), data).json
+
+    digest = hashlib.sha256(data).hexdigest()
+    assert body['profile_photo_original'] == f"/uploads/{digest}.png"
+    assert body['profile_photo_url'] == f"/uploads/{digest}_avatar.png"
+    with app.app_context():
+        assert db.session.get(User, user).profile_photo == body['profile_photo_original']
+    with Image.open(os.path.join(app.config['UPLOAD_FOLDER'], f"{digest}_avatar.png")) as avatar:
+        assert max(avatar.size) == 160
+
+    # The same bytes from someone else reuse the stored files
+    assert upload(client, auth(make_user('Ben')), data).json == body
+
+
+def test_stored_upload_is_served_immutable_with_its_hash_as_etag(client, photo):
+    data, body = photo
+    response = client.get(body['profile_photo_original'])
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.headers['ETag'] == f'"{hashlib.sha256(data).hexdigest()}"'
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+    avatar = client.get(body['profile_photo_url'])
+    assert avatar.status_code == 200
+    assert avatar.headers['ETag'] == f'"{hashlib.sha256(data).hexdigest()}-avatar"'
+
+
+def test_matching_if_none_match_gets_304(client, photo):
+    _, body = photo
+    etag = client.get(body['profile_photo_original']).headers['ETag']
+    response = client.get(body['profile_photo_original'], headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    assert client.get(body['profile_photo_original'], headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_range_requests(client, photo):
+    data, body = photo
+    url = body['profile_photo_original']
+
+    response = client.get(url, headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206
+    assert response.data == data[:10]
+    assert response.headers['Content-Range'] == f"bytes 0-9/{len(data)}"
+
+    response = client.get(url, headers={'Range': 'bytes=-5'})
+    assert response.status_code == 206
+    assert response.data == data[-5:]
+
+    assert client.get(url, headers={'Range': f"bytes={len(data) + 10}-"}).status_code == 416
+    # A stale If-Range falls back to the whole file
+    response = client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': '"other"'})
+    assert response.status_code == 200
+    assert response.data == data
+
+
+def test_missing_uploads_are_404_and_names_cannot_escape_the_folder(client):
+    assert client.get(f"/uploads/{'0' * 64}.png").status_code == 404
+    assert client.get('/uploads/missing.png').status_code == 404
+    # Not an upload name, so it falls through to the single-page app
+    assert b'create_app' not in client.get('/uploads/..%2F..%2Fapp.py').data
+
+
+def test_legacy_upload_is_revalidated_and_rehashed_when_replaced(app, client):
+    folder = app.config['UPLOAD_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, 'old_photo.png')
+    with open(path, 'wb') as f:
+        f.write(b'first version')
+
+    response = client.get('/uploads/old_photo.png')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{hashlib.sha256(b"first version").hexdigest()}"'
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    with open(path, 'wb') as f:
+        f.write(b'second, longer version')
+    response = client.get('/uploads/old_photo.png', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 200
+    assert response.data == b'second, longer version'
+    assert response.headers['ETag'] == f'"{hashlib.sha256(b"second, longer version").hexdigest()}"'
+
+
+def test_sendfile_header_hands_the_body_to_the_proxy(app, client, photo, monkeypatch):
+    _, body = photo
+    monkeypatch.setitem(app.config, 'UPLOAD_SENDFILE_HEADER', 'X-Accel-Redirect')
+    monkeypatch.setitem(app.config, 'UPLOAD_SENDFILE_PREFIX', '/protected-uploads/')
+
+    response = client.get(body['profile_photo_original'])
+    assert response.status_code == 200
+    assert response.data == b''
+    assert response.headers['X-Accel-Redirect'] == '/protected-uploads' + body['profile_photo_original'][len('/uploads'):]
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+
+def test_rejected_uploads(app, client, auth, make_user, monkeypatch):
+    headers = auth(make_user('Ann'))
+    assert upload(client, headers, b'not an image at all').status_code == 400
+    assert upload(client, headers, b'').status_code == 400
+
+    monkeypatch.setitem(app.config, 'MAX_UPLOAD_BYTES', 1000)
+    response = upload(client, headers, png_bytes(size=(600, 600)) + os.urandom(2000))
+    assert response.status_code == 413
+    # Nothing half-written stays behind
+    assert not [name for name in os.listdir(app.config['UPLOAD_FOLDER']) if name.startswith('.')]
@@ -0,0 +1,87 @@
+from sqlalchemy import delete, insert
+
+from database import db
+from models import Post, TimelineEntry
+
+# Newest entries kept in the timeline; older posts drop off the materialised list.
+DEFAULT_TIMELINE_LENGTH = 500
+
+
+def trim_timeline(max_length):
+    """Delete everything older than the max_length-th newest entry."""
+    cutoff = db.session.query(TimelineEntry.created_at, TimelineEntry.post_id).order_by(
+        TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()
+    ).offset(max_length).first()
+    if cutoff is None:
+        return
+    db.session.execute(delete(TimelineEntry).where(
+        (TimelineEntry.created_at < cutoff.created_at) |
+        ((TimelineEntry.created_at == cutoff.created_at) & (TimelineEntry.post_id <= cutoff.post_id))
+    ))
+
+
+def fan_out_post(post, max_length=DEFAULT_TIMELINE_LENGTH):
+    """Append a new post to the campus timeline every feed reads. The caller commits."""
+    db.session.execute(insert(TimelineEntry), [
+        {"post_id": post.id, "created_at": post.created_at}
+    ])
+    trim_timeline(max_length)
+
+
+def _newer_or_equal(cursor):
+    created_at, post_id = cursor
+    return (TimelineEntry.created_at > created_at) | (
+        (TimelineEntry.created_at == created_at) & (TimelineEntry.post_id >= post_id))
+
+
+def timeline_horizon(max_length=DEFAULT_TIMELINE_LENGTH):
+    """(created_at, post_id) of the oldest entry the timeline is complete down to.
+
+    A timeline holding max_length entries may have been trimmed, so posts
+    older than its oldest entry can be missing from it. None means it isn't full.
+    """
+    oldest = db.session.query(TimelineEntry.created_at, TimelineEntry.post_id).order_by(
+        TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()
+    ).offset(max_length - 1).first()
+    return tuple(oldest) if oldest is not None else None
+
+
+def timeline_post_ids(before=None, limit=20, max_length=DEFAULT_TIMELINE_LENGTH):
+    """Return post ids from the timeline, newest first.
+
+    Returns (post ids, resume). Past the horizon of a trimmed timeline fewer
+    than limit ids come back and resume is the (created_at, post_id) cursor
+    to continue from in the post table; otherwise resume is None.
+    """
+    horizon = timeline_horizon(max_length)
+    if before and horizon and tuple(before) <= horizon:
+        return [], before
+
+    query = db.session.query(TimelineEntry.created_at, TimelineEntry.post_id)
+    if horizon:
+        query = query.filter(_newer_or_equal(horizon))
+    if before:
+        before_created_at, before_id = before
+        query = query.filter(
+            (TimelineEntry.created_at < before_created_at) |
+            ((TimelineEntry.created_at == before_created_at) & (TimelineEntry.post_id < before_id))
+        )
+    rows = query.order_by(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()).limit(limit).all()
+    resume = None
+    if horizon and len(rows) < limit:
+        resume = tuple(rows[-1]) if rows else before
+    return [post_id for _, post_id in rows], resume
+
+
+def backfill_timelines(max_length=DEFAULT_TIMELINE_LENGTH):
+    """Rebuild the timeline from the newest max_length posts."""
+    db.session.execute(delete(TimelineEntry))
+    posts = db.session.query(Post.id, Post.created_at).order_by(
+        Post.created_at.desc(), Post.id.desc()
+    ).limit(max_length).all()
+    if posts:
+        db.session.execute(insert(TimelineEntry), [
+            {"post_id": post_id, "created_at": created_at} for post_id, created_at in posts
+        ])
+    db.session.commit()
+    return len(posts)
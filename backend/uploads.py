@@ -0,0 +1,170 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+# Pillow is imported inside store_image, so only upload requests load it
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+# Longest side in pixels of the copies generated at upload time
+THUMBNAIL_SIZES = {
+    'avatar': 160,
+    'feed': 960,
+}
+# Pillow format -> stored extension. Thumbnails keep the original's format,
+# so their names can be derived from the original's URL without a lookup
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+# Refuse images that would decode to more than this many pixels
+MAX_IMAGE_PIXELS = 40_000_000
+
+_STORED_NAME = re.compile(r'^(?P<digest>[0-9a-f]{64})\.(?P<ext>[a-z]+)$')
+# An original or one of its size copies
+_STORED_FILE = re.compile(r'^(?P<digest>[0-9a-f]{64})(?:_(?P<size>[a-z]+))?\.(?P<ext>[a-z]+)$')
+# Content hashes of uploads that predate content addressing, keyed by
+# (path, mtime, size) so a replaced file is hashed again
+_legacy_etags = {}
+_legacy_etags_lock = threading.Lock()
+LEGACY_ETAG_CACHE_SIZE = 4096
+
+
+class UploadRejected(Exception):
+    """The upload is too large or isn't a supported image."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def stream_to_disk(stream, folder, max_bytes):
+    """Copy stream into a temporary file in folder, hashing as it goes.
+
+    Returns (temp path, sha256 hex digest). Reading stops as soon as the
+    size passes max_bytes, so an oversized upload never lands in full.
+    """
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(f"File is too large (limit {max_bytes} bytes)", 413)
+                digest.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise UploadRejected("Uploaded file is empty")
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+def stored_name(digest, ext, size=None):
+    return f"{digest}_{size}.{ext}" if size else f"{digest}.{ext}"
+
+
+def write_thumbnail(image, path, size, image_format):
+    from PIL import ImageOps
+    thumb = ImageOps.exif_transpose(image)
+    thumb.thumbnail((size, size))
+    if image_format == 'JPEG' and thumb.mode not in ('RGB', 'L'):
+        thumb = thumb.convert('RGB')
+    # Write under a private name first so a concurrent upload of the same
+    # image never sees a half-written copy
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.thumb-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            thumb.save(out, format=image_format)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def store_image(file_storage, folder, max_bytes=DEFAULT_MAX_UPLOAD_BYTES, sizes=THUMBNAIL_SIZES):
+    """Store an uploaded image under its content hash and return its /uploads URL.
+
+    The original is kept once per distinct content as <sha256>.<ext>, and a
+    <sha256>_<size>.<ext> copy is written for each entry in sizes. Uploading
+    the same bytes again reuses the files already on disk.
+    """
+    from PIL import Image
+    tmp_path, digest = stream_to_disk(file_storage.stream, folder, max_bytes)
+    try:
+        try:
+            with Image.open(tmp_path) as image:
+                image_format = image.format
+                if image_format not in IMAGE_FORMATS:
+                    raise UploadRejected("Unsupported image type")
+                if image.width * image.height > MAX_IMAGE_PIXELS:
+                    raise UploadRejected("Image dimensions are too large")
+                image.load()
+                ext = IMAGE_FORMATS[image_format]
+                for size_name, size in sizes.items():
+                    path = os.path.join(folder, stored_name(digest, ext, size_name))
+                    if not os.path.exists(path):
+                        write_thumbnail(image, path, size, image_format)
+        except (OSError, Image.DecompressionBombError, SyntaxError, ValueError) as e:
+            raise UploadRejected("File is not a valid image") from e
+
+        original = os.path.join(folder, stored_name(digest, ext))
+        if os.path.exists(original):
+            os.remove(tmp_path)  # same content uploaded before
+        else:
+            os.replace(tmp_path, original)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return f"/uploads/{stored_name(digest, ext)}"
+
+
+def sized_url(url, size):
+    """URL of the size copy of a stored upload (see THUMBNAIL_SIZES).
+
+    Uploads from before content addressing have no size copies, so their
+    URL is returned unchanged.
+    """
+    if not url or not url.startswith('/uploads/'):
+        return url
+    match = _STORED_NAME.match(url[len('/uploads/'):])
+    if not match:
+        return url
+    return f"/uploads/{stored_name(match['digest'], match['ext'], size)}"
+
+
+def upload_etag(filename, path):
+    """(strong ETag, immutable) for a file in the uploads folder.
+
+    Stored uploads are named after the sha256 of their content and are never
+    rewritten (size copies included), so the name is the ETag and the file
+    can be cached forever. Older uploads are hashed once per process and
+    revalidated. Raises FileNotFoundError for a missing legacy file.
+    """
+    match = _STORED_FILE.match(filename)
+    if match:
+        etag = match['digest'] if not match['size'] else f"{match['digest']}-{match['size']}"
+        return etag, True
+
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    etag = _legacy_etags.get(key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        etag = digest.hexdigest()
+        with _legacy_etags_lock:
+            if len(_legacy_etags) >= LEGACY_ETAG_CACHE_SIZE:
+                _legacy_etags.clear()
+            _legacy_etags[key] = etag
+    return etag, False
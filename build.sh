@@ -1,4 +1,10 @@
 #!/usr/bin/env bash
 # Build script for Render deployment
 pip install -r requirements.txt
-cd backend && python seed.py
+# Schema creation is explicit; importing the app no longer touches the database
+cd backend && flask --app app init-db
+# Hashed, precompressed frontend assets served from frontend/dist
+flask --app app build-assets
+python seed.py
+# Publish the attendance risk model so predictions work from the first request
+flask --app app train-attendance-model
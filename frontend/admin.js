@@ -334,6 +334,10 @@ async function executeMLScan() {
     try {
         const res = await apiCall('/admin/run_fake_detection', 'POST');
         showToast(res.message);
+        const job = await waitForJob(res.job_id, (progress) => {
+            btn.innerHTML = `<i class="fas fa-spinner fa-spin"></i> Scanning... ${Math.round(progress * 100)}%`;
+        });
+        showToast(job.state === 'succeeded' ? job.result.message : 'Detection scan failed', job.state === 'succeeded' ? 'success' : 'error');
         // Refresh users to get latest suspicious flags
         const data = await apiCall('/admin/users');
         populateFlaggedUsers(data.users);
@@ -344,6 +348,16 @@ async function executeMLScan() {
     }
 }
 
+// Poll a background job until it finishes
+async function waitForJob(jobId, onProgress) {
+    while (true) {
+        const { job } = await apiCall(`/admin/jobs/${jobId}`);
+        if (job.state === 'succeeded' || job.state === 'failed') return job;
+        if (onProgress) onProgress(job.progress);
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 function populateFlaggedUsers(users) {
     const tbody = document.getElementById('flagged-users-tbody');
     if (!tbody) return;
@@ -52,6 +52,7 @@ function initApp() {
             document.getElementById('nav-avatar').src = `http://127.0.0.1:5000${currentUser.profile_photo}`;
         }
 
+        startEventStream();
         navigate('dashboard');
     } else {
         document.getElementById('sidebar').classList.add('hidden');
@@ -145,6 +146,89 @@ async function apiCall(endpoint, method = 'GET', body = null) {
     }
 }
 
+// --- Live Updates (Server-Sent Events) ---
+let eventStream = null;
+let livePollTimer = null;
+let streamRetryTimer = null;
+const LIVE_POLL_MS = 15000;
+const STREAM_RETRY_MS = 60000;
+
+// Reload whatever live view is on screen
+function refreshLiveViews() {
+    if (document.getElementById('chat-users-list')) fetchRecentChats();
+    if (selectedChatUser && document.getElementById('chat-window')) fetchChatHistory();
+    if (document.getElementById('feed-container')) fetchFeed();
+}
+
+// Fallback while the stream is unavailable
+function startLivePolling() {
+    if (!livePollTimer) livePollTimer = setInterval(refreshLiveViews, LIVE_POLL_MS);
+}
+
+function stopLivePolling() {
+    clearInterval(livePollTimer);
+    livePollTimer = null;
+}
+
+function startEventStream() {
+    if (eventStream || !currentToken || typeof EventSource === 'undefined') return;
+    clearTimeout(streamRetryTimer);
+    streamRetryTimer = null;
+    // EventSource reconnects on its own and sends Last-Event-ID so the server can replay missed events
+    eventStream = new EventSource(`${API_URL}/stream?token=${encodeURIComponent(currentToken)}`);
+
+    eventStream.addEventListener('open', stopLivePolling);
+
+    // The server is at its stream limit and closes this one; EventSource
+    // reconnects after the retry: hint it sent, and we poll until then
+    eventStream.addEventListener('busy', startLivePolling);
+
+    eventStream.onerror = () => {
+        // CLOSED means the browser gave up (e.g. an error status), so it won't reconnect by itself
+        if (eventStream && eventStream.readyState === EventSource.CLOSED) {
+            stopEventStream();
+            startLivePolling();
+            streamRetryTimer = setTimeout(startEventStream, STREAM_RETRY_MS);
+        }
+    };
+
+    eventStream.addEventListener('message', (e) => {
+        const msg = JSON.parse(e.data);
+        const otherId = msg.sender_id === currentUser.id ? msg.receiver_id : msg.sender_id;
+        if (document.getElementById('chat-users-list')) fetchRecentChats();
+        if (selectedChatUser && selectedChatUser.id === otherId && document.getElementById('chat-window')) {
+            fetchChatHistory();
+        } else if (msg.sender_id !== currentUser.id) {
+            showToast('New message received');
+        }
+    });
+
+    eventStream.addEventListener('like', (e) => {
+        const like = JSON.parse(e.data);
+        if (like.liked) showToast(`${like.user_name} liked your post`);
+        if (document.getElementById('feed-container')) fetchFeed();
+    });
+
+    eventStream.addEventListener('comment', (e) => {
+        const comment = JSON.parse(e.data);
+        showToast(`${comment.author_name} commented on your post`);
+        if (document.getElementById('feed-container')) fetchFeed();
+    });
+
+    // Events were missed and could not be replayed: reload whatever is on screen
+    eventStream.addEventListener('resync', refreshLiveViews);
+}
+
+function stopEventStream() {
+    if (eventStream) {
+        eventStream.close();
+        eventStream = null;
+    }
+    stopLivePolling();
+    clearTimeout(streamRetryTimer);
+    streamRetryTimer = null;
+}
+
 // --- UI Helpers ---
 function showToast(message, type = 'success') {
     const toast = document.getElementById('toast');
@@ -154,6 +238,7 @@ function showToast(message, type = 'success') {
 }
 
 function logout() {
+    stopEventStream();
     localStorage.removeItem('token');
     localStorage.removeItem('user');
     currentUser = null;
@@ -1036,34 +1121,34 @@ function handleTyping() {
     // We are simulating it as requested.
 }
 
-async function fetchChatHistory() {
+let oldestChatMessageId = null;
+
+async function fetchChatHistory(loadEarlier = false) {
     if (!selectedChatUser) return;
     try {
-        const data = await apiCall(`/chat/${selectedChatUser.id}`);
+        const query = loadEarlier && oldestChatMessageId ? `?before_id=${oldestChatMessageId}` : '';
+        const data = await apiCall(`/chat/${selectedChatUser.id}${query}`);
         const win = document.getElementById('chat-window');
 
-        if (data.messages.length === 0) {
+        if (!loadEarlier && data.messages.length === 0) {
             win.innerHTML = '<p class="text-muted text-center mt-2">No messages yet. Say hi!</p>';
             return;
         }
+        if (data.messages.length > 0) oldestChatMessageId = data.messages[0].id;
 
-        win.innerHTML = data.messages.map(m => {
-            const isMe = m.sender_id === currentUser.id;
-            return `
-            <div style="display: flex; flex-direction: column; align-items: ${isMe ? 'flex-end' : 'flex-start'}; gap: 0.2rem;">
-                <div style="background: ${isMe ? 'linear-gradient(135deg, var(--primary) 0%, var(--secondary) 100%)' : 'rgba(124, 58, 237, 0.05)'}; 
-                            color: ${isMe ? 'white' : 'var(--text-main)'}; 
-                            padding: 0.8rem 1.2rem; 
-                            border-radius: ${isMe ? '16px 16px 0 16px' : '16px 16px 16px 0'}; 
-                            max-width: 75%; 
-                            box-shadow: 0 4px 15px rgba(0,0,0,0.05);
-                            border: ${isMe ? 'none' : '1px solid var(--border)'};">
-                    <p style="margin:0; font-size: 0.95rem;">${m.content}</p>
-                </div>
-                <span style="font-size:0.7rem; color:var(--text-muted); padding: 0 0.5rem;">${m.timestamp}</span>
-            </div>
-            `;
-        }).join('');
+        const html = data.messages.map(renderChatMessage).join('');
+        const earlierButton = data.has_more
+            ? '<button id="chat-load-earlier" class="btn btn-outline" style="align-self: center; font-size: 0.8rem;" onclick="fetchChatHistory(true)">Load earlier messages</button>'
+            : '';
+
+        if (loadEarlier) {
+            const oldButton = document.getElementById('chat-load-earlier');
+            if (oldButton) oldButton.remove();
+            win.insertAdjacentHTML('afterbegin', earlierButton + html);
+            return;
+        }
+
+        win.innerHTML = earlierButton + html;
 
         // Auto-scroll Down
         win.scrollTop = win.scrollHeight;
@@ -1077,6 +1162,24 @@ async function fetchChatHistory() {
     } catch (e) { console.error(e); }
 }
 
+function renderChatMessage(m) {
+    const isMe = m.sender_id === currentUser.id;
+    return `
+    <div style="display: flex; flex-direction: column; align-items: ${isMe ? 'flex-end' : 'flex-start'}; gap: 0.2rem;">
+        <div style="background: ${isMe ? 'linear-gradient(135deg, var(--primary) 0%, var(--secondary) 100%)' : 'rgba(124, 58, 237, 0.05)'}; 
+                    color: ${isMe ? 'white' : 'var(--text-main)'}; 
+                    padding: 0.8rem 1.2rem; 
+                    border-radius: ${isMe ? '16px 16px 0 16px' : '16px 16px 16px 0'}; 
+                    max-width: 75%; 
+                    box-shadow: 0 4px 15px rgba(0,0,0,0.05);
+                    border: ${isMe ? 'none' : '1px solid var(--border)'};">
+            <p style="margin:0; font-size: 0.95rem;">${m.content}</p>
+        </div>
+        <span style="font-size:0.7rem; color:var(--text-muted); padding: 0 0.5rem;">${m.timestamp}</span>
+    </div>
+    `;
+}
+
 function simulateTypingReply() {
     clearTimeout(typingTimeout);
     typingTimeout = setTimeout(() => {
@@ -1196,18 +1299,38 @@ async function analyzeSkillGap(projectId, projectName) {
 }
 
 // --- SOCIAL FEED LOGIC ---
-async function fetchFeed() {
+let feedCursor = null;
+
+async function fetchFeed(loadMore = false) {
     try {
-        const data = await apiCall('/feed', 'GET');
+        const query = loadMore && feedCursor ? `?before=${encodeURIComponent(feedCursor)}` : '';
+        const data = await apiCall('/feed' + query, 'GET');
         const container = document.getElementById('feed-container');
         if (!container) return;
 
-        if (data.feed.length === 0) {
+        if (!loadMore && data.feed.length === 0) {
             container.innerHTML = '<div class="text-center text-muted">No posts yet. Be the first to post!</div>';
             return;
         }
 
-        container.innerHTML = data.feed.map(post => `
+        feedCursor = data.next_cursor;
+        const html = data.feed.map(renderFeedPost).join('');
+        const moreButton = feedCursor
+            ? '<button id="feed-load-more" class="btn btn-outline" style="width: 100%;" onclick="fetchFeed(true)">Load more</button>'
+            : '';
+
+        if (loadMore) {
+            const oldButton = document.getElementById('feed-load-more');
+            if (oldButton) oldButton.remove();
+            container.insertAdjacentHTML('beforeend', html + moreButton);
+        } else {
+            container.innerHTML = html + moreButton;
+        }
+    } catch (e) { console.error(e); }
+}
+
+function renderFeedPost(post) {
+    return `
             <div class="card mb-2" style="padding: 1.5rem;">
                 <div style="display: flex; justify-content: space-between; margin-bottom: 1rem;">
                     <div style="display: flex; gap: 1rem; align-items: center;">
@@ -1250,8 +1373,7 @@ async function fetchFeed() {
                     </div>
                 </div>
             </div>
-        `).join('');
-    } catch (e) { console.error(e); }
+        `;
 }
 
 async function handleCreatePost(e) {